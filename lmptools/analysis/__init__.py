@@ -0,0 +1,28 @@
+from .correlation import (
+    VACF,
+    CorrelationFrame,
+    CorrelationResult,
+    ForceACF,
+    TimeCorrelation,
+)
+from .msd import MSD, MSDFrame, MSDResult, msd_fft
+from .neighbors import NeighborList, NeighborPairs, candidate_pairs, minimum_image
+from .rdf import RDF, accumulate_rdf
+
+__all__ = [
+    "NeighborList",
+    "NeighborPairs",
+    "candidate_pairs",
+    "minimum_image",
+    "RDF",
+    "accumulate_rdf",
+    "MSD",
+    "MSDResult",
+    "MSDFrame",
+    "msd_fft",
+    "TimeCorrelation",
+    "CorrelationResult",
+    "CorrelationFrame",
+    "VACF",
+    "ForceACF",
+]
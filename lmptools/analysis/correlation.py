@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel
+
+from ..core.simulation import DumpSnapshot
+from ..core.task import Task
+
+
+class CorrelationResult(BaseModel):
+    """
+    Time autocorrelation function of a vector quantity
+
+    :param lags: Lags in number of frames
+    :param timesteps: Lags in timesteps, from the timesteps of the first two frames
+    :param total: Correlation `<a(t) . a(t + lag)>` averaged over atoms and time origins
+    :param types: Correlation averaged over the atoms of each type, if the `type` column is present
+    """
+
+    lags: np.ndarray
+    timesteps: np.ndarray
+    total: np.ndarray
+    types: Dict[int, np.ndarray] = {}
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def normalized(self) -> np.ndarray:
+        """
+        Correlation divided by its value at lag 0
+        """
+        return self.total / self.total[0] if self.total[0] else np.zeros_like(self.total)
+
+
+class CorrelationFrame(BaseModel):
+    """
+    Columns of one snapshot needed by a time correlation, atoms sorted by id
+
+    :param timestep: Timestep of the snapshot
+    :param ids: Atom ids
+    :param values: Values of the correlated columns of shape (natoms, ncolumns)
+    :param types: [Optional] Atom types, if the `type` column is present
+    """
+
+    timestep: int
+    ids: np.ndarray
+    values: np.ndarray
+    types: Optional[np.ndarray] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class TimeCorrelation(Task):
+    """
+    Streaming time autocorrelation of per atom vector columns over a sliding window of snapshots
+
+    The last `window` snapshots are kept in a fixed size ring buffer of column values, so memory
+    does not grow with the length of the trajectory. Every `stride` snapshots, once the buffer is
+    full, the correlation over all time origins inside the window is computed by FFT and added to
+    the running average. Lags range from 0 to `window - 1` snapshots, and snapshots must be evenly
+    spaced in time and hold the same atoms, matched through their ids
+
+    `run` returns the `CorrelationFrame` of a snapshot, to `add` in time order
+
+    :param columns: Columns of the vector quantity, e.g `("vx", "vy", "vz")`
+    :param window: Number of snapshots in the window, the largest lag is `window - 1`
+    :param stride: Number of snapshots between windows, `window` for non overlapping windows
+    """
+
+    def __init__(self, columns: Sequence[str], window: int = 100, stride: Optional[int] = None):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.columns = tuple(columns)
+        self.window = window
+        self.stride = stride if stride is not None else window
+        if self.stride < 1:
+            raise ValueError("stride must be at least 1")
+        self._buffer: Optional[np.ndarray] = None
+        self._head = 0
+        self._seen = 0
+        self._ids: Optional[np.ndarray] = None
+        self._types: Optional[np.ndarray] = None
+        self._first_timesteps = []
+        self._last_timestep: Optional[int] = None
+        self._sums: Optional[np.ndarray] = None
+        self._type_sums: Dict[int, np.ndarray] = {}
+        self._windows = 0
+
+    @property
+    def nwindows(self) -> int:
+        return self._windows
+
+    def frame(self, snapshot: DumpSnapshot) -> CorrelationFrame:
+        """
+        Values of the correlated columns and types of `snapshot`, atoms sorted by id
+        """
+        names = snapshot.column_names
+        missing = [name for name in self.columns if name not in names]
+        if missing:
+            raise KeyError(f"Snapshot {snapshot.timestamp} has no column {', '.join(missing)}")
+        order = np.argsort(snapshot.column("id"), kind="stable") if "id" in names else np.arange(snapshot.natoms)
+        return CorrelationFrame(
+            timestep=snapshot.timestamp,
+            ids=snapshot.column("id")[order] if "id" in names else order,
+            values=np.stack([snapshot.column(name)[order] for name in self.columns], axis=1).astype(np.float64),
+            types=snapshot.column("type")[order].astype(np.int64) if "type" in names else None,
+        )
+
+    def add(self, frame: CorrelationFrame) -> TimeCorrelation:
+        """
+        Add `frame` to the ring buffer and correlate the window when due, frames must be added in time order
+        """
+        if self._buffer is None:
+            self._buffer = np.zeros((self.window, len(frame.ids), len(self.columns)))
+            self._ids = frame.ids
+            self._types = frame.types
+        elif not np.array_equal(frame.ids, self._ids):
+            raise ValueError(f"Snapshot {frame.timestep} does not hold the atoms of the first snapshot")
+        elif frame.timestep <= self._last_timestep:
+            raise ValueError(f"Snapshot {frame.timestep} added after snapshot {self._last_timestep}")
+
+        self._buffer[self._head] = frame.values
+        self._head = (self._head + 1) % self.window
+        self._seen += 1
+        self._last_timestep = frame.timestep
+        if len(self._first_timesteps) < 2:
+            self._first_timesteps.append(frame.timestep)
+
+        if self._seen >= self.window and (self._seen - self.window) % self.stride == 0:
+            self._correlate()
+        return self
+
+    def update(self, snapshot: DumpSnapshot) -> TimeCorrelation:
+        """
+        Add `snapshot` to the ring buffer and correlate the window when due
+        """
+        return self.add(self.frame(snapshot))
+
+    def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> CorrelationFrame:
+        """
+        Columns of `snapshot` to `add` to the correlation
+        """
+        return self.frame(snapshot)
+
+    def _correlate(self) -> None:
+        # Oldest snapshot first, shape (natoms, window, ncolumns)
+        chronological = np.roll(self._buffer, -self._head, axis=0).transpose(1, 0, 2)
+        spectrum = np.fft.rfft(chronological, n=2 * self.window, axis=1)
+        power = (spectrum * spectrum.conj()).real.sum(axis=2)
+
+        # Correlations are linear in the power spectrum, sum the atoms before transforming back
+        self._sums = self._accumulate(self._sums, power.sum(axis=0))
+        if self._types is not None:
+            order = np.argsort(self._types, kind="stable")
+            unique, first = np.unique(self._types[order], return_index=True)
+            for label, values in zip(unique.tolist(), np.add.reduceat(power[order], first, axis=0)):
+                self._type_sums[label] = self._accumulate(self._type_sums.get(label), values)
+        self._windows += 1
+
+    def _accumulate(self, sums: Optional[np.ndarray], power: np.ndarray) -> np.ndarray:
+        correlation = np.fft.irfft(power, n=2 * self.window)[: self.window]
+        return correlation if sums is None else sums + correlation
+
+    def compute(self) -> CorrelationResult:
+        """
+        Correlation averaged over the windows correlated so far
+        """
+        if not self._windows:
+            raise ValueError(f"At least {self.window} snapshots are needed to correlate a window")
+
+        # Number of (atom, time origin) pairs behind every lag
+        counts = self._windows * (self.window - np.arange(self.window))
+        lags = np.arange(self.window)
+        types = {}
+        if self._types is not None:
+            labels, natoms = np.unique(self._types, return_counts=True)
+            types = {label: self._type_sums[label] / (counts * n) for label, n in zip(labels.tolist(), natoms)}
+        spacing = self._first_timesteps[1] - self._first_timesteps[0] if len(self._first_timesteps) > 1 else 0
+        return CorrelationResult(
+            lags=lags,
+            timesteps=lags * spacing,
+            total=self._sums / (counts * len(self._ids)),
+            types=types,
+        )
+
+
+class VACF(TimeCorrelation):
+    """
+    Velocity autocorrelation function from the `vx`, `vy`, `vz` dump columns
+    """
+
+    def __init__(self, window: int = 100, stride: Optional[int] = None):
+        super().__init__(("vx", "vy", "vz"), window, stride)
+
+
+class ForceACF(TimeCorrelation):
+    """
+    Force autocorrelation function from the `fx`, `fy`, `fz` dump columns
+    """
+
+    def __init__(self, window: int = 100, stride: Optional[int] = None):
+        super().__init__(("fx", "fy", "fz"), window, stride)
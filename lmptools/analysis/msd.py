@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from ..core.coordinates import positions
+from ..core.simulation import DumpSnapshot
+from ..core.task import Task
+
+
+def msd_fft(trajectories: np.ndarray) -> np.ndarray:
+    """
+    Mean squared displacement of every atom over all time origins with the FFT algorithm
+
+    `MSD(m) = S1(m) - 2 S2(m)` where `S2` is the position autocorrelation computed by FFT and `S1`
+    follows from running sums of the squared positions, in O(T log T) per atom
+
+    :param trajectories: Unwrapped positions of shape (natoms, T, 3)
+    :return: Array of shape (natoms, T), the MSD at every lag in frames
+    """
+    natoms, nframes, _ = trajectories.shape
+    counts = nframes - np.arange(nframes)
+
+    squares = np.einsum("atd,atd->at", trajectories, trajectories)
+    total = 2.0 * squares.sum(axis=1, keepdims=True)
+    # Sum of the squares of the first m and of the last m frames for every lag m
+    head = np.concatenate([np.zeros((natoms, 1)), np.cumsum(squares, axis=1)[:, :-1]], axis=1)
+    tail = np.concatenate([np.zeros((natoms, 1)), np.cumsum(squares[:, ::-1], axis=1)[:, :-1]], axis=1)
+    s1 = (total - head - tail) / counts
+
+    spectrum = np.fft.rfft(trajectories, n=2 * nframes, axis=1)
+    power = (spectrum * spectrum.conj()).real.sum(axis=2)
+    s2 = np.fft.irfft(power, n=2 * nframes, axis=1)[:, :nframes] / counts
+    return s1 - 2.0 * s2
+
+
+class MSDResult(BaseModel):
+    """
+    Mean squared displacement at every lag
+
+    :param lags: Lags in number of frames
+    :param timesteps: Lags in timesteps, from the timesteps of the first two frames
+    :param total: MSD averaged over all atoms
+    :param types: MSD averaged over the atoms of each type, if the `type` column is present
+    :param mols: MSD averaged over the atoms of each molecule, if requested and `mol` is present
+    """
+
+    lags: np.ndarray
+    timesteps: np.ndarray
+    total: np.ndarray
+    types: Dict[int, np.ndarray] = {}
+    mols: Dict[int, np.ndarray] = {}
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class MSDFrame(BaseModel):
+    """
+    Columns of one snapshot needed by the MSD, atoms sorted by id
+
+    :param timestep: Timestep of the snapshot
+    :param ids: Atom ids
+    :param positions: Unwrapped positions of shape (natoms, 3)
+    :param types: [Optional] Atom types, if the `type` column is present
+    :param mols: [Optional] Molecule ids, if requested and the `mol` column is present
+    """
+
+    timestep: int
+    ids: np.ndarray
+    positions: np.ndarray
+    types: Optional[np.ndarray] = None
+    mols: Optional[np.ndarray] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class MSD(Task):
+    """
+    Mean squared displacement over a whole trajectory with the FFT algorithm
+
+    The unwrapped positions of every snapshot are appended to a scratch file on disk, atoms being
+    matched across snapshots through their ids. `compute` then reads `chunk_size` atoms at a time
+    over all snapshots, so memory is bounded by `chunk_size * T` rather than `natoms * T`.
+    Snapshots must be evenly spaced in time and hold the same atoms
+
+    `run` returns the `MSDFrame` of a snapshot, to `add` in time order
+
+    :param chunk_size: Number of atoms processed at once by `compute`
+    :param mols: Also average over the atoms of each molecule
+    :param directory: [Optional] Directory of the scratch file, the system temporary directory by default
+    """
+
+    def __init__(self, chunk_size: int = 1024, mols: bool = False, directory: Optional[str] = None):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.chunk_size = chunk_size
+        self.mols = mols
+        self.directory = directory
+        self._file = None
+        self._ids: Optional[np.ndarray] = None
+        self._types: Optional[np.ndarray] = None
+        self._mol_ids: Optional[np.ndarray] = None
+        self._timesteps: List[int] = []
+
+    @property
+    def nframes(self) -> int:
+        return len(self._timesteps)
+
+    def frame(self, snapshot: DumpSnapshot) -> MSDFrame:
+        """
+        Unwrapped positions, types and molecules of `snapshot`, atoms sorted by id
+        """
+        points = positions(snapshot, unwrapped=True)
+        names = snapshot.column_names
+        order = np.argsort(snapshot.column("id"), kind="stable") if "id" in names else np.arange(len(points))
+        return MSDFrame(
+            timestep=snapshot.timestamp,
+            ids=snapshot.column("id")[order] if "id" in names else order,
+            positions=np.ascontiguousarray(points[order], dtype=np.float64),
+            types=snapshot.column("type")[order].astype(np.int64) if "type" in names else None,
+            mols=snapshot.column("mol")[order].astype(np.int64) if self.mols and "mol" in names else None,
+        )
+
+    def add(self, frame: MSDFrame) -> MSD:
+        """
+        Append the positions of `frame` to the scratch file, frames must be added in time order
+        """
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(dir=self.directory)
+            self._ids = frame.ids
+            self._types = frame.types
+            self._mol_ids = frame.mols
+        elif not np.array_equal(frame.ids, self._ids):
+            raise ValueError(f"Snapshot {frame.timestep} does not hold the atoms of the first snapshot")
+        elif frame.timestep <= self._timesteps[-1]:
+            raise ValueError(f"Snapshot {frame.timestep} added after snapshot {self._timesteps[-1]}")
+
+        self._file.write(frame.positions.tobytes())
+        self._timesteps.append(frame.timestep)
+        return self
+
+    def update(self, snapshot: DumpSnapshot) -> MSD:
+        """
+        Append the unwrapped positions of `snapshot` to the scratch file
+        """
+        return self.add(self.frame(snapshot))
+
+    def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> MSDFrame:
+        """
+        Columns of `snapshot` to `add` to the MSD
+        """
+        return self.frame(snapshot)
+
+    def compute(self) -> MSDResult:
+        """
+        MSD of the snapshots appended so far
+        """
+        if self._file is None:
+            raise ValueError("No snapshots to compute the MSD of")
+
+        self._file.flush()
+        nframes, natoms = self.nframes, len(self._ids)
+        trajectory = np.memmap(self._file, dtype=np.float64, mode="r", shape=(nframes, natoms, 3))
+
+        groups: Dict[str, Optional[np.ndarray]] = {"types": self._types, "mols": self._mol_ids}
+        sums = {name: {} for name in groups}
+        total = np.zeros(nframes)
+        for start in range(0, natoms, self.chunk_size):
+            stop = min(start + self.chunk_size, natoms)
+            msd = msd_fft(np.ascontiguousarray(trajectory[:, start:stop, :].transpose(1, 0, 2)))
+            total += msd.sum(axis=0)
+            for name, labels in groups.items():
+                if labels is None:
+                    continue
+                # Sum the rows of each label at once after sorting them by label
+                order = np.argsort(labels[start:stop], kind="stable")
+                unique, first = np.unique(labels[start:stop][order], return_index=True)
+                for label, values in zip(unique.tolist(), np.add.reduceat(msd[order], first, axis=0)):
+                    sums[name][label] = sums[name].get(label, 0.0) + values
+        del trajectory
+
+        timesteps = np.array(self._timesteps, dtype=np.int64)
+        lags = np.arange(nframes)
+        averages = {}
+        for name, labels in groups.items():
+            if labels is not None:
+                labels, counts = np.unique(labels, return_counts=True)
+                averages[name] = {label: sums[name][label] / count for label, count in zip(labels.tolist(), counts)}
+        return MSDResult(
+            lags=lags,
+            timesteps=lags * (timesteps[1] - timesteps[0] if nframes > 1 else 0),
+            total=total / natoms,
+            **averages,
+        )
+
+    def close(self) -> None:
+        """
+        Remove the scratch file
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from itertools import product
+from typing import Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+from scipy.spatial import cKDTree
+
+from ..core.coordinates import box_matrix, box_origin, positions
+from ..core.simulation import DumpSnapshot, SimulationBox
+from ..core.task import Task
+
+
+class NeighborPairs(BaseModel):
+    """
+    Pairs of atoms closer than the cutoff, each pair is listed once with `i < j`
+
+    :param i: Row of the first atom of each pair in the snapshot
+    :param j: Row of the second atom of each pair in the snapshot
+    :param distances: Distance between the atoms of each pair
+    :param vectors: [Optional] Minimum image vector from atom `i` to atom `j`, shape (npairs, 3)
+    """
+
+    i: np.ndarray
+    j: np.ndarray
+    distances: np.ndarray
+    vectors: Optional[np.ndarray] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def __len__(self) -> int:
+        return len(self.i)
+
+
+def periodicity(box: SimulationBox) -> np.ndarray:
+    return np.array([prd.startswith("p") for prd in (box.xprd, box.yprd, box.zprd)])
+
+
+def perpendicular_widths(box: SimulationBox) -> np.ndarray:
+    """
+    Distance between opposite faces of the box along each edge, the box length for orthogonal boxes
+    """
+    matrix = box_matrix(box)
+    volume = abs(np.linalg.det(matrix))
+    a, b, c = matrix.T
+    return volume / np.linalg.norm([np.cross(b, c), np.cross(c, a), np.cross(a, b)], axis=1)
+
+
+def minimum_image(vectors: np.ndarray, box: SimulationBox) -> np.ndarray:
+    """
+    Map separation vectors of shape (n, 3) to their shortest periodic image
+    """
+    matrix = box_matrix(box)
+    fractional = np.linalg.solve(matrix, vectors.T).T
+    fractional -= np.where(periodicity(box), np.round(fractional), 0.0)
+    return fractional @ matrix.T
+
+
+def candidate_pairs(points: np.ndarray, box: SimulationBox, cutoff: float) -> np.ndarray:
+    """
+    Find all pairs of points closer than `cutoff` through the periodic boundaries, as an (npairs, 2)
+    array with `i < j` in every row
+
+    Orthogonal boxes use the periodic `boxsize` of `cKDTree`. For triclinic boxes, which `cKDTree`
+    does not support, the points close to the faces are replicated as ghost images across the
+    periodic boundaries and the pairs with a ghost are mapped back to the atom it images
+    """
+    periodic = periodicity(box)
+    if np.any(periodic & (2.0 * cutoff > perpendicular_widths(box))):
+        raise ValueError(f"Cutoff {cutoff} exceeds half the width of the periodic box")
+
+    matrix = box_matrix(box)
+    fractional = np.linalg.solve(matrix, (points - box_origin(box)).T).T
+    fractional = np.where(periodic, fractional - np.floor(fractional), fractional)
+
+    if not box.triclinic or not any([box.xy, box.xz, box.yz]):
+        lengths = np.diag(matrix)
+        wrapped = fractional * lengths
+        # Non periodic dimensions get a box large enough for the boundary to never be crossed
+        low = np.where(periodic, 0.0, wrapped.min(axis=0, initial=0.0))
+        extent = wrapped.max(axis=0, initial=0.0) - low + 2.0 * cutoff + 1.0
+        boxsize = np.where(periodic, lengths, extent)
+        # Points exactly at the upper boundary after round-off belong at the lower one
+        wrapped = np.where(wrapped - low >= boxsize, 0.0, wrapped - low)
+        return cKDTree(wrapped, boxsize=boxsize).query_pairs(cutoff, output_type="ndarray")
+
+    real = fractional @ matrix.T
+    margins = cutoff / perpendicular_widths(box)
+    ghosts = []
+    owners = []
+    for shift in product((-1, 0, 1), repeat=3):
+        shift = np.array(shift)
+        if not shift.any() or np.any(shift[~periodic] != 0):
+            continue
+        near = np.ones(len(fractional), dtype=bool)
+        near &= np.all((shift != 1) | (fractional < margins), axis=1)
+        near &= np.all((shift != -1) | (fractional >= 1.0 - margins), axis=1)
+        rows = np.flatnonzero(near)
+        ghosts.append((fractional[rows] + shift) @ matrix.T)
+        owners.append(rows)
+
+    tree = cKDTree(real)
+    pairs = [tree.query_pairs(cutoff, output_type="ndarray")]
+    if owners and sum(len(rows) for rows in owners):
+        owners = np.concatenate(owners)
+        images = tree.sparse_distance_matrix(cKDTree(np.concatenate(ghosts)), cutoff, output_type="ndarray")
+        first = images["i"].astype(np.int64)
+        second = owners[images["j"]]
+        # Every pair across a boundary is found from both of its atoms, keep one
+        keep = first < second
+        pairs.append(np.stack([first[keep], second[keep]], axis=1))
+    return np.concatenate(pairs).astype(np.int64)
+
+
+class NeighborList(Task):
+    """
+    Task returning the `NeighborPairs` of every snapshot
+
+    Pairs are searched up to `cutoff + skin` and kept as candidates for the following snapshots:
+    the tree is only rebuilt once an atom has moved more than half the skin since the last build,
+    or when the atoms or the box change. Atoms are matched across snapshots through the `id`
+    column when present, so the order of the atom lines may change between snapshots
+
+    The task keeps the candidate pairs of the last snapshot and must see the snapshots in order
+    when run in a pipeline
+
+    :param cutoff: Neighbor cutoff distance
+    :param skin: Verlet skin distance, 0 rebuilds the tree on every snapshot
+    :param vectors: Also return the minimum image pair vectors
+    """
+
+    def __init__(self, cutoff: float, skin: float = 0.3, vectors: bool = False):
+        if cutoff <= 0 or skin < 0:
+            raise ValueError("cutoff must be positive and skin non negative")
+        self.cutoff = cutoff
+        self.skin = skin
+        self.vectors = vectors
+        self._candidates: Optional[np.ndarray] = None
+        self._reference: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._builds = 0
+
+    @property
+    def builds(self) -> int:
+        """
+        Number of times the candidate pairs were rebuilt
+        """
+        return self._builds
+
+    def _sorted(self, snapshot: DumpSnapshot) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        points = positions(snapshot)
+        if "id" not in snapshot.column_names:
+            return points, np.arange(len(points)), None
+        ids = snapshot.column("id")
+        order = np.argsort(ids, kind="stable")
+        return points[order], order, ids[order]
+
+    def _needs_rebuild(self, points: np.ndarray, ids: Optional[np.ndarray], box: SimulationBox) -> bool:
+        if self._candidates is None or len(points) != len(self._reference):
+            return True
+        if not np.array_equal(box_matrix(box), self._matrix):
+            return True
+        if (ids is None) != (self._ids is None) or (ids is not None and not np.array_equal(ids, self._ids)):
+            return True
+        displacements = minimum_image(points - self._reference, box)
+        return bool(np.max(np.einsum("ij,ij->i", displacements, displacements), initial=0.0) > (self.skin / 2) ** 2)
+
+    def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> NeighborPairs:
+        if not snapshot.natoms:
+            empty = np.zeros(0, dtype=np.int64)
+            vectors = np.zeros((0, 3)) if self.vectors else None
+            return NeighborPairs(i=empty, j=empty, distances=np.zeros(0), vectors=vectors)
+
+        points, order, ids = self._sorted(snapshot)
+        box = snapshot.box
+        if self._needs_rebuild(points, ids, box):
+            self._candidates = candidate_pairs(points, box, self.cutoff + self.skin)
+            self._reference = points
+            self._ids = ids
+            self._matrix = box_matrix(box)
+            self._builds += 1
+
+        first, second = self._candidates[:, 0], self._candidates[:, 1]
+        vectors = minimum_image(points[second] - points[first], box)
+        distances = np.sqrt(np.einsum("ij,ij->i", vectors, vectors))
+        keep = distances <= self.cutoff
+
+        # Back to the rows of the snapshot
+        i, j = order[first[keep]], order[second[keep]]
+        swap = i > j
+        i, j = np.where(swap, j, i), np.where(swap, i, j)
+        vectors = np.where(swap[:, None], -vectors[keep], vectors[keep])
+        return NeighborPairs(i=i, j=j, distances=distances[keep], vectors=vectors if self.vectors else None)
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import copy
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.coordinates import box_matrix, positions
+from ..core.simulation import DumpSnapshot
+from ..core.task import Task
+from .neighbors import candidate_pairs, minimum_image
+
+TypePair = Tuple[int, int]
+
+
+class RDF(Task):
+    """
+    Streaming radial distribution function g(r), overall and per pair of atom types
+
+    Every snapshot only adds its pair distance histogram to the accumulator, snapshots are never
+    kept. The expected number of pairs is accumulated with the volume of each snapshot box, so
+    the box may change between snapshots. Accumulators over different snapshots can be merged,
+    e.g the per worker accumulators of `Dump.parse(reducer=accumulate_rdf, initial=RDF(...))`
+
+    `run` returns the accumulator of a single snapshot, e.g
+    `RDF(rmax).merge(*[result.results[0] for result in pipeline.execute(dump)])`
+
+    :param rmax: Largest pair distance, at most half the width of the periodic box
+    :param nbins: Number of bins between 0 and `rmax`
+    :param types: Also accumulate g(r) for every pair of atom types, requires the `type` column
+    """
+
+    def __init__(self, rmax: float, nbins: int = 100, types: bool = True):
+        if rmax <= 0 or nbins < 1:
+            raise ValueError("rmax must be positive and nbins at least 1")
+        self.rmax = rmax
+        self.nbins = nbins
+        self.types = types
+        self._counts: Dict[Optional[TypePair], np.ndarray] = {}
+        self._norms: Dict[Optional[TypePair], float] = {}
+        self._nframes = 0
+
+    @property
+    def nframes(self) -> int:
+        return self._nframes
+
+    @property
+    def edges(self) -> np.ndarray:
+        return np.linspace(0.0, self.rmax, self.nbins + 1)
+
+    @property
+    def radii(self) -> np.ndarray:
+        """
+        Centers of the bins
+        """
+        edges = self.edges
+        return (edges[1:] + edges[:-1]) / 2
+
+    @property
+    def pairs(self) -> List[TypePair]:
+        """
+        Type pairs seen so far, with the lower type first
+        """
+        return sorted(key for key in self._counts if key is not None)
+
+    def _add(self, key: Optional[TypePair], counts: np.ndarray, norm: float) -> None:
+        if key not in self._counts:
+            self._counts[key] = np.zeros(self.nbins, dtype=np.int64)
+            self._norms[key] = 0.0
+        self._counts[key] += counts
+        self._norms[key] += norm
+
+    def update(self, snapshot: DumpSnapshot) -> RDF:
+        """
+        Add the pair distances of `snapshot` to the accumulator
+        """
+        self._nframes += 1
+        natoms = snapshot.natoms or 0
+        volume = abs(np.linalg.det(box_matrix(snapshot.box)))
+        if natoms < 2:
+            self._add(None, np.zeros(self.nbins, dtype=np.int64), 0.0)
+            return self
+
+        points = positions(snapshot)
+        pairs = candidate_pairs(points, snapshot.box, self.rmax)
+        vectors = minimum_image(points[pairs[:, 1]] - points[pairs[:, 0]], snapshot.box)
+        distances = np.sqrt(np.einsum("ij,ij->i", vectors, vectors))
+        bins = np.minimum((distances * (self.nbins / self.rmax)).astype(np.int64), self.nbins - 1)
+
+        self._add(None, np.bincount(bins, minlength=self.nbins), natoms * (natoms - 1) / 2 / volume)
+        if not self.types or "type" not in snapshot.column_names:
+            return self
+
+        types = snapshot.column("type").astype(np.int64)
+        species, counts = np.unique(types, return_counts=True)
+        # Pair of the ranks of both types, lower first, flattened into one histogram per pair
+        ranks = np.searchsorted(species, types)
+        first = np.minimum(ranks[pairs[:, 0]], ranks[pairs[:, 1]])
+        second = np.maximum(ranks[pairs[:, 0]], ranks[pairs[:, 1]])
+        codes = (first * len(species) + second) * self.nbins + bins
+        histograms = np.bincount(codes, minlength=len(species) ** 2 * self.nbins).reshape(-1, self.nbins)
+
+        for a in range(len(species)):
+            for b in range(a, len(species)):
+                if a == b:
+                    norm = counts[a] * (counts[a] - 1) / 2 / volume
+                else:
+                    norm = counts[a] * counts[b] / volume
+                self._add((int(species[a]), int(species[b])), histograms[a * len(species) + b], norm)
+        return self
+
+    def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> RDF:
+        """
+        Pair distance histograms and norms of `snapshot` alone, as a new accumulator to merge
+        """
+        return RDF(self.rmax, self.nbins, self.types).update(snapshot)
+
+    def merge(self, *others: RDF) -> RDF:
+        """
+        Add the snapshots accumulated by `others` to this accumulator
+        """
+        for other in others:
+            if other.rmax != self.rmax or other.nbins != self.nbins:
+                raise ValueError("Only accumulators with the same rmax and nbins can be merged")
+            for key, counts in other._counts.items():
+                self._add(key, counts, other._norms[key])
+            self._nframes += other._nframes
+        return self
+
+    def __add__(self, other: RDF) -> RDF:
+        return copy.deepcopy(self).merge(other)
+
+    def g(self, pair: Optional[TypePair] = None) -> np.ndarray:
+        """
+        Normalized g(r) at `radii` over all atoms or for a pair of atom types
+
+        :param pair: [Optional] Pair of atom types, all atoms by default
+        """
+        if pair is not None:
+            pair = (min(pair), max(pair))
+        if pair not in self._counts:
+            raise KeyError(f"No pairs of types {pair} accumulated")
+
+        edges = self.edges
+        shells = 4.0 / 3.0 * np.pi * (edges[1:] ** 3 - edges[:-1] ** 3)
+        norm = self._norms[pair]
+        if norm == 0.0:
+            return np.zeros(self.nbins)
+        return self._counts[pair] / (norm * shells)
+
+
+def accumulate_rdf(rdf: RDF, snapshot: DumpSnapshot) -> RDF:
+    """
+    Reducer adding `snapshot` to `rdf`, for `Dump.parse(reducer=...)`
+    """
+    return rdf.update(snapshot)
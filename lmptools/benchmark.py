@@ -0,0 +1,265 @@
+"""
+Benchmarks of parsing, unwrapping, dataframe construction and SQL ingest on synthetic dump files
+
+Run with `python -m lmptools.benchmark --atoms 1000 100000 --output results.json` and compare two
+result files with `--compare baseline.json`
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .core import coordinates
+from .dump.base import Dump
+from .dump.synthetic import generate_dump
+
+# Snapshots are only parsed into `Atom` objects up to this number of atoms, it is orders of magnitude slower
+MAX_OBJECT_ATOMS = 100_000
+
+
+def version() -> Optional[str]:
+    try:
+        from importlib.metadata import PackageNotFoundError
+        from importlib.metadata import version as package_version
+
+        return package_version("lmptools")
+    except PackageNotFoundError:
+        return None
+
+
+def measure(function: Callable[[], Any], repeat: int = 3, memory: bool = True) -> Dict[str, float]:
+    """
+    Time `function` over `repeat` calls and measure its peak memory in one more call
+
+    Peak memory is the largest amount of memory allocated through Python and numpy during the call,
+    as traced by `tracemalloc`. The timed calls are not traced
+
+    :param function: Function called without arguments
+    :param repeat: Number of timed calls
+    :param memory: Measure the peak memory
+    """
+    times = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    result = {"best": min(times), "mean": sum(times) / len(times), "repeat": len(times)}
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def throughput(result: Dict[str, float], nframes: int, natoms: int, nbytes: Optional[int] = None) -> Dict[str, float]:
+    """
+    Add the number of frames, atoms and bytes per second of the best time to `result`
+    """
+    result["frames_per_second"] = nframes / result["best"]
+    result["atoms_per_second"] = nframes * natoms / result["best"]
+    if nbytes is not None:
+        result["bytes_per_second"] = nbytes / result["best"]
+    return result
+
+
+def run_benchmarks(
+    natoms: int,
+    nframes: int = 10,
+    columns: str = "image",
+    triclinic: bool = False,
+    repeat: int = 3,
+    sql: bool = True,
+    directory: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Benchmark one synthetic dump file
+
+    :param natoms: Number of atoms per snapshot
+    :param nframes: Number of snapshots
+    :param columns: Column set of the dump file, one of `lmptools.dump.synthetic.COLUMN_SETS`
+    :param triclinic: Use a triclinic box
+    :param repeat: Number of timed runs of every benchmark
+    :param sql: Benchmark the ingest into SQLite with `SQLWriter`
+    :param directory: [Optional] Directory of the temporary files, the system temporary directory by default
+    """
+    with tempfile.TemporaryDirectory(dir=directory) as scratch:
+        filename = generate_dump(
+            os.path.join(scratch, "dump.lammpstrj"), natoms, nframes, columns=columns, triclinic=triclinic
+        )
+        nbytes = os.path.getsize(filename)
+
+        def parse(**options) -> Callable[[], int]:
+            def consume() -> int:
+                # Snapshots are dropped once parsed, the peak memory is the working set of the parser
+                parsed = 0
+                for snapshot in Dump(filename, persist_index=False, **options):
+                    parsed += snapshot.natoms
+                return parsed
+
+            return consume
+
+        benchmarks: Dict[str, Dict[str, float]] = {}
+        for name, options in {
+            "parse_columnar": {"columnar": True},
+            "parse_memory_map": {"columnar": True, "memory_map": True},
+            "parse_unwrap": {"columnar": True, "unwrap": True},
+            "parse_objects": {},
+        }.items():
+            if name == "parse_objects" and natoms > MAX_OBJECT_ATOMS:
+                continue
+            benchmarks[name] = throughput(measure(parse(**options), repeat), nframes, natoms, nbytes)
+
+        # The first snapshot stands in for every frame, so memory stays bounded by a single snapshot
+        with Dump(filename, columnar=True, persist_index=False) as dump:
+            snapshot = next(dump)
+
+        def unwrap():
+            for _ in range(nframes):
+                coordinates.unwrap(dict(snapshot.columns), snapshot.box)
+
+        def dataframe():
+            for _ in range(nframes):
+                snapshot.dataframe
+
+        benchmarks["unwrap"] = throughput(measure(unwrap, repeat), nframes, natoms)
+        benchmarks["dataframe"] = throughput(measure(dataframe, repeat), nframes, natoms)
+        if "parse_objects" in benchmarks:
+            with Dump(filename, persist_index=False) as dump:
+                objects = next(dump)
+
+            def dataframe_objects():
+                for _ in range(nframes):
+                    objects.dataframe
+
+            benchmarks["dataframe_objects"] = throughput(measure(dataframe_objects, repeat), nframes, natoms)
+
+        if sql:
+            from .writers.sql import SQLWriter
+
+            databases = count()
+
+            def ingest():
+                db_name = os.path.join(scratch, f"snapshots.{next(databases)}.db")
+                writer = SQLWriter(1, db_name=db_name, batch_size=8, bulk_pragmas=True, defer_indexes=True)
+                Dump(filename, callback=writer, columnar=True, persist_index=False).parse()
+                writer.close()
+
+            benchmarks["sql_ingest"] = throughput(measure(ingest, repeat), nframes, natoms, nbytes)
+
+    return {
+        "natoms": natoms,
+        "nframes": nframes,
+        "columns": columns,
+        "triclinic": triclinic,
+        "file_bytes": nbytes,
+        "benchmarks": benchmarks,
+    }
+
+
+def run_suite(atoms: Sequence[int], **options) -> Dict[str, Any]:
+    """
+    Benchmark synthetic dump files of every number of atoms in `atoms`, see `run_benchmarks` for the options
+    """
+    runs = [run_benchmarks(natoms, **options) for natoms in atoms]
+    return {
+        "version": version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        # Peak resident set size of the whole process, in kilobytes on Linux
+        "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "runs": runs,
+    }
+
+
+def compare(baseline: Dict[str, Any], results: Dict[str, Any], tolerance: float = 0.1) -> List[str]:
+    """
+    Benchmarks that got slower or use more memory than in `baseline` by more than `tolerance`
+
+    Runs are matched by number of atoms, number of frames, column set and box shape
+
+    :param baseline: Results of `run_suite` to compare against
+    :param results: Results of `run_suite`
+    :param tolerance: Relative change below which a difference is ignored
+    :return: One line per regression
+    """
+
+    def key(run: Dict[str, Any]):
+        return run["natoms"], run["nframes"], run["columns"], run["triclinic"]
+
+    previous = {key(run): run["benchmarks"] for run in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        for name, result in run["benchmarks"].items():
+            reference = previous.get(key(run), {}).get(name)
+            if reference is None:
+                continue
+            for metric in ("best", "peak_bytes"):
+                if metric in result and metric in reference and result[metric] > reference[metric] * (1 + tolerance):
+                    change = result[metric] / reference[metric] - 1
+                    regressions.append(
+                        f"{name} ({run['natoms']} atoms, {run['nframes']} frames): {metric} "
+                        f"{reference[metric]:.4g} -> {result[metric]:.4g} (+{change:.1%})"
+                    )
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--atoms", type=int, nargs="+", default=[1000, 100_000], help="Numbers of atoms per snapshot")
+    parser.add_argument("--frames", type=int, default=10, help="Number of snapshots")
+    parser.add_argument("--columns", default="image", help="Column set of the synthetic dump files")
+    parser.add_argument("--triclinic", action="store_true", help="Use triclinic boxes")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs of every benchmark")
+    parser.add_argument("--no-sql", action="store_true", help="Skip the SQLite ingest benchmark")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Report the regressions against these JSON results")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change ignored by --compare")
+    args = parser.parse_args(argv)
+
+    results = run_suite(
+        args.atoms,
+        nframes=args.frames,
+        columns=args.columns,
+        triclinic=args.triclinic,
+        repeat=args.repeat,
+        sql=not args.no_sql,
+    )
+    for run in results["runs"]:
+        for name, result in run["benchmarks"].items():
+            print(
+                f"{run['natoms']:>10} atoms {name:>20}: {result['best']:10.4f} s"
+                f" {result['atoms_per_second']:12.4g} atoms/s {result.get('peak_bytes', 0) / 1e6:10.1f} MB"
+            )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@ from __future__ import annotations
 import math
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 from pydantic import BaseModel
 
@@ -61,21 +62,38 @@ class Atom(BaseModel):
     def __eq__(self, other: Atom) -> bool:
         return all([self.__dict__[k] == other.__dict__[k] for k in self.__fields_set__])
 
-    def unwrap(self, lx: float, ly: float, lz: float) -> None:
+    def unwrap(self, lx: float, ly: float, lz: float, xy: float = 0.0, xz: float = 0.0, yz: float = 0.0) -> None:
         """
         Unwrap the atom's coordinate based the image flags provided
+
+        The tilt factors `xy`, `xz` and `yz` of a triclinic box shift the coordinates along the
+        lower dimensions when the atom crosses the y and z boundaries
         """
         self.unwrapped = True
+        ix = self.ix or 0
+        iy = self.iy or 0
+        iz = self.iz or 0
         if self.ix is not None and self.x is not None:
-            self.xu = self.x + self.ix * lx
+            self.xu = self.x + ix * lx + iy * xy + iz * xz
 
         if self.iy is not None and self.y is not None:
-            self.yu = self.y + self.iy * ly
+            self.yu = self.y + iy * ly + iz * yz
 
         if self.iz is not None and self.z is not None:
-            self.zu = self.z + self.iz * lz
+            self.zu = self.z + iz * lz
         return None
 
     @property
     def dataframe(self):
         return pd.DataFrame.from_dict([self.dict(exclude_unset=True)])
+
+
+def column_dtype(name: str) -> np.dtype:
+    """
+    Numpy dtype used to store a dump column, integers for integer valued `Atom` fields
+    (id, type, mol, image flags) and floats for everything else
+    """
+    field = Atom.__fields__.get(name)
+    if field is not None and field.type_ is int:
+        return np.dtype(np.int64)
+    return np.dtype(np.float64)
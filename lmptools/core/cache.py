@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+from loguru import logger
+from pydantic import BaseModel
+
+# Returned by `ResultCache.get` for keys that are not cached, None is a valid task result
+MISSING = object()
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return {"dtype": value.dtype.str, "shape": value.shape, "data": value.tolist()}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if isinstance(value, BaseModel):
+        return value.dict()
+    # The repr of functions and plain objects holds their address, which changes on every run
+    raise TypeError(f"Cannot hash {type(value).__name__} value {value!r} stably, use JSON serializable values")
+
+
+def stable_hash(*values: Any) -> str:
+    """
+    Hash of JSON serializable values (numpy arrays, sets and pydantic models included) that is
+    identical across processes and interpreter runs, unlike the builtin `hash`
+
+    Raises `TypeError` for any other value, e.g functions or plain objects
+    """
+    payload = json.dumps(values, sort_keys=True, default=_encode)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def file_identity(filename: str, content_hash: bool = False, chunk_size: int = 1 << 24) -> str:
+    """
+    Identity of a file, from its absolute path, size and modification time or from its content
+
+    :param filename: Path to the file
+    :param content_hash: Hash the content of the file, the identity then survives copies and touches
+    :param chunk_size: Number of bytes hashed at once
+    """
+    if content_hash:
+        digest = hashlib.sha256()
+        with open(filename, "rb") as f:
+            while chunk := f.read(chunk_size):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    stat = os.stat(filename)
+    return stable_hash(os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+
+
+class ResultCache:
+    """
+    Size bounded on disk cache of task results
+
+    Every result is pickled to its own file named after its key. The least recently used results
+    are evicted once the files take more than `max_bytes`, the use order survives restarts through
+    the modification time of the files
+
+    :param directory: Directory holding the cached results, created if needed
+    :param max_bytes: Maximum size of the cached results in bytes
+    :param content_hash: Identify dump files by a hash of their content instead of their path, size
+                         and modification time
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30, content_hash: bool = False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        os.makedirs(directory, exist_ok=True)
+
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(".pkl"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, entry.name[: -len(".pkl")], stat.st_size))
+        self._sizes: OrderedDict[str, int] = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._nbytes = sum(self._sizes.values())
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._sizes
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def key(self, identity: str, timestep: int, position: int, fingerprint: str) -> str:
+        """
+        Key of the result of a task chain for the snapshot at `position` in a dump file
+
+        :param identity: Identity of the dump file, see `file_identity`
+        :param timestep: Timestep of the snapshot
+        :param position: Position of the snapshot in the dump file, tells apart repeated timesteps
+        :param fingerprint: Fingerprint of the task and of the tasks before it in the chain
+        """
+        return stable_hash(identity, timestep, position, fingerprint)
+
+    def get(self, key: str) -> Any:
+        """
+        Return the result cached under `key` or `MISSING`
+        """
+        if key not in self._sizes:
+            return MISSING
+
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.debug(f"Dropping cached result {path}, {e}")
+            self._discard(key)
+            return MISSING
+
+        # Mark as most recently used
+        os.utime(path)
+        self._sizes.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Cache `value` under `key` and evict the least recently used results beyond `max_bytes`
+        """
+        path = self.path(key)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+        if key in self._sizes:
+            self._nbytes -= self._sizes.pop(key)
+        self._sizes[key] = os.path.getsize(path)
+        self._nbytes += self._sizes[key]
+        self.evict()
+
+    def evict(self, max_bytes: Optional[int] = None) -> None:
+        """
+        Remove the least recently used results until the cache holds at most `max_bytes`
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        while self._sizes and self._nbytes > max_bytes:
+            key = next(iter(self._sizes))
+            self._discard(key)
+
+    def clear(self) -> None:
+        self.evict(0)
+
+    def _discard(self, key: str) -> None:
+        self._nbytes -= self._sizes.pop(key)
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from typing import Dict, Sequence
+
+import numpy as np
+
+from .simulation import DumpSnapshot, SimulationBox
+
+Columns = Dict[str, np.ndarray]
+
+COORDINATES = ("x", "y", "z")
+UNWRAPPED = ("xu", "yu", "zu")
+SCALED = ("xs", "ys", "zs")
+SCALED_UNWRAPPED = ("xsu", "ysu", "zsu")
+IMAGES = ("ix", "iy", "iz")
+COORDINATE_COLUMNS = COORDINATES + UNWRAPPED + SCALED + SCALED_UNWRAPPED + IMAGES
+
+
+def box_matrix(box: SimulationBox) -> np.ndarray:
+    """
+    Upper triangular matrix whose columns are the edge vectors of the simulation box
+
+    A point with fractional coordinates `s` is at `origin + H @ s` and crossing the periodic boundary
+    `n` times along each edge shifts it by `H @ n`
+    """
+    return np.array(
+        [
+            [box.Lx, box.xy, box.xz],
+            [0.0, box.Ly, box.yz],
+            [0.0, 0.0, box.Lz],
+        ]
+    )
+
+
+def box_origin(box: SimulationBox) -> np.ndarray:
+    return np.array([box.xlo, box.ylo, box.zlo])
+
+
+def _transform(
+    columns: Columns,
+    sources: Sequence[str],
+    targets: Sequence[str],
+    matrix: np.ndarray,
+    shift: np.ndarray,
+    offset: np.ndarray,
+) -> Columns:
+    """
+    Set `targets[d] = offset[d] + sum_j matrix[d, j] * (sources[j] - shift[j])` for every dimension
+    whose required source columns are present, the other dimensions are left untouched
+    """
+    for d, target in enumerate(targets):
+        needed = [j for j in range(3) if matrix[d, j] != 0.0]
+        if not needed or any(sources[j] not in columns for j in needed):
+            continue
+        value = np.full(len(columns[sources[needed[0]]]), offset[d])
+        for j in needed:
+            value += matrix[d, j] * (columns[sources[j]] - shift[j])
+        columns[target] = value
+    return columns
+
+
+def unwrap(columns: Columns, box: SimulationBox) -> Columns:
+    """
+    Add the unwrapped coordinates `xu`, `yu`, `zu` computed from `x`, `y`, `z` and the image flags
+
+    For triclinic boxes the tilt factors are accounted for, e.g `xu = x + ix * lx + iy * xy + iz * xz`.
+    A coordinate is only unwrapped when the image flags it depends on are present
+
+    :param columns: Snapshot columns, updated in place
+    :param box: Simulation box of the snapshot
+    """
+    matrix = box_matrix(box)
+    for d, (coordinate, target) in enumerate(zip(COORDINATES, UNWRAPPED)):
+        needed = [j for j in range(3) if matrix[d, j] != 0.0]
+        if coordinate not in columns or any(IMAGES[j] not in columns for j in needed):
+            continue
+        value = columns[coordinate].astype(np.float64)
+        for j in needed:
+            value += matrix[d, j] * columns[IMAGES[j]]
+        columns[target] = value
+    return columns
+
+
+def scaled_to_unscaled(columns: Columns, box: SimulationBox, unwrapped: bool = False) -> Columns:
+    """
+    Convert the scaled coordinates `xs`, `ys`, `zs` into `x`, `y`, `z`
+
+    :param columns: Snapshot columns, updated in place
+    :param box: Simulation box of the snapshot
+    :param unwrapped: Convert `xsu`, `ysu`, `zsu` into `xu`, `yu`, `zu` instead
+    """
+    sources, targets = (SCALED_UNWRAPPED, UNWRAPPED) if unwrapped else (SCALED, COORDINATES)
+    return _transform(columns, sources, targets, box_matrix(box), np.zeros(3), box_origin(box))
+
+
+def unscaled_to_scaled(columns: Columns, box: SimulationBox, unwrapped: bool = False) -> Columns:
+    """
+    Convert the coordinates `x`, `y`, `z` into the scaled coordinates `xs`, `ys`, `zs`
+
+    :param columns: Snapshot columns, updated in place
+    :param box: Simulation box of the snapshot
+    :param unwrapped: Convert `xu`, `yu`, `zu` into `xsu`, `ysu`, `zsu` instead
+    """
+    sources, targets = (UNWRAPPED, SCALED_UNWRAPPED) if unwrapped else (COORDINATES, SCALED)
+    inverse = np.linalg.inv(box_matrix(box))
+    # Entries of the inverse that are zero for the box matrix are only round-off
+    inverse[np.tril_indices(3, -1)] = 0.0
+    return _transform(columns, sources, targets, inverse, box_origin(box), np.zeros(3))
+
+
+def wrap(columns: Columns, box: SimulationBox) -> Columns:
+    """
+    Map `x`, `y`, `z` back into the simulation box along its periodic dimensions
+
+    The image flags `ix`, `iy`, `iz` are updated by the number of box lengths each atom was moved,
+    so that unwrapping the result gives back the original coordinates
+
+    :param columns: Snapshot columns holding `x`, `y` and `z`, updated in place
+    :param box: Simulation box of the snapshot
+    """
+    if any(coordinate not in columns for coordinate in COORDINATES):
+        raise KeyError("Wrapping requires the x, y and z columns")
+
+    matrix = box_matrix(box)
+    origin = box_origin(box)
+    positions = np.stack([columns[coordinate] for coordinate in COORDINATES], axis=1)
+    fractional = np.linalg.solve(matrix, (positions - origin).T).T
+
+    periodic = np.array([prd.startswith("p") for prd in (box.xprd, box.yprd, box.zprd)])
+    images = np.where(periodic, np.floor(fractional), 0.0)
+    positions = positions - images @ matrix.T
+
+    for d, (coordinate, image) in enumerate(zip(COORDINATES, IMAGES)):
+        columns[coordinate] = np.ascontiguousarray(positions[:, d])
+        if periodic[d]:
+            shift = images[:, d].astype(np.int64)
+            columns[image] = columns[image] + shift if image in columns else shift
+    return columns
+
+
+def positions(snapshot: DumpSnapshot, unwrapped: bool = False) -> np.ndarray:
+    """
+    Cartesian positions of the atoms of a snapshot as an (natoms, 3) array
+
+    Wrapped positions are taken from `x`, `y`, `z` or converted from the scaled coordinates, unwrapped
+    positions from `xu`, `yu`, `zu`, the scaled unwrapped coordinates or computed from the image flags
+
+    :param snapshot: Snapshot holding any of the coordinate columns written by LAMMPS
+    :param unwrapped: Return the unwrapped positions
+    """
+    columns = {name: snapshot.column(name) for name in snapshot.column_names if name in COORDINATE_COLUMNS}
+
+    if unwrapped:
+        if not all(name in columns for name in UNWRAPPED):
+            scaled_to_unscaled(columns, snapshot.box, unwrapped=True)
+        if not all(name in columns for name in UNWRAPPED):
+            if not all(name in columns for name in COORDINATES):
+                scaled_to_unscaled(columns, snapshot.box)
+            unwrap(columns, snapshot.box)
+        targets = UNWRAPPED
+    else:
+        if not all(name in columns for name in COORDINATES):
+            scaled_to_unscaled(columns, snapshot.box)
+        if not all(name in columns for name in COORDINATES) and all(name in columns for name in UNWRAPPED):
+            wrapped = wrap({name: columns[source] for name, source in zip(COORDINATES, UNWRAPPED)}, snapshot.box)
+            columns.update({name: wrapped[name] for name in COORDINATES})
+        targets = COORDINATES
+
+    missing = [name for name in targets if name not in columns]
+    if missing:
+        raise KeyError(f"Snapshot {snapshot.timestamp} has no columns to compute {', '.join(missing)}")
+    return np.stack([columns[name] for name in targets], axis=1).astype(np.float64)
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Sequence, Union
 
+import numpy as np
 import pandas as pd
 from pydantic import BaseModel, validator
 
@@ -43,31 +44,81 @@ class SimulationBox(BaseModel):
         return all([self.__dict__[key] == other.__dict__[key] for key in self.__fields_set__])
 
     def __str__(self):
+        """
+        Box bounds as written in a dump file, triclinic boxes as their bounding box followed by the
+        tilt factors `xy`, `xz` and `yz`
+        """
         if self.triclinic:
-            return (
-                f"{self.xlo} {self.xhi} {self.xy}\n"
-                + f"{self.ylo} {self.yhi} {self.yz}\n"
-                + f"{self.zlo} {self.zhi} {self.xz}"
-            )
+            xlo = self.xlo + min(0.0, self.xy, self.xz, self.xy + self.xz)
+            xhi = self.xhi + max(0.0, self.xy, self.xz, self.xy + self.xz)
+            ylo = self.ylo + min(0.0, self.yz)
+            yhi = self.yhi + max(0.0, self.yz)
+            return f"{xlo} {xhi} {self.xy}\n" + f"{ylo} {yhi} {self.xz}\n" + f"{self.zlo} {self.zhi} {self.yz}\n"
         else:
             return f"{self.xlo} {self.xhi}\n" + f"{self.ylo} {self.yhi}\n" + f"{self.zlo} {self.zhi}\n"
 
 
+class AtomsView(Sequence):
+    """
+    Read-only sequence of atoms backed by per column numpy arrays
+
+    `Atom` objects are only created when an element is accessed, so a columnar snapshot
+    never holds more than the arrays themselves
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self._columns = columns
+
+    def __len__(self) -> int:
+        if not self._columns:
+            return 0
+        return len(next(iter(self._columns.values())))
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Atom, List[Atom]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return Atom(**{name: column[index].item() for name, column in self._columns.items()})
+
+    def __iter__(self) -> Iterator[Atom]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other: Sequence) -> bool:
+        return len(self) == len(other) and all([a == b for a, b in zip(self, other)])
+
+
 class DumpSnapshot(BaseModel):
     """
     Generic class to represent a single lammps system snapshot.
-    All the atom data is held in a pandas dataframe for easier processing
+
+    Atoms are either held as a list of `Atom` objects or, for columnar snapshots, as one numpy
+    array per dump column in `columns`. In the columnar case `atoms` is an `AtomsView` that
+    creates `Atom` objects on demand
     """
 
     timestamp: Optional[int] = None
     natoms: Optional[int] = None
     box: Optional[SimulationBox] = None
-    atoms: Optional[List[Atom]] = None
+    columns: Optional[Dict[str, np.ndarray]] = None
+    atoms: Optional[Union[AtomsView, List[Atom]]] = None
     unwrapped: bool = False
 
+    @validator("columns")
+    def column_lengths_must_match_natoms(cls, v: Dict[str, np.ndarray], values: dict, **kwargs):
+        for name, column in v.items():
+            if len(column) != values["natoms"]:
+                raise AssertionError(f"Length of column {name} does not match {values['natoms']}")
+        return v
+
+    @validator("atoms", pre=True, always=True)
+    def atoms_view_from_columns(cls, v, values: dict, **kwargs):
+        if v is None and values.get("columns") is not None:
+            return AtomsView(values["columns"])
+        return v
+
     @validator("atoms")
     def num_atoms_must_match_natoms(cls, v: List[Atom], values: dict, **kwargs):
-        if len(v) != values["natoms"]:
+        if v is not None and len(v) != values["natoms"]:
             raise AssertionError(f"Number of atoms read from file does not match {values['natoms']}")
         return v
 
@@ -87,41 +138,76 @@ class DumpSnapshot(BaseModel):
         )
 
     def __str__(self):
-        timestep_header = "ITEM: TIMESTEP"
-        num_atoms_header = "ITEM: NUMBER OF ATOMS"
-        simbox_header = f"ITEM: BOX BOUNDS {self.box.xprd} {self.box.yprd} {self.box.zprd}"
-        atoms_header = "ITEM: ATOMS " + " ".join(
-            sorted([colname for colname in self.atoms[0].__fields_set__ if colname != "unwrapped"])
-        )
-        atoms = "\n".join([str(atom) for atom in self.atoms]).split("\n")
-
-        return (
-            f"{timestep_header}\n"
-            + f"{self.timestamp}\n"
-            + f"{num_atoms_header}\n"
-            + f"{self.natoms}\n"
-            + f"{simbox_header}\n"
-            + f"{str(self.box)}"
-            + f"{atoms_header}\n"
-            + "\n".join(atoms)
-        )
+        from ..writers.dump import format_snapshot
+
+        return "".join(format_snapshot(self))
 
     def __add__(self, snapshot: DumpSnapshot):
         """
         Add atoms from `snapshot` with `self` while making sure that the timesteps are exactly the same
         """
-        assert snapshot.timestamp == self.timestamp
-        assert snapshot.box == self.box
-        atoms = self.atoms + snapshot.atoms
-        unwrapped = True if self.unwrapped and snapshot.unwrapped else False
-        return DumpSnapshot(
-            timestamp=self.timestamp,
-            natoms=self.natoms + snapshot.natoms,
-            box=self.box,
-            atoms=atoms,
-            unwrapped=unwrapped,
-        )
+        return DumpSnapshot.concatenate([self, snapshot])
+
+    @classmethod
+    def concatenate(cls, snapshots: Sequence[DumpSnapshot]) -> DumpSnapshot:
+        """
+        Merge the atoms of several pieces of the same snapshot, e.g written by different processors,
+        with a single concatenation and validation
+
+        Pieces must share the timestep and the box. The result is columnar if all the pieces holding
+        atoms are columnar with the same columns, pieces without atoms e.g of empty subdomains are
+        not parsed into columns and are left out
+        """
+        first = snapshots[0]
+        for snapshot in snapshots[1:]:
+            assert snapshot.timestamp == first.timestamp
+            assert snapshot.box == first.box
+        natoms = sum(snapshot.natoms for snapshot in snapshots)
+        filled = [snapshot for snapshot in snapshots if snapshot.natoms] or list(snapshots)
+        unwrapped = all(snapshot.unwrapped for snapshot in filled)
+
+        names = filled[0].columns.keys() if filled[0].columnar else None
+        if all(snapshot.columnar and snapshot.columns.keys() == names for snapshot in filled):
+            columns = {name: np.concatenate([snapshot.columns[name] for snapshot in filled]) for name in names}
+            return cls(timestamp=first.timestamp, natoms=natoms, box=first.box, columns=columns, unwrapped=unwrapped)
+
+        atoms = [atom for snapshot in filled if snapshot.natoms for atom in snapshot.atoms]
+        return cls(timestamp=first.timestamp, natoms=natoms, box=first.box, atoms=atoms, unwrapped=unwrapped)
+
+    @property
+    def columnar(self) -> bool:
+        """
+        True if the atom data is held as numpy arrays in `columns`
+        """
+        return self.columns is not None
+
+    @property
+    def column_names(self) -> List[str]:
+        """
+        Names of the dump columns held by the snapshot
+        """
+        if self.columnar:
+            return list(self.columns)
+        if not self.atoms:
+            return []
+        fields = self.atoms[0].__fields_set__
+        return [name for name in Atom.__fields__ if name in fields and name != "unwrapped"]
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Return the values of a single dump column as a numpy array
+
+        For columnar snapshots this is the stored array itself, otherwise it is built from `atoms`
+
+        :param name: Dump column name e.g `x`, `id`
+        """
+        if self.columnar:
+            return self.columns[name]
+        return np.array([atom.__dict__[name] for atom in self.atoms])
 
     @property
     def dataframe(self) -> pd.DataFrame:
+        if self.columnar:
+            # Wrap the column arrays, no data is copied
+            return pd.DataFrame(self.columns, copy=False)
         return pd.DataFrame.from_dict([atom.dict(exclude_unset=True) for atom in self.atoms])
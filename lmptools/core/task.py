@@ -1,28 +1,262 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Set
 
-from ..dump import DumpSnapshot
+import numpy as np
+from pydantic import BaseModel
+
+from .cache import MISSING, ResultCache, file_identity, stable_hash
+from .simulation import DumpSnapshot
 
 
 class Task(ABC):
-    """Base Task class"""
+    """
+    Base Task class
+
+    `Pipeline.execute` shares a task between worker threads, copies it into worker processes and
+    does not run it at all for snapshots whose results are cached. `run` must therefore not keep
+    state across snapshots. Analyses spanning several snapshots return a partial result for each
+    snapshot instead, which the caller combines from the `PipelineResult`s
+    """
 
     @abstractmethod
-    def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> Optional[DumpSnapshot]:
-        """Run method to implement the task"""
+    def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> Any:
+        """
+        Run method to implement the task
+
+        Returning a `DumpSnapshot` hands it to the next task of the pipeline, any other value is
+        collected as the task result and the next task receives the snapshot this task was given
+        """
         raise NotImplementedError
 
+    def params(self) -> Dict[str, Any]:
+        """
+        Parameters of the task, its public attributes by default
+
+        State accumulated while running should be kept in private attributes so that it does not
+        change the fingerprint of the task. Parameters must be JSON serializable values, numpy arrays,
+        sets or pydantic models, tasks holding anything else, e.g functions, override `params`
+        """
+        return {name: value for name, value in vars(self).items() if not name.startswith("_")}
+
+    def fingerprint(self) -> str:
+        """
+        Stable hash of the task class and parameters, used to key cached results
+        """
+        cls = type(self)
+        return stable_hash(f"{cls.__module__}.{cls.__qualname__}", self.params())
+
+
+class PipelineResult(BaseModel):
+    """
+    Output of a pipeline for a single snapshot
+
+    :param timestep: Timestep of the snapshot
+    :param snapshot: Snapshot returned by the last task of the chain, None for cached results
+    :param results: Value returned by every task, in pipeline order
+    :param cached: True if the results were read from a `ResultCache`
+    """
+
+    timestep: Optional[int] = None
+    snapshot: Optional[DumpSnapshot] = None
+    results: List[Any]
+    cached: bool = False
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+def run_tasks(tasks: List[Task], snapshot: DumpSnapshot) -> PipelineResult:
+    """
+    Run `snapshot` through the task chain and collect the task results
+    """
+    results = []
+    for task in tasks:
+        result = task.run(snapshot)
+        results.append(result)
+        if isinstance(result, DumpSnapshot):
+            snapshot = result
+    return PipelineResult(timestep=snapshot.timestamp, snapshot=snapshot, results=results)
+
+
+# Task chain of a worker process, sent once per process instead of once per snapshot
+_worker_tasks: List[Task] = []
+
+
+def _init_worker(tasks: List[Task]) -> None:
+    global _worker_tasks
+    _worker_tasks = tasks
+
+
+def _run_worker(snapshot: DumpSnapshot) -> PipelineResult:
+    return run_tasks(_worker_tasks, snapshot)
+
 
 class Pipeline:
-    def __init__(self, tasks: List[Task] = []):
-        self._tasks = tasks
+    """
+    Chain of tasks run on every snapshot
+
+    :param tasks: [Optional] Tasks run in order on every snapshot
+    """
+
+    def __init__(self, tasks: Optional[List[Task]] = None):
+        self._tasks = list(tasks) if tasks is not None else []
 
-    def run(self, snapshot: Optional[DumpSnapshot], *args, **kwargs):
-        for idx, task in enumerate(self._tasks):
-            snapshot = task.run(snapshot)
+    def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> PipelineResult:
+        """
+        Run the task chain on a single snapshot
+        """
+        return run_tasks(self._tasks, snapshot)
 
     def append(self, task: Task):
         """Add tasks to the pipeline"""
         self._tasks.append(task)
+
+    def execute(
+        self,
+        snapshots: Iterable[DumpSnapshot],
+        workers: int = 1,
+        processes: bool = False,
+        window: Optional[int] = None,
+        ordered: bool = True,
+        cache: Optional[ResultCache] = None,
+    ) -> Iterator[PipelineResult]:
+        """
+        Run the task chain on a stream of snapshots, e.g a `Dump`, in a pool of workers
+
+        Snapshots are independent so several of them go through the chain at the same time. Threads
+        scale across cores when the tasks spend their time in NumPy routines releasing the GIL,
+        processes are needed for pure Python tasks but the tasks and snapshots must be picklable.
+        The tasks are shared by the workers and must not mutate state without locking
+
+        :param snapshots: Snapshots to process
+        :param workers: Number of threads or processes, 1 runs the chain in the calling thread
+        :param processes: Use a process pool instead of a thread pool
+        :param window: Maximum number of snapshots in flight, twice the number of workers by default
+        :param ordered: Yield the results in the order of the snapshots, otherwise as soon as they complete
+        :param cache: [Optional] Cache of the task results, `snapshots` must then be a `Dump`
+        """
+        if cache is not None:
+            yield from self._execute_cached(snapshots, cache, workers, processes, window, ordered)
+            return
+
+        if workers <= 1:
+            for snapshot in snapshots:
+                yield self.run(snapshot)
+            return
+
+        window = max(window or 2 * workers, 1)
+        executor: Executor
+        if processes:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self._tasks,))
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+
+        def submit(snapshot: DumpSnapshot) -> Future:
+            if processes:
+                return executor.submit(_run_worker, snapshot)
+            return executor.submit(run_tasks, self._tasks, snapshot)
+
+        try:
+            if ordered:
+                queue: Deque[Future] = deque()
+                for snapshot in snapshots:
+                    # Reading the stream stops while the window is full
+                    if len(queue) >= window:
+                        yield queue.popleft().result()
+                    queue.append(submit(snapshot))
+                while queue:
+                    yield queue.popleft().result()
+            else:
+                pending: Set[Future] = set()
+                for snapshot in snapshots:
+                    if len(pending) >= window:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                    pending.add(submit(snapshot))
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _execute_cached(
+        self,
+        dump: Any,
+        cache: ResultCache,
+        workers: int,
+        processes: bool,
+        window: Optional[int],
+        ordered: bool,
+    ) -> Iterator[PipelineResult]:
+        """
+        Serve the snapshots whose results are all cached from the cache and only parse and process
+        the other ones
+
+        The cached results are looked up from the frame index of the dump, so cached snapshots are
+        neither parsed nor passed to the callbacks of the dump. Tasks returning a `DumpSnapshot`
+        have their result cached as None
+        """
+        # Snapshots also depend on the parsing options e.g projected columns and atom filter
+        try:
+            identity = stable_hash(file_identity(dump.filename, content_hash=cache.content_hash), dump.options)
+        except TypeError as e:
+            raise TypeError(
+                f"Parsing options of {dump.filename} cannot be part of a cache key, "
+                f"filter atoms with an AtomFilter: {e}"
+            ) from e
+        fingerprints = []
+        for task in self._tasks:
+            # Results also depend on the tasks before them in the chain
+            fingerprints.append(stable_hash(fingerprints[-1] if fingerprints else None, task.fingerprint()))
+
+        index = dump.index
+        selected = dump.selected_frames()
+        positions = np.arange(len(index)) if selected is None else selected
+
+        keys: Dict[int, List[str]] = {}
+        for position in positions.tolist():
+            timestep = int(index.timesteps[position])
+            keys[position] = [cache.key(identity, timestep, position, fingerprint) for fingerprint in fingerprints]
+        hits = {position for position, frame_keys in keys.items() if all(key in cache for key in frame_keys)}
+
+        def cached(position: int) -> PipelineResult:
+            results = [cache.get(key) for key in keys[position]]
+            if any(result is MISSING for result in results):
+                # Evicted or unreadable since the lookup, compute it again
+                return store(position, self.run(dump[position]))
+            return PipelineResult(timestep=int(index.timesteps[position]), results=results, cached=True)
+
+        def store(position: int, result: PipelineResult) -> PipelineResult:
+            for key, value in zip(keys[position], result.results):
+                cache.put(key, None if isinstance(value, DumpSnapshot) else value)
+            return result
+
+        misses = [position for position in positions.tolist() if position not in hits]
+        snapshots = (dump[position] for position in misses)
+        computed = self.execute(snapshots, workers, processes, window, ordered=ordered)
+        if not ordered:
+            for position in sorted(hits):
+                yield cached(position)
+            # Unordered results are matched to their position through the timestep
+            remaining: Dict[int, List[int]] = {}
+            for position in misses:
+                remaining.setdefault(int(index.timesteps[position]), []).append(position)
+            for result in computed:
+                yield store(remaining[result.timestep].pop(0), result)
+            return
+
+        for position in positions.tolist():
+            yield cached(position) if position in hits else store(position, next(computed))
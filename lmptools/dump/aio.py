@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import threading
+from concurrent.futures import TimeoutError
+from typing import Any, Optional
+
+from loguru import logger
+
+from ..core.exceptions import SkipSnapshot
+from ..core.simulation import DumpSnapshot
+from .base import Dump, DumpCallback
+
+# Marks the end of the snapshots in the queue
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def _call(callback: DumpCallback, hook: str, *args, **kwargs) -> Any:
+    """
+    Invoke a callback hook, awaiting it if it is a coroutine function
+    """
+    result = getattr(callback, hook)(*args, **kwargs)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+class AsyncDump:
+    """
+    Asynchronous iterator over the snapshots of a dump file, `async for snapshot in AsyncDump(...)`
+
+    Snapshots are parsed by a background thread, or by `workers` processes driven from that thread,
+    and handed to the event loop through a queue of at most `prefetch` snapshots, so the event loop
+    is never blocked by parsing and several dump files can be served from one loop at once.
+
+    The callback hooks run in the event loop once a snapshot has been received and may be coroutine
+    functions, which are awaited. Snapshots for which a hook raises `SkipSnapshot` are not yielded
+
+    :param filename: Path to the dump file
+    :param callback: [Optional] Callback whose hooks may be plain or coroutine functions
+    :param prefetch: Maximum number of parsed snapshots waiting to be consumed
+    :param workers: Number of worker processes parsing the file, 1 parses in the background thread
+    :param follow: Follow a dump file still being written, see `Dump.follow`
+    :param interval: Seconds between two checks of the file size when following
+    :param timeout: [Optional] Seconds without new data after which following ends
+    :param options: Parsing options passed to `Dump`, e.g `columnar`, `unwrap`, `frames`, `columns`
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        callback: Optional[DumpCallback] = None,
+        prefetch: int = 2,
+        workers: int = 1,
+        follow: bool = False,
+        interval: float = 1.0,
+        timeout: Optional[float] = None,
+        **options,
+    ):
+        self.dump = Dump(filename, **options)
+        self.callback = callback
+        self.prefetch = max(prefetch, 1)
+        self.workers = workers
+        self.follow = follow
+        self.interval = interval
+        self.timeout = timeout
+        self.verbose = self.dump.verbose
+        self._queue: Optional[asyncio.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._done = False
+
+    def _produce(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Parse the snapshots and put them into the queue, run in the background thread
+        """
+        try:
+            if self.follow:
+                snapshots = self.dump.follow(self.interval, self.timeout, stop=self._stop.is_set)
+            else:
+                snapshots = self.dump.iparse(self.workers)
+            for snapshot in snapshots:
+                if not self._put(loop, snapshot):
+                    return
+            self._put(loop, _END)
+        except BaseException as e:
+            self._put(loop, _Failure(e))
+        finally:
+            self.dump.close()
+
+    def _put(self, loop: asyncio.AbstractEventLoop, item: Any) -> bool:
+        """
+        Wait for room in the queue to put `item`, returns False if the iteration was closed meanwhile
+        """
+        if loop.is_closed():
+            return False
+        future = asyncio.run_coroutine_threadsafe(self._queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=0.1)
+                return True
+            except TimeoutError:
+                if self._stop.is_set() or loop.is_closed():
+                    future.cancel()
+                    return False
+
+    def __aiter__(self) -> AsyncDump:
+        return self
+
+    async def __anext__(self) -> DumpSnapshot:
+        if self._done:
+            raise StopAsyncIteration
+        if self._thread is None:
+            self._queue = asyncio.Queue(maxsize=self.prefetch)
+            self._thread = threading.Thread(
+                target=self._produce, args=(asyncio.get_running_loop(),), name=f"AsyncDump-{self.dump.filename}"
+            )
+            self._thread.daemon = True
+            self._thread.start()
+
+        while True:
+            item = await self._queue.get()
+            if item is _END:
+                self._done = True
+                if self.callback:
+                    await _call(self.callback, "on_parse_end")
+                raise StopAsyncIteration
+            if isinstance(item, _Failure):
+                self._done = True
+                raise item.error
+            if await self.replay_callbacks(item):
+                return item
+
+    async def replay_callbacks(self, snapshot: DumpSnapshot) -> bool:
+        """
+        Invoke the callback hooks for a snapshot parsed in the background, awaiting coroutine hooks
+
+        Returns False if one of the hooks raised `SkipSnapshot`
+        """
+        if not self.callback:
+            return True
+        try:
+            await _call(self.callback, "on_snapshot_parse_begin")
+            await _call(self.callback, "on_snapshot_parse_timestamp", timestamp=snapshot.timestamp)
+            await _call(self.callback, "on_snapshot_parse_natoms", natoms=snapshot.natoms)
+            await _call(self.callback, "on_snapshot_parse_box", box=snapshot.box)
+            if snapshot.natoms:
+                await _call(self.callback, "on_snapshot_parse_atoms", snapshot.atoms)
+            await _call(self.callback, "on_snapshot_parse_end", snapshot=snapshot)
+        except SkipSnapshot as e:
+            if self.verbose:
+                logger.info(f"{e}")
+            return False
+        return True
+
+    async def aclose(self) -> None:
+        """
+        Stop parsing and wait for the background thread to end
+        """
+        self._done = True
+        self._stop.set()
+        if self._thread is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+            self._thread = None
+        else:
+            self.dump.close()
+
+    async def __aenter__(self) -> AsyncDump:
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
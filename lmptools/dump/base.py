@@ -1,15 +1,27 @@
 from __future__ import annotations
 
+import copy
+import mmap
 import os
+import time
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
 
+import numpy as np
 from loguru import logger
 from pydantic import parse_obj_as
 
+from ..core import coordinates
 from ..core.atom import Atom
 from ..core.exceptions import SkipSnapshot
-from ..core.simulation import DumpSnapshot, SimulationBox
+from ..core.simulation import AtomsView, DumpSnapshot, SimulationBox
+from .block import parse_atoms_block
+from .compression import detect_compression, open_dump
+from .filters import AtomPredicate, FrameFilter
+from .index import FrameIndex
+from .profiling import ParseStats
 
 
 class DumpFileParser(ABC):
@@ -20,9 +32,24 @@ class DumpFileParser(ABC):
 
     :param filename: Path to the dump file to be parsed
     :param callback: [Optional] Callback to be used during parsing
+    :param unwrap: Unwrap atom coordinates using the image flags
+    :param verbose: Log skipped snapshots
+    :param columnar: Hold the atom data of each snapshot as one numpy array per dump column
+    :param memory_map: Read the dump file through a read-only memory map, ignored for compressed files
+
+    Dump files compressed with gzip, bz2, xz or zstd are detected from their magic bytes and
+    decompressed while they are read
     """
 
-    def __init__(self, filename: str, callback: DumpCallback = None, unwrap: bool = False, verbose: bool = False):
+    def __init__(
+        self,
+        filename: str,
+        callback: DumpCallback = None,
+        unwrap: bool = False,
+        verbose: bool = False,
+        columnar: bool = False,
+        memory_map: bool = False,
+    ):
         self.filename = filename
         if not os.path.exists(filename):
             raise FileNotFoundError(f"Dump file {filename} not found")
@@ -30,8 +57,77 @@ class DumpFileParser(ABC):
         self.callback = callback
         self.unwrap = unwrap
         self.verbose = verbose
+        self.columnar = columnar
+        self.memory_map = memory_map
+        self.compression = detect_compression(filename)
+
+        if self.compression is not None:
+            self.file = open_dump(self.filename)
+        elif memory_map and os.path.getsize(filename):
+            # The map keeps its own reference to the file, processes mapping the same file share
+            # the pages held in the OS page cache
+            with open(self.filename, "rb") as f:
+                self.file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.file = open(self.filename, "rb")
 
-        self.file = open(self.filename)
+    def read_atom_lines(self, natoms: int) -> bytes:
+        """
+        Read the `natoms` atom lines following the `ITEM: ATOMS` header as a single block
+        """
+        if isinstance(self.file, mmap.mmap):
+            # The block ends where the next snapshot starts, found without splitting any lines
+            start = self.file.tell()
+            end = self.file.find(b"ITEM:", start)
+            end = len(self.file) if end == -1 else end
+            block = self.file[start:end]
+            if block.count(b"\n") != natoms:
+                end = start
+                for _ in range(natoms):
+                    position = self.file.find(b"\n", end)
+                    end = len(self.file) if position == -1 else position + 1
+                block = self.file[start:end]
+            self.file.seek(end)
+            return block
+        return b"".join(islice(self.file, natoms))
+
+    def skip_atom_lines(self, natoms: int) -> None:
+        """
+        Move past the `natoms` atom lines following the `ITEM: ATOMS` header without converting them
+        """
+        if isinstance(self.file, mmap.mmap):
+            end = self.file.find(b"ITEM:", self.file.tell())
+            self.file.seek(len(self.file) if end == -1 else end)
+        else:
+            deque(islice(self.file, natoms), maxlen=0)
+
+    def close(self) -> None:
+        """
+        Close the dump file, the parser can not be used anymore
+        """
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def skip_atoms_header(self) -> None:
+        """
+        Move past the `ITEM: ATOMS` header of a snapshot without atoms, if there is one
+
+        LAMMPS writes the header of empty snapshots, older files written by lmptools may not have it
+        """
+        marker = b"ITEM: ATOMS"
+        if isinstance(self.file, mmap.mmap):
+            start = self.file.tell()
+            found = self.file.find(marker, start, start + len(marker)) == start
+        else:
+            found = self.file.peek(len(marker)).startswith(marker)
+        if found:
+            self.file.readline()
 
     @abstractmethod
     def parse(self) -> Optional[DumpSnapshot]:
@@ -106,10 +202,36 @@ class DumpCallback(ABC):
         """
         pass
 
+    def on_parse_end(self, *args, **kwargs):
+        """
+        Method called once every snapshot of the dump file has been parsed
+        """
+        pass
+
 
 class Dump(DumpFileParser):
     """
     Dump class to parse LAMMPS dump files
+
+    Snapshots are read one after the other by iterating over the dump. Random access with
+    `dump[i]`, `dump.nframes` and `dump.at_timestep(t)` goes through a `FrameIndex` that is built on
+    first use and persisted next to the dump file unless `persist_index` is False. The dump has no
+    `len()`, `list(dump)` would otherwise scan the whole file for its index before reading it
+
+    Snapshots rejected by `frames` are skipped from their header alone, none of the callbacks are
+    invoked for them
+
+    With `profile`, or `progress` seconds between progress logs, the time spent in every parsing
+    stage and callback hook is gathered in `stats`. Snapshots parsed by worker processes are only
+    counted, their stages are not timed
+
+    Only the dump `columns` asked for are converted, in that order, along with the unwrapped
+    coordinates when unwrapping. Atoms rejected by `where`, an `AtomFilter` or a function returning
+    the mask of the atoms to keep from the raw column values, are dropped from the atom block before
+    any snapshot is created and `natoms` of the snapshot is the number of atoms kept. The hooks
+    called before the atoms are parsed still see the number of atoms written in the file. Worker
+    processes receive `where` pickled, so only an `AtomFilter` or a module level function can be used
+    with workers, and only an `AtomFilter` can be part of the key of a `ResultCache`
     """
 
     def __init__(
@@ -118,37 +240,261 @@ class Dump(DumpFileParser):
         callback: Optional[DumpCallback] = None,
         unwrap: bool = False,
         verbose: bool = False,
+        columnar: bool = False,
+        persist_index: bool = True,
+        memory_map: bool = False,
+        frames: Optional[FrameFilter] = None,
+        profile: bool = False,
+        progress: Optional[float] = None,
+        columns: Optional[Sequence[str]] = None,
+        where: Optional[AtomPredicate] = None,
     ):
-        super().__init__(filename, callback, unwrap, verbose)
+        super().__init__(filename, callback, unwrap, verbose, columnar, memory_map)
+        self.persist_index = persist_index
+        self.frames = frames
+        self.columns = list(columns) if columns is not None else None
+        self.where = where
+        self._index: Optional[FrameIndex] = None
+        self._sidecar_checked = False
+        self._frame_number = 0
+
+        self.stats: Optional[ParseStats] = None
+        if profile or progress is not None:
+            # The decompressed size of compressed files is only known from an existing frame index
+            index = self.cached_index()
+            total_bytes = os.path.getsize(filename) if self.compression is None else index and index.length
+            self.stats = ParseStats(total_bytes=total_bytes, progress=progress)
+
+    @property
+    def index(self) -> FrameIndex:
+        """
+        Frame index of the dump file, built or loaded on first access
+        """
+        if self._index is None or not self._index.matches(self.filename):
+            self._index = FrameIndex.for_file(self.filename, persist=self.persist_index)
+        return self._index
+
+    def cached_index(self) -> Optional[FrameIndex]:
+        """
+        Frame index of the dump file if it is available without scanning the file, None otherwise
+        """
+        if self._index is None and not self._sidecar_checked:
+            self._sidecar_checked = True
+            path = FrameIndex.sidecar(self.filename)
+            if os.path.exists(path):
+                try:
+                    self._index = FrameIndex.load(path)
+                except Exception as e:
+                    logger.debug(f"Ignoring frame index {path}, {e}")
+
+        if self._index is not None and self._index.matches(self.filename):
+            return self._index
+        return None
+
+    @property
+    def nframes(self) -> int:
+        """
+        Number of snapshots in the dump file, read from the frame index
+        """
+        return len(self.index)
+
+    def __getitem__(self, index: int) -> DumpSnapshot:
+        """
+        Parse the snapshot at position `index` without reading the snapshots before it
+        """
+        offsets = self.index.offsets
+        if not -len(offsets) <= index < len(offsets):
+            raise IndexError(f"Snapshot index {index} out of range")
+        return self.read_at(int(offsets[index]))
+
+    def at_timestep(self, timestep: int) -> DumpSnapshot:
+        """
+        Parse the first snapshot written at `timestep`
+        """
+        position = self.index.position(timestep)
+        if position is None:
+            raise KeyError(f"Timestep {timestep} not found in {self.filename}")
+        return self[position]
+
+    def read_at(self, offset: int) -> Optional[DumpSnapshot]:
+        """
+        Parse the snapshot starting at byte `offset`, the position of the iterator is left unchanged
+        """
+        position = self.file.tell()
+        try:
+            self.file.seek(offset)
+            return self.parse_snapshot()
+        finally:
+            self.file.seek(position)
 
     def __iter__(self):
         return self
 
-    def __next__(self) -> Optional[DumpSnapshot]:
-        try:
-            snapshot = self.parse_snapshot()
-            if snapshot:
+    def __next__(self) -> DumpSnapshot:
+        while True:
+            offset = self.file.tell()
+            snapshot = self.step(offset)
+            if snapshot is not None:
                 return snapshot
-            else:
+            if self.file.tell() == offset:
+                # Invoke on_parse_end callback
+                self._invoke("on_parse_end")
                 raise StopIteration
+
+    def step(self, offset: int) -> Optional[DumpSnapshot]:
+        """
+        Parse the snapshot starting at byte `offset`, the current position
+
+        Returns None if the snapshot was skipped, by the frame filter or a callback, or at the end of
+        the file in which case the position is left unchanged
+        """
+        if self.frames is not None and not self.accept_snapshot(offset):
+            return None
+
+        try:
+            snapshot = self.parse_snapshot()
         except SkipSnapshot as e:
             if self.verbose:
                 logger.info(f"{e}")
-                # Skip the remaining lines until next line starting with ITEM: TIMESTEP\n is read
-                while True:
-                    line = self.file.readline()
-                    if line == "ITEM: TIMESTEP\n":
-                        cur_pos = self.file.tell()
-                        self.file.seek(cur_pos - len("ITEM: TIMESTEP\n"))
-                        break
-                    elif line == "":
-                        # EOF is reached
-                        break
+            self.skip_snapshot(offset)
+            self._frame_number += 1
+            return None
+
+        if snapshot:
+            self._frame_number += 1
+        return snapshot
+
+    def frame_end(self, offset: int, chunk_size: int = 1 << 20) -> Optional[int]:
+        """
+        Byte offset right after the snapshot starting at `offset` if it is completely written, None
+        if the file ends before, e.g while LAMMPS is still writing it. The position is left unchanged
+
+        Complete lines are counted without converting them, every snapshot has 9 lines of headers and
+        box bounds followed by one line per atom
+        """
+        self.file.seek(offset)
+        try:
+            header = [self.file.readline() for _ in range(4)]
+            if not header[-1].endswith(b"\n"):
+                return None
+            remaining = 5 + int(header[-1])
+            position = self.file.tell()
+            while True:
+                chunk = self.file.read(chunk_size)
+                if not chunk:
+                    return None
+                count = chunk.count(b"\n")
+                if count >= remaining:
+                    end = -1
+                    for _ in range(remaining):
+                        end = chunk.index(b"\n", end + 1)
+                    return position + end + 1
+                remaining -= count
+                position += len(chunk)
+        finally:
+            self.file.seek(offset)
+
+    def follow(
+        self, interval: float = 1.0, timeout: Optional[float] = None, stop: Optional[Callable[[], bool]] = None
+    ) -> Iterator[DumpSnapshot]:
+        """
+        Iterate over the snapshots of a dump file that is still being written, e.g by a running simulation
+
+        Every snapshot is parsed and passed to the callbacks as soon as all its atom lines are written.
+        At the end of the file or of the written part of the last snapshot, the file size is polled
+        every `interval` seconds and parsing resumes from the start of that snapshot, without reading
+        the snapshots before it again. Following ends once the file has not grown for `timeout` seconds
+
+        :param interval: Seconds between two checks of the file size
+        :param timeout: [Optional] Seconds without new data after which following ends, never by default
+        :param stop: [Optional] Function checked while waiting, following ends once it returns True
+        """
+        if self.compression is not None:
+            raise ValueError(f"Compressed dump file {self.filename} can not be followed")
+
+        # Size of the file as seen by the parser, a memory map does not grow with the file
+        size = len(self.file) if isinstance(self.file, mmap.mmap) else os.path.getsize(self.filename)
+        grown = time.monotonic()
+        while True:
+            offset = self.file.tell()
+            if self.frame_end(offset) is not None:
+                snapshot = self.step(offset)
+                if snapshot is not None:
+                    yield snapshot
+                continue
+
+            # Wait for the rest of the snapshot
+            while os.path.getsize(self.filename) <= size:
+                if (timeout is not None and time.monotonic() - grown >= timeout) or (stop is not None and stop()):
+                    # Invoke on_parse_end callback
+                    self._invoke("on_parse_end")
+                    return
+                time.sleep(interval)
+            size = os.path.getsize(self.filename)
+            grown = time.monotonic()
+            if self.memory_map:
+                self.file.close()
+                with open(self.filename, "rb") as f:
+                    self.file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.file.seek(offset)
+
+    def accept_snapshot(self, offset: int) -> bool:
+        """
+        Apply the frame filter to the snapshot starting at byte `offset` using its timestep only
+
+        Rejected snapshots are skipped, accepted ones are left to be parsed
+        """
+        if not self.file.readline():
+            # EOF, let parse_snapshot end the iteration
+            self.file.seek(offset)
+            return True
+
+        timestep = int(self.file.readline().split()[0])
+        if self.frames.accepts(self._frame_number, timestep):
+            self.file.seek(offset)
+            return True
+
+        self.skip_snapshot(offset)
+        self._frame_number += 1
+        return False
+
+    def skip_snapshot(self, offset: int) -> None:
+        """
+        Move to the snapshot following the one starting at byte `offset`
+
+        With a frame index this is a single seek, otherwise the number of atoms is read from the
+        header and the atom lines are skipped without being converted
+        """
+        index = self.cached_index()
+        if index is not None:
+            position = int(np.searchsorted(index.offsets, offset))
+            if position < len(index) and index.offsets[position] == offset:
+                following = index.offsets[position + 1] if position + 1 < len(index) else index.length
+                self.file.seek(int(following))
+                return
+
+        self.file.seek(offset)
+        for _ in range(3):
+            self.file.readline()
+        natoms = int(self.file.readline())
+        # Box bounds header and dimensions
+        for _ in range(4):
+            self.file.readline()
+        if natoms:
+            self.file.readline()
+            self.skip_atom_lines(natoms)
+        else:
+            self.skip_atoms_header()
 
     def parse_snapshot(self) -> Optional[DumpSnapshot]:
         """
         Read the dump file and return a single snapshot
         """
+        stats = self.stats
+        if stats is not None:
+            stats.start()
+            position = self.file.tell()
+
         snap: dict = {}
         item = self.file.readline()  # +1
 
@@ -156,113 +502,253 @@ class Dump(DumpFileParser):
             return None
 
         # Invoke on_snapshot_parse_begin callback
-        if self.callback:
-            self.callback.on_snapshot_parse_begin()
+        self._invoke("on_snapshot_parse_begin")
 
         timestamp = int(self.file.readline().split()[0])  # +1
         snap["timestamp"] = timestamp
 
         # Invoke on_snapshot_parse_timestamp callback
-        if self.callback:
-            self.callback.on_snapshot_parse_timestamp(timestamp=timestamp)
+        self._invoke("on_snapshot_parse_timestamp", timestamp=timestamp)
 
         item = self.file.readline()
         natoms = int(self.file.readline())  # +1
         snap["natoms"] = natoms
+        if stats is not None:
+            stats.lap("header")
 
         # Invoke on_snapshot_parse_natoms callback
-        if self.callback:
-            self.callback.on_snapshot_parse_natoms(natoms=natoms)
+        self._invoke("on_snapshot_parse_natoms", natoms=natoms)
 
-        item = self.file.readline()  # +1
-        words = item.split("BOUNDS ")
+        item = self.file.readline().decode()  # +1
+        # ITEM: BOX BOUNDS [xy xz yz] pp pp pp, the periodicities are always the last three words
+        words = item.split("BOUNDS")[1].split()
 
         # Simulation box periodicity (pp, ps ..)
-        box_periodicities = words[1].strip().split()
+        box_periodicities = words[-3:]
 
         # Read in box dimensions
         box_dimensions: dict = {}
         box_dimensions["xprd"] = box_periodicities[0]
         box_dimensions["yprd"] = box_periodicities[1]
         box_dimensions["zprd"] = box_periodicities[2]
-        if len(words) == 1:
-            pass
-        else:
-            boxstr = words[1].strip()
-            if "xy" in boxstr:
-                box_dimensions["triclinic"] = True
+        triclinic = "xy" in words
+        if triclinic:
+            box_dimensions["triclinic"] = True
 
         # xlo, xhi, xy
         words = self.file.readline().split()  # +1
-        if len(words) == 2:
-            box_dimensions["xlo"] = float(words[0])
-            box_dimensions["xhi"] = float(words[1])
-            box_dimensions["xy"] = 0.0
-        else:
-            box_dimensions["xlo"] = float(words[0])
-            box_dimensions["xhi"] = float(words[1])
-            box_dimensions["xy"] = float(words[2])
+        box_dimensions["xlo"] = float(words[0])
+        box_dimensions["xhi"] = float(words[1])
+        box_dimensions["xy"] = float(words[2]) if len(words) > 2 else 0.0
 
         # ylo, yhi, xz
         words = self.file.readline().split()  # +1
-        if len(words) == 2:
-            box_dimensions["ylo"] = float(words[0])
-            box_dimensions["yhi"] = float(words[1])
-            box_dimensions["xz"] = 0.0
-        else:
-            box_dimensions["ylo"] = float(words[0])
-            box_dimensions["yhi"] = float(words[1])
-            box_dimensions["xz"] = float(words[2])
+        box_dimensions["ylo"] = float(words[0])
+        box_dimensions["yhi"] = float(words[1])
+        box_dimensions["xz"] = float(words[2]) if len(words) > 2 else 0.0
 
         # zlo, zhi, yz
         words = self.file.readline().split()  # +1
-        if len(words) == 2:
-            box_dimensions["zlo"] = float(words[0])
-            box_dimensions["zhi"] = float(words[1])
-            box_dimensions["yz"] = 0.0
-        else:
-            box_dimensions["zlo"] = float(words[0])
-            box_dimensions["zhi"] = float(words[1])
-            box_dimensions["yz"] = float(words[2])
+        box_dimensions["zlo"] = float(words[0])
+        box_dimensions["zhi"] = float(words[1])
+        box_dimensions["yz"] = float(words[2]) if len(words) > 2 else 0.0
+
+        if triclinic:
+            # Triclinic dumps hold the bounding box of the tilted cell, recover the cell itself
+            xy, xz, yz = box_dimensions["xy"], box_dimensions["xz"], box_dimensions["yz"]
+            box_dimensions["xlo"] -= min(0.0, xy, xz, xy + xz)
+            box_dimensions["xhi"] -= max(0.0, xy, xz, xy + xz)
+            box_dimensions["ylo"] -= min(0.0, yz)
+            box_dimensions["yhi"] -= max(0.0, yz)
 
         snap["box"] = SimulationBox(**box_dimensions)
+        if stats is not None:
+            stats.lap("box")
 
         # Invoke on_snapshot_parse_box callback
-        if self.callback:
-            self.callback.on_snapshot_parse_box(box=snap["box"])
+        self._invoke("on_snapshot_parse_box", box=snap["box"])
 
+        snap["unwrapped"] = self.unwrap
         atoms: List[Atom] = []
         if natoms:
-            column_names = self.file.readline().split()[2:]  # +1
-            for _ in range(0, natoms):
-                row = {}
-                for cname, value in zip(column_names, self.file.readline().split()):  # +natoms times
-                    row[cname] = float(value)
-                atom = parse_obj_as(Atom, row)
-                # Unwrap coordinates
+            columns = self.parse_columns(natoms)
+            if self.where is not None:
+                snap["natoms"] = len(next(iter(columns.values()))) if columns else 0
+            if stats is not None:
+                stats.lap("atoms")
+            # Unwrap coordinates
+            if self.unwrap:
+                coordinates.unwrap(columns, snap["box"])
+                if self.columns is not None:
+                    columns = self.project(columns)
+                if stats is not None:
+                    stats.lap("unwrap")
+        else:
+            self.skip_atoms_header()
+
+        if natoms and self.columnar:
+            snap["columns"] = columns
+            # Invoke on_snapshot_parse_atoms callback
+            if self.callback:
+                self._invoke("on_snapshot_parse_atoms", AtomsView(columns))
+        elif natoms:
+            column_names = list(columns.keys())
+            for values in zip(*[column.tolist() for column in columns.values()]):
+                row = dict(zip(column_names, values))
                 if self.unwrap:
-                    atom.unwrap(snap["box"].Lx, snap["box"].Ly, snap["box"].Lz)
-                atoms.append(atom)
+                    row["unwrapped"] = True
+                atoms.append(parse_obj_as(Atom, row))
 
             snap["atoms"] = atoms
+            if stats is not None:
+                stats.lap("atom objects")
             # Invoke on_snapshot_parse_atoms callback
-            if self.callback:
-                self.callback.on_snapshot_parse_atoms(atoms)
+            self._invoke("on_snapshot_parse_atoms", atoms)
 
         # Create the snapshot
         snapshot = parse_obj_as(DumpSnapshot, snap)
+        if stats is not None:
+            stats.lap("validation")
 
         # Invoke on_snapshot_parse_end callback
-        if self.callback:
-            self.callback.on_snapshot_parse_end(snapshot=snapshot)
+        self._invoke("on_snapshot_parse_end", snapshot=snapshot)
 
+        if stats is not None:
+            stats.frame_done(natoms, self.file.tell() - position)
         return snapshot
 
-    def parse(self) -> None:
+    def _invoke(self, hook: str, *args, **kwargs) -> None:
+        """
+        Invoke a callback hook, timing it when profiling
+        """
+        if not self.callback:
+            return
+        if self.stats is None:
+            getattr(self.callback, hook)(*args, **kwargs)
+        else:
+            self.stats.timed_call(f"callback.{hook}", getattr(self.callback, hook), *args, **kwargs)
+
+    def parse_columns(self, natoms: int) -> Dict[str, np.ndarray]:
+        """
+        Read the `ITEM: ATOMS` header and the atom lines of a snapshot as one block and convert them
+        into one contiguous numpy array per column
+        """
+        column_names = self.file.readline().decode().split()[2:]  # +1
+        block = self.read_atom_lines(natoms)  # +natoms
+        names = self.columns
+        if names is not None and self.unwrap:
+            # Unwrapped coordinates are computed from the coordinates and image flags
+            sources = [name for name in coordinates.COORDINATES + coordinates.IMAGES if name in column_names]
+            names = [name for name in names if name in column_names or name not in coordinates.UNWRAPPED]
+            names += [name for name in sources if name not in names]
+        return parse_atoms_block(block, column_names, natoms, names, self.where)
+
+    def project(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Keep the columns asked for, in their order, followed by the unwrapped coordinates
+        """
+        names = [name for name in self.columns if name in columns]
+        names += [name for name in coordinates.UNWRAPPED if name in columns and name not in names]
+        return {name: columns[name] for name in names}
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        """
+        Parsing options used to recreate this dump inside worker processes
+        """
+        return {
+            "unwrap": self.unwrap,
+            "columnar": self.columnar,
+            "persist_index": False,
+            "memory_map": self.memory_map,
+            "columns": self.columns,
+            "where": self.where,
+        }
+
+    def selected_frames(self) -> Optional[np.ndarray]:
+        """
+        Positions of the snapshots kept by the frame filter, None if every snapshot is kept
+        """
+        if self.frames is None:
+            return None
+        return np.flatnonzero(self.frames.mask(self.index.timesteps))
+
+    def replay_callbacks(self, snapshot: DumpSnapshot) -> bool:
+        """
+        Invoke the callback hooks for a snapshot that was parsed elsewhere, e.g in a worker process
+
+        Returns False if one of the hooks raised `SkipSnapshot`
+        """
+        if not self.callback:
+            return True
+        try:
+            self._invoke("on_snapshot_parse_begin")
+            self._invoke("on_snapshot_parse_timestamp", timestamp=snapshot.timestamp)
+            self._invoke("on_snapshot_parse_natoms", natoms=snapshot.natoms)
+            self._invoke("on_snapshot_parse_box", box=snapshot.box)
+            if snapshot.natoms:
+                self._invoke("on_snapshot_parse_atoms", snapshot.atoms)
+            self._invoke("on_snapshot_parse_end", snapshot=snapshot)
+        except SkipSnapshot as e:
+            if self.verbose:
+                logger.info(f"{e}")
+            return False
+        return True
+
+    def iparse(self, workers: int = 1, prefetch: int = 2) -> Iterator[DumpSnapshot]:
+        """
+        Iterate over the snapshots of the dump file, parsing them in `workers` processes
+
+        The file is split into frame aligned byte ranges that are parsed in a process pool. Snapshots
+        are yielded in file order after the callback hooks have been invoked on them
+
+        :param workers: Number of worker processes, 1 parses in the calling process
+        :param prefetch: Number of byte ranges parsed ahead of the consumer in addition to one per worker
+        """
+        if workers <= 1:
+            yield from self
+            return
+
+        from .parallel import frame_ranges, parallel_parse
+
+        ranges = frame_ranges(self.index, selected=self.selected_frames())
+        for snapshot in parallel_parse(self.filename, self.options, ranges, workers, prefetch):
+            if self.stats is not None:
+                self.stats.frame_done(snapshot.natoms or 0, 0)
+            if self.replay_callbacks(snapshot):
+                yield snapshot
+
+        # Invoke on_parse_end callback
+        self._invoke("on_parse_end")
+
+    def parse(
+        self, workers: int = 1, prefetch: int = 2, reducer: Optional[Callable] = None, initial: Any = None
+    ) -> Optional[List[Any]]:
         """
         Method to parse all the snapshots and optionally persist in file/db
+
+        With a `reducer`, each worker folds the snapshots of its part of the file with
+        `accumulator = reducer(accumulator, snapshot)` starting from `initial` and the per worker
+        accumulators are returned in file order. Callbacks are not invoked in that case. A single
+        worker reduces in the calling process, starting from a copy of `initial`
+
+        :param workers: Number of worker processes used to parse the file
+        :param prefetch: Number of byte ranges parsed ahead of the callbacks in addition to one per worker
+        :param reducer: [Optional] Picklable function folding snapshots into an accumulator
+        :param initial: Initial value of the accumulator of every worker
         """
+        if reducer is not None:
+            from .parallel import frame_ranges, parallel_reduce, reduce_frames
+
+            ranges = frame_ranges(self.index, nranges=max(workers, 1), selected=self.selected_frames())
+            if workers <= 1:
+                return [
+                    reduce_frames(self.filename, self.options, offsets, reducer, copy.deepcopy(initial))
+                    for offsets in ranges
+                ]
+            return parallel_reduce(self.filename, self.options, ranges, workers, reducer, initial)
+
         # Iterate over self while invoking the callbacks if provided
-        for _ in self:
+        for _ in self.iparse(workers, prefetch):
             pass
         return None
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+from ..core.simulation import DumpSnapshot, SimulationBox
+from .filters import FrameFilter
+
+MANIFEST = "manifest.json"
+FORMAT_NAME = "lmptools-binary"
+FORMAT_VERSION = 1
+
+# One row per snapshot, the atoms of a snapshot are rows [start, start + natoms) of every column file
+FRAME_DTYPE = np.dtype(
+    [
+        ("timestep", np.int64),
+        ("natoms", np.int64),
+        ("start", np.int64),
+        ("bounds", np.float64, (6,)),
+        ("tilt", np.float64, (3,)),
+        ("periodicity", "U8", (3,)),
+        ("triclinic", np.bool_),
+        ("unwrapped", np.bool_),
+    ]
+)
+
+
+def column_path(path: str, name: str) -> str:
+    return os.path.join(path, f"column.{name}.npy")
+
+
+def convert(
+    filename: str,
+    path: str,
+    unwrap: bool = False,
+    frames: Optional[FrameFilter] = None,
+    overwrite: bool = False,
+) -> BinaryDump:
+    """
+    Convert a dump file into a binary trajectory directory that opens without parsing
+
+    Every dump column is written to its own `.npy` file holding the atoms of all snapshots one after
+    the other. The timestep, number of atoms, first row and box of each snapshot are stored in a
+    small frame table, and the manifest written last marks the conversion as complete
+
+    :param filename: Path to the dump file, compressed files are supported
+    :param path: Directory the binary trajectory is written to
+    :param unwrap: Store the unwrapped coordinates computed from the image flags
+    :param frames: [Optional] Convert only the snapshots kept by this filter
+    :param overwrite: Replace an existing directory at `path`
+    """
+    from .base import Dump
+
+    if os.path.exists(path):
+        if not overwrite:
+            raise FileExistsError(f"Binary trajectory {path} already exists")
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+    dump = Dump(filename, unwrap=unwrap, columnar=True, frames=frames)
+    try:
+        selected = dump.selected_frames()
+        natoms = dump.index.natoms if selected is None else dump.index.natoms[selected]
+        total = int(natoms.sum())
+
+        table = np.zeros(len(natoms), dtype=FRAME_DTYPE)
+        columns: Dict[str, np.memmap] = {}
+        present: Dict[str, np.ndarray] = {}
+        start = 0
+        nframes = 0
+        for snapshot in dump:
+            box = snapshot.box
+            table[nframes] = (
+                snapshot.timestamp,
+                snapshot.natoms,
+                start,
+                (box.xlo, box.xhi, box.ylo, box.yhi, box.zlo, box.zhi),
+                (box.xy, box.xz, box.yz),
+                (box.xprd, box.yprd, box.zprd),
+                box.triclinic,
+                snapshot.unwrapped,
+            )
+            for name, values in (snapshot.columns or {}).items():
+                if name not in columns:
+                    # Column files are sized for the whole trajectory on first use
+                    columns[name] = np.lib.format.open_memmap(
+                        column_path(path, name), mode="w+", dtype=values.dtype, shape=(total,)
+                    )
+                    present[name] = np.zeros(len(table), dtype=np.bool_)
+                columns[name][start:][: snapshot.natoms] = values
+                present[name][nframes] = True
+            start += snapshot.natoms
+            nframes += 1
+    finally:
+        dump.file.close()
+
+    for column in columns.values():
+        column.flush()
+    del columns
+
+    np.save(os.path.join(path, "frames.npy"), table[:nframes])
+    names = list(present.keys())
+    mask = np.stack([present[name][:nframes] for name in names], axis=1) if names else np.zeros((nframes, 0), bool)
+    np.save(os.path.join(path, "mask.npy"), mask)
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "source": os.path.abspath(filename),
+        "nframes": nframes,
+        "natoms": start,
+        "columns": names,
+    }
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    return BinaryDump(path)
+
+
+class BinaryDump:
+    """
+    Reader for binary trajectories written by `convert`
+
+    Opening only loads the manifest and the frame table, the column files are memory mapped so a
+    snapshot is read by copying its rows out of the maps. Snapshots are the same columnar
+    `DumpSnapshot` objects returned by `Dump(columnar=True)`
+
+    :param path: Directory holding the binary trajectory
+    :param copy: Copy the atom data of a snapshot out of the memory maps, otherwise the columns
+                 of the snapshots are read-only views into the maps
+    """
+
+    def __init__(self, path: str, copy: bool = True):
+        manifest_path = os.path.join(path, MANIFEST)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"Binary trajectory manifest {manifest_path} not found")
+
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != FORMAT_NAME or self.manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} binary trajectory")
+
+        self.path = path
+        self.copy = copy
+        self.table = np.load(os.path.join(path, "frames.npy"))
+        self.mask = np.load(os.path.join(path, "mask.npy"))
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.load(column_path(path, name), mmap_mode="r") for name in self.manifest["columns"]
+        }
+
+    @property
+    def timesteps(self) -> np.ndarray:
+        return self.table["timestep"]
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __getitem__(self, index: int) -> DumpSnapshot:
+        if not -len(self) <= index < len(self):
+            raise IndexError(f"Snapshot index {index} out of range")
+        frame = self.table[index]
+        natoms = int(frame["natoms"])
+        start = int(frame["start"])
+
+        xlo, xhi, ylo, yhi, zlo, zhi = frame["bounds"].tolist()
+        xy, xz, yz = frame["tilt"].tolist()
+        xprd, yprd, zprd = frame["periodicity"].tolist()
+        box = SimulationBox(
+            xprd=xprd,
+            yprd=yprd,
+            zprd=zprd,
+            xlo=xlo,
+            xhi=xhi,
+            ylo=ylo,
+            yhi=yhi,
+            zlo=zlo,
+            zhi=zhi,
+            xy=xy,
+            xz=xz,
+            yz=yz,
+            triclinic=bool(frame["triclinic"]),
+        )
+
+        columns = None
+        if natoms:
+            columns = {}
+            for name, present in zip(self.columns, self.mask[index]):
+                if present:
+                    values = self.columns[name][start:][:natoms]
+                    columns[name] = np.array(values) if self.copy else values
+
+        return DumpSnapshot(
+            timestamp=int(frame["timestep"]),
+            natoms=natoms,
+            box=box,
+            columns=columns,
+            unwrapped=bool(frame["unwrapped"]),
+        )
+
+    def at_timestep(self, timestep: int) -> DumpSnapshot:
+        """
+        Return the first snapshot written at `timestep`
+        """
+        matches = np.flatnonzero(self.timesteps == timestep)
+        if not len(matches):
+            raise KeyError(f"Timestep {timestep} not found in {self.path}")
+        return self[int(matches[0])]
+
+    def __iter__(self) -> Iterator[DumpSnapshot]:
+        for index in range(len(self)):
+            yield self[index]
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import warnings
+from typing import Callable, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from ..core.atom import column_dtype
+
+
+def parse_atoms_block(
+    block: bytes,
+    column_names: List[str],
+    natoms: int,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[Callable[[Mapping[str, np.ndarray]], np.ndarray]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Convert the `ITEM: ATOMS` lines of a snapshot into numpy arrays in a single call
+
+    The whole block is parsed into one (natoms, ncolumns) array which is then split by the
+    column header. Integer valued columns (id, type, mol, image flags) are cast to int64,
+    all other columns are kept as float64
+
+    With `where`, the rows of the atoms to keep are selected on the raw float64 array before the
+    columns are split, and only the `columns` asked for are copied out of it
+
+    :param block: Raw bytes of the `natoms` atom lines
+    :param column_names: Column names read from the `ITEM: ATOMS` header
+    :param natoms: Number of atoms in the snapshot
+    :param columns: [Optional] Columns to return in this order, all the columns by default
+    :param where: [Optional] Function returning the mask of the atoms to keep from the raw column values
+    """
+    ncolumns = len(column_names)
+    with warnings.catch_warnings():
+        # numpy warns instead of raising on malformed input, the size check below catches it
+        warnings.simplefilter("ignore", DeprecationWarning)
+        data = np.fromstring(block, dtype=np.float64, sep=" ")
+
+    if data.size != natoms * ncolumns:
+        raise ValueError(f"Expected {natoms} atoms with {ncolumns} columns, read {data.size} values")
+
+    data = data.reshape(natoms, ncolumns)
+    if columns is None and where is None:
+        # Column major copy so that every column is one contiguous array
+        data = np.ascontiguousarray(data.T)
+        return {cname: values.astype(column_dtype(cname), copy=False) for cname, values in zip(column_names, data)}
+
+    positions = {cname: index for index, cname in enumerate(column_names)}
+    names = column_names if columns is None else list(columns)
+    missing = [cname for cname in names if cname not in positions]
+    if missing:
+        raise KeyError(f"Columns {', '.join(missing)} not in the dump columns {' '.join(column_names)}")
+
+    if where is not None:
+        mask = np.asarray(where({cname: data[:, index] for cname, index in positions.items()}), dtype=bool)
+        data = data[mask]
+    # One contiguous array per selected column
+    data = np.ascontiguousarray(data[:, [positions[cname] for cname in names]].T)
+    return {cname: values.astype(column_dtype(cname), copy=False) for cname, values in zip(names, data)}
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import bz2
+import gzip
+import io
+import lzma
+import struct
+from typing import BinaryIO, List, Optional
+
+import numpy as np
+
+MAGIC_BYTES = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+
+def detect_compression(filename: str) -> Optional[str]:
+    """
+    Detect the compression of `filename` from its magic bytes
+
+    Returns one of `gzip`, `bgzf` (blocked gzip), `bz2`, `xz`, `zstd` or None for plain files
+    """
+    with open(filename, "rb") as f:
+        header = f.read(16)
+
+    for name, magic in MAGIC_BYTES.items():
+        if header.startswith(magic):
+            if name == "gzip" and is_bgzf_header(header):
+                return "bgzf"
+            return name
+    return None
+
+
+def is_bgzf_header(header: bytes) -> bool:
+    """
+    Check for the `BC` extra subfield marking a gzip member as a BGZF block
+    """
+    # FLG.FEXTRA set, XLEN = 6 and subfield identifiers B C with a 2 byte payload
+    return len(header) >= 16 and bool(header[3] & 4) and header[12:14] == b"BC" and header[14:16] == b"\x02\x00"
+
+
+class BgzfReader(io.RawIOBase):
+    """
+    Seekable reader for blocked gzip (BGZF) files
+
+    A BGZF file is a series of independent gzip members of at most 64 KiB each, whose compressed
+    size is stored in their header. The block table is built from the headers alone so that a seek
+    only decompresses the single block holding the target position
+    """
+
+    def __init__(self, filename: str):
+        self._raw = open(filename, "rb")
+        self._block_offsets, self._block_starts, self._length = self._build_block_table()
+        self._position = 0
+        self._decoder: Optional[gzip.GzipFile] = gzip.GzipFile(fileobj=self._raw, mode="rb")
+
+    def _build_block_table(self):
+        compressed: List[int] = []
+        uncompressed: List[int] = []
+        offset = 0
+        length = 0
+        while True:
+            self._raw.seek(offset)
+            header = self._raw.read(18)
+            if len(header) < 18:
+                break
+            if not is_bgzf_header(header):
+                raise ValueError(f"Invalid BGZF block at byte {offset}")
+            block_size = struct.unpack("<H", header[16:18])[0] + 1
+            self._raw.seek(offset + block_size - 4)
+            isize = struct.unpack("<I", self._raw.read(4))[0]
+            compressed.append(offset)
+            uncompressed.append(length)
+            offset += block_size
+            length += isize
+        self._raw.seek(0)
+        return np.array(compressed, dtype=np.int64), np.array(uncompressed, dtype=np.int64), length
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        nbytes = self._decoder.readinto(buffer)
+        self._position += nbytes
+        return nbytes
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._length
+        offset = min(max(offset, 0), self._length)
+
+        # Restart decompression at the block holding `offset` and discard the bytes before it
+        block = max(int(np.searchsorted(self._block_starts, offset, side="right")) - 1, 0)
+        self._raw.seek(int(self._block_offsets[block]) if len(self._block_offsets) else 0)
+        self._decoder = gzip.GzipFile(fileobj=self._raw, mode="rb")
+        skip = offset - (int(self._block_starts[block]) if len(self._block_starts) else 0)
+        while skip > 0:
+            skip -= len(self._decoder.read(skip))
+        self._position = offset
+        return offset
+
+    def close(self) -> None:
+        if not self.closed:
+            self._raw.close()
+        super().close()
+
+
+class ZstdReader(io.RawIOBase):
+    """
+    Reader for zstd compressed files
+
+    zstd streams only seek forward, seeking backward reopens the stream and decompresses up to
+    the target position
+    """
+
+    def __init__(self, filename: str):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading zstd compressed dump files requires the zstandard package")
+
+        self._filename = filename
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._raw = open(filename, "rb")
+        self._reader = self._decompressor.stream_reader(self._raw, read_across_frames=True)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._reader.tell()
+
+    def readinto(self, buffer) -> int:
+        return self._reader.readinto(buffer)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.tell()
+        elif whence == io.SEEK_END:
+            raise io.UnsupportedOperation("zstd streams can not seek from the end")
+
+        if offset < self.tell():
+            self._reader.close()
+            self._raw = open(self._filename, "rb")
+            self._reader = self._decompressor.stream_reader(self._raw, read_across_frames=True)
+        return self._reader.seek(offset)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._reader.close()
+            self._raw.close()
+        super().close()
+
+
+def open_dump(filename: str, buffer_size: int = 1 << 22) -> BinaryIO:
+    """
+    Open a dump file for binary reading, transparently decompressing it
+
+    Compressed files are read through a buffer of `buffer_size` bytes so that decompression
+    happens in large chunks rather than once per line
+    """
+    compression = detect_compression(filename)
+    if compression is None:
+        return open(filename, "rb")
+
+    if compression == "bgzf":
+        raw = BgzfReader(filename)
+    elif compression == "gzip":
+        raw = gzip.open(filename, "rb")
+    elif compression == "bz2":
+        raw = bz2.open(filename, "rb")
+    elif compression == "xz":
+        raw = lzma.open(filename, "rb")
+    else:
+        raw = ZstdReader(filename)
+    return io.BufferedReader(raw, buffer_size=buffer_size)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import glob
+import re
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..core.simulation import DumpSnapshot
+from .base import Dump
+from .filters import FrameFilter
+from .index import FrameIndex
+
+# File and byte offset of one piece of a snapshot
+Piece = Tuple[str, int]
+
+
+def natural_key(filename: str) -> List[Union[int, str]]:
+    """
+    Sort key ordering the numbers embedded in file names by value, `dump.9` before `dump.10`
+    """
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", filename)]
+
+
+def index_file(filename: str, persist: bool = True) -> FrameIndex:
+    return FrameIndex.for_file(filename, persist=persist)
+
+
+def read_pieces(pieces: Sequence[Piece], options: Dict[str, Any]) -> DumpSnapshot:
+    """
+    Parse and merge the pieces of one snapshot, run inside worker processes
+    """
+    snapshots = []
+    for filename, offset in pieces:
+        with Dump(filename, **options) as dump:
+            snapshots.append(dump.read_at(offset))
+    return DumpSnapshot.concatenate(snapshots)
+
+
+class DumpSet:
+    """
+    Trajectory spread over many dump files, e.g written with `dump ... dump.*.lammpstrj` (one file per
+    timestep) or with `%` in the file name (one file per processor), or both
+
+    The files are indexed on creation, their headers only, and every timestep is made of all the
+    pieces written at that timestep across the files. Pieces are merged with a single concatenation.
+    Files are opened when read and at most `max_open` of them are kept open at once, the least
+    recently used one being closed first. With `workers` > 1 snapshots are parsed and merged in a
+    process pool, each worker opening the files it reads
+
+    :param files: Glob pattern or list of dump file paths
+    :param max_open: Maximum number of files kept open
+    :param workers: Number of worker processes indexing files and parsing snapshots
+    :param prefetch: Number of snapshots parsed ahead of the consumer in addition to one per worker
+    :param frames: [Optional] Select timesteps from their header alone
+    :param persist_index: Save the frame index of every file next to it
+    :param options: Parsing options passed to every `Dump`, e.g `columnar`, `unwrap`, `columns`, `where`,
+        with workers `where` must be an `AtomFilter` or a module level function
+    """
+
+    def __init__(
+        self,
+        files: Union[str, Sequence[str]],
+        max_open: int = 64,
+        workers: int = 1,
+        prefetch: int = 2,
+        frames: Optional[FrameFilter] = None,
+        persist_index: bool = True,
+        **options,
+    ):
+        filenames = files
+        if isinstance(files, str):
+            # Frame index sidecars match the patterns of the dump files they are next to
+            filenames = [filename for filename in glob.glob(files) if not filename.endswith(FrameIndex.sidecar(""))]
+        self.filenames = sorted(filenames, key=natural_key)
+        if not self.filenames:
+            raise FileNotFoundError(f"No dump files match {files}")
+        self.max_open = max(max_open, 1)
+        self.workers = workers
+        self.prefetch = prefetch
+        self.options = {**options, "persist_index": False}
+        self._open: OrderedDict[str, Dump] = OrderedDict()
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                indexes = list(executor.map(index_file, self.filenames, [persist_index] * len(self.filenames)))
+        else:
+            indexes = [index_file(filename, persist_index) for filename in self.filenames]
+
+        pieces: Dict[int, List[Piece]] = {}
+        for filename, index in zip(self.filenames, indexes):
+            for timestep, offset in zip(index.timesteps.tolist(), index.offsets.tolist()):
+                pieces.setdefault(timestep, []).append((filename, offset))
+
+        timesteps = np.array(sorted(pieces), dtype=np.int64)
+        if frames is not None:
+            timesteps = timesteps[frames.mask(timesteps)]
+        self.timesteps = timesteps
+        self._pieces = [pieces[timestep] for timestep in timesteps.tolist()]
+
+    def __len__(self) -> int:
+        return len(self._pieces)
+
+    def pieces(self, index: int) -> List[Piece]:
+        """
+        Files and byte offsets of the pieces of the snapshot at position `index`
+        """
+        return self._pieces[index]
+
+    def dump(self, filename: str) -> Dump:
+        """
+        Open parser of `filename`, opened on demand while keeping at most `max_open` files open
+        """
+        dump = self._open.pop(filename, None)
+        if dump is None:
+            if len(self._open) >= self.max_open:
+                _, oldest = self._open.popitem(last=False)
+                oldest.close()
+            dump = Dump(filename, **self.options)
+        self._open[filename] = dump
+        return dump
+
+    @property
+    def nopen(self) -> int:
+        return len(self._open)
+
+    def read(self, pieces: Sequence[Piece]) -> DumpSnapshot:
+        return DumpSnapshot.concatenate([self.dump(filename).read_at(offset) for filename, offset in pieces])
+
+    def __getitem__(self, index: int) -> DumpSnapshot:
+        if not -len(self) <= index < len(self):
+            raise IndexError(f"Snapshot index {index} out of range")
+        return self.read(self._pieces[index])
+
+    def at_timestep(self, timestep: int) -> DumpSnapshot:
+        position = int(np.searchsorted(self.timesteps, timestep))
+        if position == len(self.timesteps) or self.timesteps[position] != timestep:
+            raise KeyError(f"Timestep {timestep} not found in the dump files")
+        return self[position]
+
+    def __iter__(self) -> Iterator[DumpSnapshot]:
+        if self.workers <= 1:
+            for pieces in self._pieces:
+                yield self.read(pieces)
+            return
+
+        # At most `workers + prefetch` snapshots in flight, yielded in timestep order
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        pending: Deque[Future] = deque()
+        remaining = iter(self._pieces)
+        try:
+            for pieces in islice(remaining, self.workers + self.prefetch):
+                pending.append(executor.submit(read_pieces, pieces, self.options))
+            while pending:
+                snapshot = pending.popleft().result()
+                for pieces in islice(remaining, 1):
+                    pending.append(executor.submit(read_pieces, pieces, self.options))
+                yield snapshot
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def close(self) -> None:
+        """
+        Close all the open files
+        """
+        while self._open:
+            _, dump = self._open.popitem()
+            dump.close()
+
+    def __enter__(self) -> DumpSet:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
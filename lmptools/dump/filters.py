@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from typing import Callable, Mapping, Optional, Set, Union
+
+import numpy as np
+from pydantic import BaseModel, validator
+
+
+class FrameFilter(BaseModel):
+    """
+    Select snapshots of a dump file from their header alone
+
+    A snapshot is kept if its timestep lies in [`start`, `stop`], its position in the file is a
+    multiple of `step` and, when `timesteps` is given, its timestep is one of them
+
+    :param start: [Optional] First timestep to keep
+    :param stop: [Optional] Last timestep to keep
+    :param step: Keep every `step`-th snapshot of the file
+    :param timesteps: [Optional] Explicit set of timesteps to keep
+    """
+
+    start: Optional[int] = None
+    stop: Optional[int] = None
+    step: int = 1
+    timesteps: Optional[Set[int]] = None
+
+    @validator("step")
+    def step_must_be_positive(cls, v: int, **kwargs):
+        if v < 1:
+            raise AssertionError("step must be a positive integer")
+        return v
+
+    def accepts(self, frame: int, timestep: int) -> bool:
+        """
+        Check whether the snapshot at position `frame` in the file, written at `timestep`, is kept
+        """
+        if frame % self.step:
+            return False
+        if self.start is not None and timestep < self.start:
+            return False
+        if self.stop is not None and timestep > self.stop:
+            return False
+        if self.timesteps is not None and timestep not in self.timesteps:
+            return False
+        return True
+
+    def mask(self, timesteps: np.ndarray) -> np.ndarray:
+        """
+        Vectorized `accepts` over the timesteps of all snapshots of a file, e.g from a `FrameIndex`
+        """
+        keep = np.arange(len(timesteps)) % self.step == 0
+        if self.start is not None:
+            keep &= timesteps >= self.start
+        if self.stop is not None:
+            keep &= timesteps <= self.stop
+        if self.timesteps is not None:
+            keep &= np.isin(timesteps, list(self.timesteps))
+        return keep
+
+
+class AtomFilter(BaseModel):
+    """
+    Select the atoms of a snapshot from its raw column values, before any snapshot is created
+
+    An atom is kept if its type is one of `types`, its id lies in [`id_min`, `id_max`] and its
+    `x`, `y`, `z` coordinates lie inside the region bounds that are given
+
+    :param types: [Optional] Atom types to keep
+    :param id_min: [Optional] Lowest atom id to keep
+    :param id_max: [Optional] Highest atom id to keep
+    :param xlo: [Optional] Lower bound of the region along x, likewise `xhi`, `ylo`, `yhi`, `zlo`, `zhi`
+    """
+
+    types: Optional[Set[int]] = None
+    id_min: Optional[int] = None
+    id_max: Optional[int] = None
+    xlo: Optional[float] = None
+    xhi: Optional[float] = None
+    ylo: Optional[float] = None
+    yhi: Optional[float] = None
+    zlo: Optional[float] = None
+    zhi: Optional[float] = None
+
+    def mask(self, columns: Mapping[str, np.ndarray]) -> np.ndarray:
+        """
+        Vectorized selection of the atoms of a snapshot
+
+        :param columns: Values of the dump columns, at least those the filter applies to
+        :return: Boolean array, True for the atoms to keep
+        """
+        bounds = [
+            (name, low, high)
+            for name, low, high in (
+                ("id", self.id_min, self.id_max),
+                ("x", self.xlo, self.xhi),
+                ("y", self.ylo, self.yhi),
+                ("z", self.zlo, self.zhi),
+            )
+            if low is not None or high is not None
+        ]
+        required = (["type"] if self.types is not None else []) + [name for name, _, _ in bounds]
+        missing = [name for name in required if name not in columns]
+        if missing:
+            raise KeyError(f"Filtering atoms requires the {', '.join(missing)} columns")
+
+        keep = np.ones(len(next(iter(columns.values()))) if columns else 0, dtype=bool)
+        if self.types is not None:
+            keep &= np.isin(columns["type"], list(self.types))
+        for name, low, high in bounds:
+            if low is not None:
+                keep &= columns[name] >= low
+            if high is not None:
+                keep &= columns[name] <= high
+        return keep
+
+    def __call__(self, columns: Mapping[str, np.ndarray]) -> np.ndarray:
+        return self.mask(columns)
+
+
+# Atom filter or function returning the mask of the atoms to keep from the raw column values
+AtomPredicate = Union[AtomFilter, Callable[[Mapping[str, np.ndarray]], np.ndarray]]
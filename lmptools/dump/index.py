@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import os
+from typing import List, Optional
+
+import numpy as np
+from loguru import logger
+from pydantic import BaseModel
+
+from .compression import open_dump
+
+TIMESTEP_MARKER = b"ITEM: TIMESTEP"
+
+
+class FrameIndex(BaseModel):
+    """
+    Byte offset, timestep and number of atoms of every snapshot in a dump file
+
+    The index is built by scanning the file for `ITEM: TIMESTEP` headers only, atom lines are
+    never parsed. It can be persisted next to the dump file and is only reused while the size
+    and modification time of the dump file are unchanged
+
+    For compressed dump files offsets refer to the decompressed stream and `length` is its size
+    """
+
+    offsets: np.ndarray
+    timesteps: np.ndarray
+    natoms: np.ndarray
+    size: int
+    mtime: int
+    length: int
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @staticmethod
+    def sidecar(filename: str) -> str:
+        """
+        Path of the persisted index for `filename`
+        """
+        return f"{filename}.idx"
+
+    @classmethod
+    def build(cls, filename: str, chunk_size: int = 1 << 24) -> FrameIndex:
+        """
+        Scan `filename` for snapshot headers and index them
+
+        :param filename: Path to the dump file
+        :param chunk_size: Number of bytes read at once while looking for headers
+        """
+        stat = os.stat(filename)
+        offsets: List[int] = []
+        timesteps: List[int] = []
+        natoms: List[int] = []
+        with open_dump(filename) as f:
+            # Find the byte offset of every `ITEM: TIMESTEP` header
+            base = 0
+            overlap = len(TIMESTEP_MARKER) - 1
+            tail = b""
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                data = tail + chunk
+                start = 0
+                while (position := data.find(TIMESTEP_MARKER, start)) != -1:
+                    offsets.append(base - len(tail) + position)
+                    start = position + 1
+                # Keep enough bytes to catch a header split across two chunks
+                tail = data[-overlap:]
+                base += len(chunk)
+
+            # Read the timestep and number of atoms following each header
+            for offset in offsets:
+                f.seek(offset)
+                f.readline()
+                timesteps.append(int(f.readline().split()[0]))
+                f.readline()
+                natoms.append(int(f.readline()))
+
+        return cls(
+            offsets=np.array(offsets, dtype=np.int64),
+            timesteps=np.array(timesteps, dtype=np.int64),
+            natoms=np.array(natoms, dtype=np.int64),
+            size=stat.st_size,
+            mtime=stat.st_mtime_ns,
+            length=base,
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Persist the index to `path`
+        """
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                offsets=self.offsets,
+                timesteps=self.timesteps,
+                natoms=self.natoms,
+                stat=np.array([self.size, self.mtime, self.length], dtype=np.int64),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> FrameIndex:
+        """
+        Load an index persisted with `save`
+        """
+        with np.load(path) as data:
+            return cls(
+                offsets=data["offsets"],
+                timesteps=data["timesteps"],
+                natoms=data["natoms"],
+                size=int(data["stat"][0]),
+                mtime=int(data["stat"][1]),
+                length=int(data["stat"][2]),
+            )
+
+    def matches(self, filename: str) -> bool:
+        """
+        Check that the index still describes `filename`
+        """
+        stat = os.stat(filename)
+        return self.size == stat.st_size and self.mtime == stat.st_mtime_ns
+
+    @classmethod
+    def for_file(cls, filename: str, persist: bool = True) -> FrameIndex:
+        """
+        Return the index of `filename`, reusing the persisted index if it is still valid
+
+        :param filename: Path to the dump file
+        :param persist: Save a freshly built index next to the dump file
+        """
+        path = cls.sidecar(filename)
+        if os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if index.matches(filename):
+                    return index
+            except Exception as e:
+                logger.debug(f"Ignoring frame index {path}, {e}")
+
+        index = cls.build(filename)
+        if persist:
+            try:
+                index.save(path)
+            except OSError as e:
+                logger.debug(f"Could not save frame index {path}, {e}")
+        return index
+
+    def position(self, timestep: int) -> Optional[int]:
+        """
+        Return the position of the first snapshot with `timestep` or None if there is none
+        """
+        matches = np.flatnonzero(self.timesteps == timestep)
+        return int(matches[0]) if len(matches) else None
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from ..core.simulation import DumpSnapshot
+from .index import FrameIndex
+
+Reducer = Callable[[Any, DumpSnapshot], Any]
+
+
+def frame_ranges(
+    index: FrameIndex,
+    nranges: Optional[int] = None,
+    chunk_bytes: int = 1 << 26,
+    selected: Optional[np.ndarray] = None,
+) -> List[np.ndarray]:
+    """
+    Split the snapshots of a dump file into contiguous ranges of roughly equal size in bytes
+
+    Every range is returned as the byte offsets of the snapshots it holds
+
+    :param index: Frame index of the dump file
+    :param nranges: Number of ranges, by default ranges of about `chunk_bytes` bytes are made
+    :param chunk_bytes: Target size of a range in bytes when `nranges` is not given
+    :param selected: [Optional] Positions of the snapshots to keep, all snapshots by default
+    """
+    offsets = index.offsets if selected is None else index.offsets[selected]
+    if not len(offsets):
+        return []
+
+    if nranges is None:
+        nranges = max(1, int(np.ceil(index.length / chunk_bytes)))
+    nranges = min(nranges, len(offsets))
+
+    # First snapshot of each range, balanced by byte offset and always frame aligned
+    targets = np.linspace(0, index.length, nranges, endpoint=False)
+    starts = np.unique(np.searchsorted(offsets, targets))
+    starts = starts[starts < len(offsets)]
+    return np.split(offsets, starts[1:])
+
+
+def parse_frames(filename: str, options: Dict[str, Any], offsets: np.ndarray) -> List[DumpSnapshot]:
+    """
+    Parse the snapshots starting at `offsets`, run inside worker processes
+    """
+    from .base import Dump
+
+    dump = Dump(filename, **options)
+    try:
+        return [dump.read_at(int(offset)) for offset in offsets]
+    finally:
+        dump.file.close()
+
+
+def reduce_frames(filename: str, options: Dict[str, Any], offsets: np.ndarray, reducer: Reducer, initial: Any) -> Any:
+    """
+    Fold the snapshots starting at `offsets` into `initial` with `reducer`
+    """
+    from .base import Dump
+
+    dump = Dump(filename, **options)
+    accumulator = initial
+    try:
+        for offset in offsets:
+            accumulator = reducer(accumulator, dump.read_at(int(offset)))
+    finally:
+        dump.file.close()
+    return accumulator
+
+
+def parallel_parse(
+    filename: str,
+    options: Dict[str, Any],
+    ranges: List[np.ndarray],
+    workers: int,
+    prefetch: int,
+) -> Iterator[DumpSnapshot]:
+    """
+    Parse the snapshot ranges in a process pool and yield the snapshots in file order
+
+    At most `workers + prefetch` ranges are in flight at any time, so the memory held by parsed
+    but not yet consumed snapshots stays bounded when the workers outpace the consumer
+    """
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending: Deque[Future] = deque()
+    remaining = iter(ranges)
+    try:
+        for offsets in islice(remaining, workers + prefetch):
+            pending.append(executor.submit(parse_frames, filename, options, offsets))
+
+        while pending:
+            snapshots = pending.popleft().result()
+            for offsets in islice(remaining, 1):
+                pending.append(executor.submit(parse_frames, filename, options, offsets))
+            yield from snapshots
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def parallel_reduce(
+    filename: str,
+    options: Dict[str, Any],
+    ranges: List[np.ndarray],
+    workers: int,
+    reducer: Reducer,
+    initial: Any,
+) -> List[Any]:
+    """
+    Reduce every snapshot range in a process pool, the partial results are returned in file order
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(reduce_frames, filename, options, offsets, reducer, initial) for offsets in ranges]
+        return [future.result() for future in futures]
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from time import perf_counter
+from typing import Dict, Optional
+
+from loguru import logger
+from pydantic import BaseModel, PrivateAttr
+
+
+class ParseStats(BaseModel):
+    """
+    Time spent in every stage of parsing a dump file and parsing throughput
+
+    Stages are timed back to back with `lap`, each one from the end of the previous stage, and
+    callback hooks are timed separately under `callback.<hook>` without being counted in the stages
+
+    :param stages: Seconds spent in every stage
+    :param calls: Number of times every stage ran
+    :param frames: Number of snapshots parsed
+    :param atoms: Number of atoms parsed
+    :param bytes: Number of bytes read, from the decompressed stream for compressed files
+    :param total_bytes: [Optional] Size of the dump file, used to estimate the remaining time
+    :param progress: [Optional] Seconds between two progress logs, None disables them
+    """
+
+    stages: Dict[str, float] = {}
+    calls: Dict[str, int] = {}
+    frames: int = 0
+    atoms: int = 0
+    bytes: int = 0
+    total_bytes: Optional[int] = None
+    progress: Optional[float] = None
+
+    _started: float = PrivateAttr(default_factory=perf_counter)
+    _mark: float = PrivateAttr(default_factory=perf_counter)
+    _logged: float = PrivateAttr(default_factory=perf_counter)
+
+    def start(self) -> None:
+        """
+        Start timing a new stage
+        """
+        self._mark = perf_counter()
+
+    def lap(self, stage: str) -> None:
+        """
+        Close the current stage, accounting the time since the end of the previous one to `stage`
+        """
+        now = perf_counter()
+        self.add(stage, now - self._mark)
+        self._mark = now
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def timed_call(self, stage: str, function, *args, **kwargs):
+        """
+        Call `function` and account its run time to `stage`, outside of the current stage
+        """
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = perf_counter() - start
+            # The current stage resumes once the call returns
+            self._mark += seconds
+            self.add(stage, seconds)
+
+    def frame_done(self, natoms: int, nbytes: int) -> None:
+        """
+        Count a parsed snapshot and log the progress when due
+        """
+        self.frames += 1
+        self.atoms += natoms
+        self.bytes += nbytes
+        if self.progress is not None and perf_counter() - self._logged >= self.progress:
+            self._logged = perf_counter()
+            logger.info(self.summary())
+
+    @property
+    def elapsed(self) -> float:
+        return perf_counter() - self._started
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.elapsed
+
+    @property
+    def atoms_per_second(self) -> float:
+        return self.atoms / self.elapsed
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.elapsed
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        Estimated number of seconds left to parse the file, None when the file size is unknown
+        """
+        if not self.total_bytes or not self.bytes:
+            return None
+        return max(self.total_bytes - self.bytes, 0) / self.bytes_per_second
+
+    def summary(self) -> str:
+        """
+        One line progress report
+        """
+        text = (
+            f"{self.frames} frames, {self.atoms} atoms in {self.elapsed:.1f} s"
+            f" ({self.frames_per_second:.1f} frames/s, {self.atoms_per_second:.3g} atoms/s,"
+            f" {self.bytes_per_second / 1e6:.1f} MB/s)"
+        )
+        eta = self.eta
+        if eta is not None:
+            text += f", {100 * self.bytes / self.total_bytes:.1f}% done, ETA {eta:.1f} s"
+        return text
+
+    def report(self) -> str:
+        """
+        Time spent in every stage, slowest first
+        """
+        total = sum(self.stages.values()) or 1.0
+        lines = [self.summary()]
+        for stage, seconds in sorted(self.stages.items(), key=lambda item: -item[1]):
+            lines.append(f"{stage:>36}: {seconds:10.4f} s {100 * seconds / total:5.1f}% ({self.calls[stage]} calls)")
+        return "\n".join(lines)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from typing import Dict, Sequence, Union
+
+import numpy as np
+
+from ..core.coordinates import box_matrix, box_origin
+from ..core.simulation import SimulationBox
+from ..writers.dump import box_header, format_rows
+
+# Column sets of typical dump styles, any sequence of column names can be used instead
+COLUMN_SETS: Dict[str, Sequence[str]] = {
+    "atomic": ("id", "type", "x", "y", "z"),
+    "image": ("id", "type", "x", "y", "z", "ix", "iy", "iz"),
+    "molecular": ("id", "mol", "type", "q", "x", "y", "z", "ix", "iy", "iz"),
+    "scaled": ("id", "type", "xs", "ys", "zs", "ix", "iy", "iz"),
+    "unwrapped": ("id", "type", "xu", "yu", "zu"),
+    "dynamics": ("id", "type", "x", "y", "z", "ix", "iy", "iz", "vx", "vy", "vz", "fx", "fy", "fz"),
+}
+
+INTEGER_COLUMNS = ("id", "type", "mol", "ix", "iy", "iz")
+
+# Tilt factors of triclinic boxes as fractions of the box length
+TILT = (0.1, 0.05, -0.08)
+
+
+def synthetic_box(natoms: int, triclinic: bool = False, density: float = 0.8) -> SimulationBox:
+    """
+    Periodic cubic box, optionally tilted, holding `natoms` atoms at the given number density
+
+    :param natoms: Number of atoms in the box
+    :param triclinic: Tilt the box with the tilt factors `TILT`
+    :param density: Number of atoms per unit volume
+    """
+    length = (max(natoms, 1) / density) ** (1.0 / 3.0)
+    xy, xz, yz = (factor * length for factor in TILT) if triclinic else (0.0, 0.0, 0.0)
+    return SimulationBox(
+        xlo=0.0,
+        xhi=length,
+        ylo=0.0,
+        yhi=length,
+        zlo=0.0,
+        zhi=length,
+        xprd="pp",
+        yprd="pp",
+        zprd="pp",
+        xy=xy,
+        xz=xz,
+        yz=yz,
+        triclinic=triclinic,
+    )
+
+
+def synthetic_columns(
+    names: Sequence[str], box: SimulationBox, start: int, natoms: int, rng: np.random.Generator, ntypes: int = 3
+) -> Dict[str, np.ndarray]:
+    """
+    Random values of atoms `start + 1` to `start + natoms` for every dump column in `names`
+
+    Atoms are spread uniformly in the box with image flags between -2 and 2, and the wrapped, scaled
+    and unwrapped coordinates of an atom are consistent with each other. Columns that are not
+    recognized hold uniform random values
+
+    :param names: Dump column names
+    :param box: Simulation box of the snapshot
+    :param start: Number of atoms before the first one
+    :param natoms: Number of atoms
+    :param rng: Random number generator
+    :param ntypes: Number of atom types
+    """
+    fractional = rng.random((natoms, 3))
+    images = rng.integers(-2, 3, size=(natoms, 3))
+    matrix = box_matrix(box)
+    wrapped = box_origin(box) + fractional @ matrix.T
+    ids = np.arange(start + 1, start + natoms + 1, dtype=np.int64)
+
+    values = {
+        "id": lambda: ids,
+        "type": lambda: rng.integers(1, ntypes + 1, size=natoms),
+        # Molecules of 10 consecutive atoms
+        "mol": lambda: (ids - 1) // 10 + 1,
+        "q": lambda: rng.normal(size=natoms),
+    }
+    for d, axis in enumerate("xyz"):
+        values[axis] = lambda d=d: wrapped[:, d]
+        values[f"{axis}s"] = lambda d=d: fractional[:, d]
+        values[f"{axis}u"] = lambda d=d: wrapped[:, d] + images @ matrix[d]
+        values[f"{axis}su"] = lambda d=d: fractional[:, d] + images[:, d]
+        values[f"i{axis}"] = lambda d=d: images[:, d]
+        values[f"v{axis}"] = lambda: rng.normal(size=natoms)
+        values[f"f{axis}"] = lambda: rng.normal(size=natoms)
+
+    return {name: values[name]() if name in values else rng.random(natoms) for name in names}
+
+
+def generate_dump(
+    filename: str,
+    natoms: int = 1000,
+    nframes: int = 10,
+    columns: Union[str, Sequence[str]] = "image",
+    triclinic: bool = False,
+    every: int = 1000,
+    seed: int = 0,
+    ntypes: int = 3,
+    chunk_size: int = 1 << 16,
+) -> str:
+    """
+    Write a LAMMPS dump file of random atoms, for tests and benchmarks
+
+    Atom lines are formatted and written `chunk_size` atoms at a time, so dumps of millions of atoms
+    are written in bounded memory. Snapshots are independent of each other, only the atom ids and
+    the box are kept between snapshots
+
+    :param filename: Path of the dump file, overwritten if it exists
+    :param natoms: Number of atoms in every snapshot
+    :param nframes: Number of snapshots
+    :param columns: Name of one of the `COLUMN_SETS` or sequence of dump column names
+    :param triclinic: Write a triclinic box
+    :param every: Number of timesteps between two snapshots
+    :param seed: Seed of the random number generator, the same seed writes the same file
+    :param ntypes: Number of atom types
+    :param chunk_size: Number of atoms formatted at once
+    :return: Path of the dump file
+    """
+    names = COLUMN_SETS[columns] if isinstance(columns, str) else tuple(columns)
+    box = synthetic_box(natoms, triclinic=triclinic)
+    header = box_header(box) + f"ITEM: ATOMS {' '.join(names)}\n"
+    formats = ["%d" if name in INTEGER_COLUMNS else "%g" for name in names]
+
+    with open(filename, "wb") as f:
+        for frame in range(nframes):
+            f.write(f"ITEM: TIMESTEP\n{frame * every}\nITEM: NUMBER OF ATOMS\n{natoms}\n{header}".encode())
+            for start in range(0, natoms, chunk_size):
+                rng = np.random.default_rng([seed, frame, start])
+                count = min(chunk_size, natoms - start)
+                values = synthetic_columns(names, box, start, count, rng, ntypes)
+                for block in format_rows([values[name] for name in names], formats, chunk_size):
+                    f.write(block.encode())
+    return filename
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from ..core.simulation import DumpSnapshot, SimulationBox
+from .base import SnapshotWriter
+
+
+def column_format(values: np.ndarray) -> str:
+    """
+    Default format spec of a column, `%d` for integers and the shortest text reading back to the
+    same value for floats
+    """
+    if values.dtype.kind in "iub":
+        return "%d"
+    if values.dtype.kind == "f":
+        return "%r"
+    return "%s"
+
+
+def box_header(box: SimulationBox) -> str:
+    """
+    `ITEM: BOX BOUNDS` header and bounds of a snapshot box
+    """
+    tilt = "xy xz yz " if box.triclinic else ""
+    return f"ITEM: BOX BOUNDS {tilt}{box.xprd} {box.yprd} {box.zprd}\n{box}"
+
+
+def format_rows(columns: Sequence[np.ndarray], formats: Sequence[str], chunk_size: int = 1 << 16) -> Iterator[str]:
+    """
+    Format the rows of `columns` into atom lines, `chunk_size` rows at a time
+
+    Each chunk of every column is converted to Python scalars in one call and every row is formatted
+    with a single `%` on a format string joining the column formats, so no Python code runs per value
+
+    :param columns: Column arrays of the same length
+    :param formats: Format spec of each column e.g `%d`, `%.6f`
+    :param chunk_size: Number of rows per chunk
+    :return: Iterator over blocks of newline terminated atom lines
+    """
+    line = " ".join(formats)
+    nrows = len(columns[0]) if len(columns) else 0
+    for start in range(0, nrows, chunk_size):
+        values = [column[start:][:chunk_size].tolist() for column in columns]
+        yield "\n".join(map(line.__mod__, zip(*values))) + "\n"
+
+
+def format_snapshot(
+    snapshot: DumpSnapshot,
+    columns: Optional[Sequence[str]] = None,
+    formats: Optional[Dict[str, str]] = None,
+    chunk_size: int = 1 << 16,
+) -> Iterator[str]:
+    """
+    Format `snapshot` as written in a LAMMPS dump file
+
+    :param snapshot: Snapshot to format
+    :param columns: [Optional] Dump columns in the order they are written, all the snapshot columns by default
+    :param formats: [Optional] Format spec of some of the columns, e.g `{"x": "%.6f"}`
+    :param chunk_size: Number of atom lines formatted at once
+    :return: Iterator over the header and blocks of atom lines
+    """
+    names: List[str] = list(columns) if columns is not None else snapshot.column_names
+    arrays = [snapshot.column(name) for name in names] if snapshot.natoms else []
+    specs = [(formats or {}).get(name) or column_format(array) for name, array in zip(names, arrays)]
+
+    # Snapshots without atoms nor declared columns keep a bare header
+    yield (
+        f"ITEM: TIMESTEP\n{snapshot.timestamp}\nITEM: NUMBER OF ATOMS\n{snapshot.natoms}\n"
+        f"{box_header(snapshot.box)}{' '.join(['ITEM: ATOMS'] + names)}\n"
+    )
+    if arrays:
+        yield from format_rows(arrays, specs, chunk_size)
+
+
+class DumpWriter(SnapshotWriter):
+    """
+    Write snapshots to a LAMMPS dump file
+
+    Atom lines are formatted from whole column arrays, a chunk of atoms at a time, and written through
+    a large buffer. Snapshots are appended one after the other to the same file, which is read back by
+    `Dump` into the same values. Used as callback, every parsed snapshot is written and the file is
+    closed once parsing ends
+
+    :param filename: Path of the dump file
+    :param columns: [Optional] Dump columns in the order they are written, all the snapshot columns by default
+    :param formats: [Optional] Format spec of some of the columns, e.g `{"x": "%.6f"}`, columns without
+        one are written as integers or with the shortest text reading back to the same float
+    :param append: Append to the file instead of overwriting it
+    :param chunk_size: Number of atom lines formatted at once
+    :param buffer_size: Size of the write buffer in bytes
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        columns: Optional[Sequence[str]] = None,
+        formats: Optional[Dict[str, str]] = None,
+        append: bool = False,
+        chunk_size: int = 1 << 16,
+        buffer_size: int = 1 << 22,
+    ):
+        self.filename = filename
+        self.columns = list(columns) if columns is not None else None
+        self.formats = dict(formats or {})
+        self.chunk_size = max(chunk_size, 1)
+        self.file = open(filename, "ab" if append else "wb", buffering=buffer_size)
+        self.nframes = 0
+
+    def write(self, snapshot: DumpSnapshot) -> None:
+        """
+        Append `snapshot` to the dump file
+        """
+        for block in format_snapshot(snapshot, self.columns, self.formats, self.chunk_size):
+            self.file.write(block.encode())
+        self.nframes += 1
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self) -> DumpWriter:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def on_snapshot_parse_end(self, snapshot: DumpSnapshot, *args, **kwargs):
+        self.write(snapshot)
+
+    def on_parse_end(self, *args, **kwargs):
+        self.close()
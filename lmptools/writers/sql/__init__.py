@@ -1,8 +1,10 @@
 from .models import AtomModel, Base, SimulationBoxModel, SimulationModel, TimestepModel
+from .sqlreader import SQLReader
 from .sqlwriter import SQLWriter
 
 __all__ = [
     "SQLWriter",
+    "SQLReader",
     "AtomModel",
     "SimulationModel",
     "SimulationBoxModel",
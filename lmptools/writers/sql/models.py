@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -58,6 +58,8 @@ class SimulationBoxModel(Base):
     simulation_id = Column(Integer, ForeignKey("simulation.id"), index=True)
     timestep_id = Column(Integer, ForeignKey("timesteps.timestep"), index=True)
 
+    __table_args__ = (Index("ix_simulation_box_simulation_timestep", "simulation_id", "timestep_id"),)
+
 
 class AtomModel(Base):
     """
@@ -108,3 +110,7 @@ class AtomModel(Base):
     ix = Column(Integer, nullable=True)
     iy = Column(Integer, nullable=True)
     iz = Column(Integer, nullable=True)
+
+    # Atoms of a timestep, or a range of atom ids in it, are found by seeking this index and come out
+    # sorted by id
+    __table_args__ = (Index("ix_atoms_simulation_timestep_id", "simulation_id", "timestep_id", "id"),)
@@ -0,0 +1,268 @@
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import Index, create_engine, func, inspect, select
+
+from lmptools.core.atom import column_dtype
+from lmptools.core.simulation import DumpSnapshot, SimulationBox
+
+from .models import AtomModel, SimulationBoxModel
+
+# Columns of the atoms table holding atom values
+ATOM_COLUMNS = [
+    column.name for column in AtomModel.__table__.c if column.name not in ("sql_id", "simulation_id", "timestep_id")
+]
+
+# Largest list of atom ids sent as `IN (...)`, larger subsets are read by id range and filtered with numpy
+MAX_IN_IDS = 500
+
+
+def column_values(name: str, values: np.ndarray) -> np.ndarray:
+    """
+    Column `name` in its dump dtype, integer columns holding NULL values are kept as floats with nan
+    """
+    dtype = column_dtype(name)
+    if dtype.kind == "i" and np.isnan(values).any():
+        return values.copy()
+    return values.astype(dtype)
+
+
+class SQLReader:
+    """
+    Read back the snapshots of a simulation written by `SQLWriter` as columnar snapshots
+
+    The atoms of all the selected timesteps are fetched by a single query, ordered by timestep and
+    atom id and served by the `(simulation_id, timestep_id, id)` index of the atoms table. Rows are
+    fetched `batch_size` at a time and converted to numpy in one call per batch, so only one snapshot
+    and one batch of rows are held in memory at once
+
+    :param simulation_id: Id of the simulation to read
+    :param db_name: Path to the sqlite database
+    :param columns: [Optional] Atom columns to read, by default the columns holding values in the first timestep
+        read having atoms, which include `type` and `mass` as they are stored with a default value
+    :param batch_size: Number of rows fetched at once
+    :param create_indexes: Create the indexes missing from databases written by older versions, which writes
+        to the database and may take long on large tables. Missing indexes are only logged otherwise
+    """
+
+    def __init__(
+        self,
+        simulation_id: int,
+        db_name: str = "snapshots.db",
+        columns: Optional[Sequence[str]] = None,
+        batch_size: int = 1 << 16,
+        create_indexes: bool = False,
+    ):
+        self.db_name = db_name
+        self.simulation_id = simulation_id
+        self.batch_size = max(batch_size, 1)
+        self.engine = create_engine(f"sqlite:///{db_name}", echo=False)
+        missing = self.missing_indexes()
+        if create_indexes:
+            for index in missing:
+                index.create(bind=self.engine)
+        elif missing:
+            logger.warning(
+                f"Indexes {', '.join(index.name for index in missing)} are missing from {db_name}, reads scan "
+                "whole tables, create them with SQLReader(create_indexes=True)"
+            )
+
+        if columns is not None:
+            unknown = [name for name in columns if name not in ATOM_COLUMNS]
+            if unknown:
+                raise ValueError(f"Unknown atom columns {unknown}")
+        self.columns = list(columns) if columns is not None else None
+        self._timesteps: Optional[np.ndarray] = None
+
+    def missing_indexes(self) -> List[Index]:
+        """
+        Indexes of the snapshot tables missing from the database
+        """
+        inspector = inspect(self.engine)
+        tables = set(inspector.get_table_names())
+        missing = []
+        for table in (AtomModel.__table__, SimulationBoxModel.__table__):
+            if table.name in tables:
+                existing = {index["name"] for index in inspector.get_indexes(table.name)}
+                missing.extend(index for index in table.indexes if index.name not in existing)
+        return missing
+
+    def boxes(self, start: Optional[int] = None, stop: Optional[int] = None) -> List[Tuple[int, SimulationBox]]:
+        """
+        Timesteps of the simulation in [`start`, `stop`] with their box, in timestep order
+        """
+        table = SimulationBoxModel.__table__
+        fields = [name for name in SimulationBox.__fields__ if name in table.c]
+        query = select([table.c.timestep_id] + [table.c[name] for name in fields]).where(
+            table.c.simulation_id == self.simulation_id
+        )
+        if start is not None:
+            query = query.where(table.c.timestep_id >= start)
+        if stop is not None:
+            query = query.where(table.c.timestep_id <= stop)
+        query = query.order_by(table.c.timestep_id, table.c.id)
+
+        boxes: List[Tuple[int, SimulationBox]] = []
+        with self.engine.connect() as connection:
+            for row in connection.execute(query):
+                # A timestep written twice keeps its first box
+                if boxes and boxes[-1][0] == row[0]:
+                    continue
+                values = {name: value for name, value in zip(fields, row[1:]) if value is not None}
+                boxes.append((row[0], SimulationBox(**values)))
+        return boxes
+
+    @property
+    def timesteps(self) -> np.ndarray:
+        if self._timesteps is None:
+            self._timesteps = np.array([timestep for timestep, _ in self.boxes()], dtype=np.int64)
+        return self._timesteps
+
+    def __len__(self) -> int:
+        return len(self.timesteps)
+
+    def stored_columns(self, timestep: int) -> List[str]:
+        """
+        Atom columns holding at least one value at `timestep`, columns not in the dump are stored as NULL
+        """
+        table = AtomModel.__table__
+        query = select([func.count(table.c[name]) for name in ATOM_COLUMNS]).where(
+            table.c.simulation_id == self.simulation_id, table.c.timestep_id == timestep
+        )
+        with self.engine.connect() as connection:
+            counts = connection.execute(query).one()
+        return [name for name, count in zip(ATOM_COLUMNS, counts) if count]
+
+    def first_timestep(self, start: Optional[int] = None, stop: Optional[int] = None) -> Optional[int]:
+        """
+        First timestep in [`start`, `stop`] having atoms, None if every snapshot of the range is empty
+        """
+        table = AtomModel.__table__
+        query = select([func.min(table.c.timestep_id)]).where(table.c.simulation_id == self.simulation_id)
+        if start is not None:
+            query = query.where(table.c.timestep_id >= start)
+        if stop is not None:
+            query = query.where(table.c.timestep_id <= stop)
+        with self.engine.connect() as connection:
+            return connection.execute(query).scalar()
+
+    def blocks(
+        self,
+        names: Sequence[str],
+        start: Optional[int] = None,
+        stop: Optional[int] = None,
+        ids: Optional[np.ndarray] = None,
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Stream the atom rows of the timesteps in [`start`, `stop`] as one float array per timestep
+
+        :param names: Atom columns, the array holds the atom ids followed by these columns
+        :param start: [Optional] First timestep
+        :param stop: [Optional] Last timestep
+        :param ids: [Optional] Sorted unique atom ids to read
+        :return: Iterator over the timesteps having atoms and their arrays
+        """
+        table = AtomModel.__table__
+        query = select([table.c.timestep_id, table.c.id] + [table.c[name] for name in names]).where(
+            table.c.simulation_id == self.simulation_id
+        )
+        if start is not None:
+            query = query.where(table.c.timestep_id >= start)
+        if stop is not None:
+            query = query.where(table.c.timestep_id <= stop)
+
+        keep = None
+        if ids is not None and len(ids) <= MAX_IN_IDS:
+            query = query.where(table.c.id.in_(ids.tolist()))
+        elif ids is not None:
+            query = query.where(table.c.id.between(int(ids[0]), int(ids[-1])))
+            keep = ids
+        query = query.order_by(table.c.timestep_id, table.c.id)
+
+        timestep, parts = None, []
+        with self.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(query)
+            for partition in result.partitions(self.batch_size):
+                # NULL values become nan
+                rows = np.array(partition, dtype=np.float64)
+                if keep is not None:
+                    rows = rows[np.isin(rows[:, 1], keep)]
+                bounds = np.flatnonzero(np.diff(rows[:, 0])) + 1
+                for piece in np.split(rows, bounds):
+                    if not len(piece):
+                        continue
+                    if timestep is not None and piece[0, 0] != timestep:
+                        yield int(timestep), np.concatenate(parts)[:, 1:]
+                        parts = []
+                    timestep = piece[0, 0]
+                    parts.append(piece)
+        if parts:
+            yield int(timestep), np.concatenate(parts)[:, 1:]
+
+    def read(
+        self,
+        start: Optional[int] = None,
+        stop: Optional[int] = None,
+        ids: Optional[Sequence[int]] = None,
+    ) -> Iterator[DumpSnapshot]:
+        """
+        Iterate over the snapshots of the timesteps in [`start`, `stop`], atoms ordered by id
+
+        :param start: [Optional] First timestep to read
+        :param stop: [Optional] Last timestep to read
+        :param ids: [Optional] Ids of the atoms to read, every atom by default
+        """
+        boxes = self.boxes(start, stop)
+        if not boxes:
+            return
+
+        names = self.columns
+        if names is None:
+            first = self.first_timestep(start, stop)
+            names = self.stored_columns(first) if first is not None else []
+        # The atom ids are always read to order and select the atoms
+        names = [name for name in names if name != "id"]
+        columns = ["id"] + names
+        if ids is not None:
+            ids = np.unique(np.asarray(ids, dtype=np.int64))
+
+        blocks = self.blocks(names, start, stop, ids)
+        block = next(blocks, None)
+        for timestep, box in boxes:
+            rows = np.empty((0, len(columns)))
+            while block is not None and block[0] < timestep:
+                block = next(blocks, None)
+            if block is not None and block[0] == timestep:
+                rows = block[1]
+                block = next(blocks, None)
+            yield DumpSnapshot(
+                timestamp=timestep,
+                natoms=len(rows),
+                box=box,
+                columns={name: column_values(name, rows[:, i]) for i, name in enumerate(columns)},
+            )
+
+    def __iter__(self) -> Iterator[DumpSnapshot]:
+        return self.read()
+
+    def at_timestep(self, timestep: int, ids: Optional[Sequence[int]] = None) -> DumpSnapshot:
+        """
+        Snapshot of the simulation at `timestep`
+
+        :param timestep: Timestep to read
+        :param ids: [Optional] Ids of the atoms to read, every atom by default
+        """
+        snapshot = next(self.read(timestep, timestep, ids), None)
+        if snapshot is None:
+            raise KeyError(f"Timestep {timestep} of simulation {self.simulation_id} not found in {self.db_name}")
+        return snapshot
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+    def __enter__(self) -> "SQLReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -1,7 +1,12 @@
-from typing import List
+import queue
+import threading
+from itertools import repeat
+from typing import Any, Dict, Iterable, List, Optional
 
 from loguru import logger
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, event, insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 
 from lmptools.core.simulation import DumpSnapshot
@@ -14,20 +19,68 @@ class SQLWriter(SnapshotWriter):
     """
     Special callback to insert snapshot into a sqlite database
 
-    Overrides the on_snapshot_parse_end method to insert the snapshot into database
+    Overrides the on_snapshot_parse_end method to insert the snapshot into database. The atoms of
+    a snapshot are inserted with one executemany built from the snapshot columns and `batch_size`
+    snapshots are written per transaction. Pending snapshots are written when the dump file has
+    been parsed or when `flush`/`close` is called
+
+    With `asynchronous` the snapshots are put on a bounded queue drained by a dedicated writer
+    thread, so parsing and database writes overlap. The parser blocks while the queue is full and
+    errors raised by the writer thread are raised again in the parsing thread
+
+    Once a batch failed to be written, the error is raised again by every later `write`, `flush`,
+    `close` and snapshot, so no snapshot is written after a missing one
+
+    :param simulation_id: Id of the simulation the snapshots belong to
+    :param db_name: Path to the sqlite database
+    :param debug: Echo the SQL statements and log errors
+    :param batch_size: Number of snapshots written per transaction
+    :param bulk_pragmas: Trade durability for speed (WAL journal, synchronous=OFF, large page cache) until
+        `close`, which restores the journal mode the database had before
+    :param defer_indexes: Drop the indexes of the atoms table while loading and rebuild them on `close`
+    :param asynchronous: Write the snapshots from a background thread
+    :param queue_size: Maximum number of snapshots waiting for the writer thread
     """
 
-    def __init__(self, simulation_id: int, db_name: str = "snapshots.db", debug: bool = False):
+    def __init__(
+        self,
+        simulation_id: int,
+        db_name: str = "snapshots.db",
+        debug: bool = False,
+        batch_size: int = 1,
+        bulk_pragmas: bool = False,
+        defer_indexes: bool = False,
+        asynchronous: bool = False,
+        queue_size: int = 8,
+    ):
         self.__db_name = db_name
+        # The writer thread uses connections opened by the parsing thread
+        connect_args = {"check_same_thread": False} if asynchronous else {}
         if debug:
-            self.__engine = create_engine(f"sqlite:///{self.__db_name}", echo=True)
+            self.__engine = create_engine(f"sqlite:///{self.__db_name}", echo=True, connect_args=connect_args)
         else:
-            self.__engine = create_engine(f"sqlite:///{self.__db_name}", echo=False)
+            self.__engine = create_engine(f"sqlite:///{self.__db_name}", echo=False, connect_args=connect_args)
+
+        # The journal mode is stored in the database file, unlike the other pragmas
+        self.__journal_mode: Optional[str] = None
+        if bulk_pragmas:
+            with self.__engine.connect() as connection:
+                self.__journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+            # Only connections opened from now on get the pragmas
+            self.__engine.dispose()
+            event.listen(self.__engine, "connect", self._set_bulk_pragmas)
 
         self.__session = Session(bind=self.__engine)
         Base.metadata.create_all(bind=self.__engine)
         self.__simulation_id = simulation_id
         self.__debug = debug
+        self.__batch_size = max(batch_size, 1)
+        self.__pending: List[DumpSnapshot] = []
+
+        self.__defer_indexes = defer_indexes
+        if defer_indexes:
+            for index in AtomModel.__table__.indexes:
+                index.drop(bind=self.__engine, checkfirst=True)
 
         # Persist the simulation
         self.__sim = SimulationModel(id=self.__simulation_id)
@@ -39,41 +92,187 @@ class SQLWriter(SnapshotWriter):
             if self.__debug:
                 logger.debug(e)
 
-    def on_snapshot_parse_end(self, snapshot: DumpSnapshot, *args, **kwargs):
-        # Add snapshot timestep into db
-        timestep = TimestepModel(timestep=snapshot.timestamp, simulation=self.__sim)
+        self.__error: Optional[BaseException] = None
+        self.__queue: Optional[queue.Queue] = None
+        self.__thread: Optional[threading.Thread] = None
+        if asynchronous:
+            self.__queue = queue.Queue(maxsize=max(queue_size, 1))
+            self.__thread = threading.Thread(target=self._drain, name=f"SQLWriter-{db_name}", daemon=True)
+            self.__thread.start()
+
+    @staticmethod
+    def _set_bulk_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA cache_size=-1048576")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    def _restore_pragmas(self) -> None:
+        """
+        Close the connections opened with the bulk pragmas and restore the journal mode of the database,
+        which is left to WAL with a warning while other connections use the database
+        """
+        event.remove(self.__engine, "connect", self._set_bulk_pragmas)
+        self.__session.close()
+        self.__engine.dispose()
         try:
-            self.__session.add(timestep)
-            self.__session.commit()
-        except Exception as e:
-            self.__session.rollback()
+            with self.__engine.connect() as connection:
+                connection.exec_driver_sql(f"PRAGMA journal_mode={self.__journal_mode}")
+        except OperationalError as e:
+            # Leaving WAL mode needs the only connection to the database
+            logger.warning(f"Journal mode of {self.__db_name} left to WAL, the database is in use: {e}")
+        self.__engine.dispose()
+        self.__journal_mode = None
+
+    def insert_atoms(self, connection: Connection, snapshot: DumpSnapshot) -> None:
+        """
+        Insert the atoms of a snapshot with one executemany of tuples zipped from its column arrays
+        """
+        if not snapshot.natoms:
+            return
+
+        table = AtomModel.__table__
+        if snapshot.columnar:
+            names = list(snapshot.columns.keys())
+        else:
+            names = list(snapshot.atoms[0].__fields_set__)
+        sources: Dict[str, Iterable[Any]] = {name: snapshot.column(name).tolist() for name in names if name in table.c}
+        sources["simulation_id"] = repeat(self.__simulation_id)
+        sources["timestep_id"] = repeat(snapshot.timestamp)
+
+        statement = insert(table).values({name: bindparam(name) for name in sources})
+        compiled = statement.compile(dialect=connection.dialect)
+        # Columns with a default, e.g type and mass, are bound by the compiled statement as well
+        for name in compiled.positiontup:
+            if name not in sources:
+                sources[name] = repeat(table.c[name].default.arg)
+        rows = zip(*[sources[name] for name in compiled.positiontup])
+        connection.exec_driver_sql(str(compiled), list(rows))
+
+    def write(self, snapshots: List[DumpSnapshot]) -> None:
+        """
+        Insert `snapshots` into the database in a single transaction
+        """
+        self._raise_error()
+        box_columns = SimulationBoxModel.__table__.c
+        with self.__engine.begin() as connection:
+            connection.execute(
+                insert(TimestepModel.__table__).prefix_with("OR IGNORE"),
+                [{"timestep": snapshot.timestamp, "simulation_id": self.__simulation_id} for snapshot in snapshots],
+            )
+            connection.execute(
+                insert(SimulationBoxModel.__table__),
+                [
+                    {
+                        **{field: value for field, value in snapshot.box.dict().items() if field in box_columns},
+                        "simulation_id": self.__simulation_id,
+                        "timestep_id": snapshot.timestamp,
+                    }
+                    for snapshot in snapshots
+                ],
+            )
+            # One executemany per snapshot as the dump columns may change between snapshots
+            for snapshot in snapshots:
+                self.insert_atoms(connection, snapshot)
+
+    def _drain(self) -> None:
+        """
+        Writer thread loop, writes the queued snapshots in batches of up to `batch_size`
+        """
+        while True:
+            snapshots = [self.__queue.get()]
+            while len(snapshots) < self.__batch_size:
+                try:
+                    snapshots.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Compare by identity, DumpSnapshot.__eq__ expects another snapshot
+            stop = any(snapshot is None for snapshot in snapshots)
+            snapshots = [snapshot for snapshot in snapshots if snapshot is not None]
+            try:
+                # Snapshots queued after a failure are dropped, the error is raised in the parsing thread
+                if snapshots and self.__error is None:
+                    self._write(snapshots)
+            except BaseException as e:
+                self.__error = e
+            finally:
+                for _ in range(len(snapshots) + stop):
+                    self.__queue.task_done()
+            if stop:
+                return
+
+    def _write(self, snapshots: List[DumpSnapshot]) -> None:
+        try:
+            self.write(snapshots)
+        except BaseException as e:
             if self.__debug:
                 logger.debug(e)
+            self.__error = e
+            raise
+
+        if self.__debug:
+            logger.debug(f"Snapshots {[s.timestamp for s in snapshots]} inserted into {self.__db_name}")
 
-        # Add simulation box info to db
-        sbox = SimulationBoxModel(simulation=self.__sim, timestep=timestep)
-        for field in snapshot.box.__fields_set__:
-            sbox.__dict__[field] = snapshot.box.__dict__[field]
+    def _raise_error(self) -> None:
+        """
+        Raise the error of a failed write in the calling thread, until the writer is recreated
+        """
+        if self.__error is not None:
+            raise self.__error
 
-        try:
-            self.__session.add(sbox)
-            self.__session.commit()
-        except Exception:
-            self.__session.rollback()
+    def flush(self) -> None:
+        """
+        Write the pending snapshots, waiting for the writer thread to drain its queue
+        """
+        if self.__queue is not None:
+            self.__queue.join()
+            self._raise_error()
+            return
 
-        # Insert atoms
-        atom_models: List[AtomModel] = []
-        for atom in snapshot.atoms:
-            atom_model = AtomModel(simulation=self.__sim, timestep=timestep)
-            for field in atom.__fields_set__:
-                atom_model.__dict__[field] = atom.__dict__[field]
-            atom_models.append(atom_model)
+        self._raise_error()
+        if not self.__pending:
+            return
 
+        snapshots, self.__pending = self.__pending, []
+        self._write(snapshots)
+
+    def close(self) -> None:
+        """
+        Write the pending snapshots, stop the writer thread, rebuild the deferred indexes and restore
+        the journal mode, even when writing the pending snapshots fails
+        """
         try:
-            self.__session.bulk_save_objects(atom_models, return_defaults=True)
-            self.__session.commit()
-        except Exception:
-            self.__session.rollback()
+            self.flush()
+        finally:
+            if self.__thread is not None:
+                self.__queue.put(None)
+                self.__thread.join()
+                self.__thread = None
+                self.__queue = None
 
-        if self.__debug:
-            logger.debug(f"Snapshot {snapshot.timestamp} inserted into {self.__db_name}")
+            # The indexes are rebuilt even if writing failed, the error is raised afterwards
+            try:
+                if self.__defer_indexes:
+                    for index in AtomModel.__table__.indexes:
+                        index.create(bind=self.__engine, checkfirst=True)
+                    self.__defer_indexes = False
+            finally:
+                if self.__journal_mode is not None:
+                    self._restore_pragmas()
+
+    def on_snapshot_parse_end(self, snapshot: DumpSnapshot, *args, **kwargs):
+        self._raise_error()
+        if self.__queue is not None:
+            # Blocks while the queue is full
+            self.__queue.put(snapshot)
+            return
+
+        self.__pending.append(snapshot)
+        if len(self.__pending) >= self.__batch_size:
+            self.flush()
+
+    def on_parse_end(self, *args, **kwargs):
+        self.close()
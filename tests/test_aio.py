@@ -0,0 +1,110 @@
+import asyncio
+from typing import List
+
+import numpy as np
+import pytest
+
+from lmptools.core.exceptions import SkipSnapshot
+from lmptools.core.simulation import DumpSnapshot
+from lmptools.dump.aio import AsyncDump
+from lmptools.dump.base import Dump, DumpCallback
+from lmptools.dump.synthetic import generate_dump
+
+
+class AsyncCallback(DumpCallback):
+    """
+    Coroutine hooks skipping the snapshot written at timestep `skip`
+    """
+
+    def __init__(self, skip: int):
+        self.skip = skip
+        self.timestamps: List[int] = []
+        self.ended = False
+
+    async def on_snapshot_parse_timestamp(self, timestamp: int, *args, **kwargs):
+        await asyncio.sleep(0)
+        if timestamp == self.skip:
+            raise SkipSnapshot(f"skipping {timestamp}")
+
+    async def on_snapshot_parse_end(self, snapshot: DumpSnapshot, *args, **kwargs):
+        self.timestamps.append(snapshot.timestamp)
+
+    def on_parse_end(self, *args, **kwargs):
+        self.ended = True
+
+
+@pytest.fixture(scope="module")
+def dump_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("aio")
+    return [generate_dump(str(directory / f"dump.{seed}"), natoms=2000, nframes=8, seed=seed) for seed in range(2)]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_async_dump(dump_files, workers):
+    expected = list(Dump(dump_files[0], columnar=True, persist_index=False))
+
+    async def consume():
+        callback = AsyncCallback(skip=3000)
+        snapshots = [snapshot async for snapshot in AsyncDump(dump_files[0], callback, workers=workers, columnar=True)]
+        return snapshots, callback
+
+    snapshots, callback = asyncio.run(consume())
+    kept = [snapshot for snapshot in expected if snapshot.timestamp != 3000]
+    assert [snapshot.timestamp for snapshot in snapshots] == callback.timestamps == [s.timestamp for s in kept]
+    assert callback.ended
+    for snapshot, reference in zip(snapshots, kept):
+        assert np.array_equal(snapshot.columns["x"], reference.columns["x"])
+
+
+def test_async_dump_concurrent(dump_files):
+    async def consume(filename: str) -> List[int]:
+        timestamps = []
+        async with AsyncDump(filename, prefetch=1, persist_index=False) as dump:
+            async for snapshot in dump:
+                timestamps.append(snapshot.timestamp)
+                await asyncio.sleep(0.001)
+        return timestamps
+
+    async def main():
+        ticks = 0
+        running = asyncio.gather(*[consume(filename) for filename in dump_files])
+        while not running.done():
+            ticks += 1
+            await asyncio.sleep(0.001)
+        return await running, ticks
+
+    results, ticks = asyncio.run(main())
+    assert results == [[frame * 1000 for frame in range(8)]] * 2
+    # The event loop kept running while the snapshots were parsed
+    assert ticks > 1
+
+
+def test_async_dump_prefetch_and_close(dump_files):
+    async def main():
+        dump = AsyncDump(dump_files[1], prefetch=2, columnar=True, persist_index=False)
+        first = await dump.__anext__()
+        await asyncio.sleep(0.2)
+        queued = dump._queue.qsize()
+        await dump.aclose()
+        with pytest.raises(StopAsyncIteration):
+            await dump.__anext__()
+        return first, queued, dump
+
+    first, queued, dump = asyncio.run(main())
+    assert first.timestamp == 0
+    assert queued == 2
+    assert dump.dump.file.closed
+
+
+def test_async_dump_follow(dump_files):
+    async def main():
+        # Without timeout following only ends when the iteration is closed
+        async with AsyncDump(dump_files[0], follow=True, interval=0.01, persist_index=False) as dump:
+            timestamps = []
+            async for snapshot in dump:
+                timestamps.append(snapshot.timestamp)
+                if len(timestamps) == 8:
+                    break
+        return timestamps
+
+    assert asyncio.run(asyncio.wait_for(main(), timeout=10)) == [frame * 1000 for frame in range(8)]
@@ -0,0 +1,32 @@
+import json
+
+from lmptools.benchmark import compare, main, run_suite
+
+
+def test_run_suite(tmp_path):
+    results = run_suite([50], nframes=2, repeat=1, triclinic=True, directory=str(tmp_path))
+    run = results["runs"][0]
+    assert (run["natoms"], run["nframes"], run["triclinic"]) == (50, 2, True)
+    for name in ("parse_columnar", "parse_memory_map", "parse_objects", "unwrap", "dataframe", "sql_ingest"):
+        assert run["benchmarks"][name]["best"] > 0
+        assert run["benchmarks"][name]["peak_bytes"] > 0
+    assert compare(results, results) == []
+
+    slower = json.loads(json.dumps(results))
+    slower["runs"][0]["benchmarks"]["unwrap"]["best"] *= 2
+    regressions = compare(results, slower)
+    assert len(regressions) == 1 and regressions[0].startswith("unwrap (50 atoms, 2 frames): best")
+
+
+def test_main(tmp_path):
+    output = str(tmp_path / "results.json")
+    assert main(["--atoms", "20", "--frames", "2", "--repeat", "1", "--no-sql", "--output", output]) == 0
+    with open(output) as f:
+        results = json.load(f)
+    assert "sql_ingest" not in results["runs"][0]["benchmarks"]
+    assert (
+        main(
+            ["--atoms", "20", "--frames", "2", "--repeat", "1", "--no-sql", "--compare", output, "--tolerance", "1000"]
+        )
+        == 0
+    )
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from lmptools.core.atom import Atom
+from lmptools.core.coordinates import (
+    box_matrix,
+    scaled_to_unscaled,
+    unscaled_to_scaled,
+    unwrap,
+    wrap,
+)
+from lmptools.core.simulation import SimulationBox
+from lmptools.dump.base import Dump
+
+
+@pytest.fixture
+def triclinic_box():
+    return SimulationBox(
+        xprd="pp",
+        yprd="pp",
+        zprd="pp",
+        xlo=0.0,
+        xhi=10.0,
+        ylo=-1.0,
+        yhi=7.0,
+        zlo=2.0,
+        zhi=8.0,
+        xy=1.5,
+        xz=-0.5,
+        yz=0.75,
+        triclinic=True,
+    )
+
+
+@pytest.fixture
+def columns():
+    rng = np.random.default_rng(7)
+    natoms = 50
+    return {
+        "id": np.arange(1, natoms + 1),
+        "xs": rng.random(natoms),
+        "ys": rng.random(natoms),
+        "zs": rng.random(natoms),
+        "ix": rng.integers(-3, 4, natoms),
+        "iy": rng.integers(-3, 4, natoms),
+        "iz": rng.integers(-3, 4, natoms),
+    }
+
+
+def test_box_matrix(triclinic_box):
+    matrix = box_matrix(triclinic_box)
+    assert matrix.tolist() == [[10.0, 1.5, -0.5], [0.0, 8.0, 0.75], [0.0, 0.0, 6.0]]
+
+
+def test_scaled_unscaled_round_trip(triclinic_box, columns):
+    scaled_to_unscaled(columns, triclinic_box)
+    origin = np.array([triclinic_box.xlo, triclinic_box.ylo, triclinic_box.zlo])
+    expected = origin + np.stack([columns["xs"], columns["ys"], columns["zs"]], axis=1) @ box_matrix(triclinic_box).T
+    assert np.allclose(np.stack([columns["x"], columns["y"], columns["z"]], axis=1), expected)
+
+    scaled = {name: columns[name] for name in ("x", "y", "z")}
+    unscaled_to_scaled(scaled, triclinic_box)
+    for name in ("xs", "ys", "zs"):
+        assert np.allclose(scaled[name], columns[name])
+
+
+def test_unwrap_matches_atom_unwrap(triclinic_box, columns):
+    scaled_to_unscaled(columns, triclinic_box)
+    unwrap(columns, triclinic_box)
+    box = triclinic_box
+    for index in range(len(columns["id"])):
+        atom = Atom(**{name: columns[name][index].item() for name in ("x", "y", "z", "ix", "iy", "iz")})
+        atom.unwrap(box.Lx, box.Ly, box.Lz, box.xy, box.xz, box.yz)
+        assert atom.xu == pytest.approx(columns["xu"][index])
+        assert atom.yu == pytest.approx(columns["yu"][index])
+        assert atom.zu == pytest.approx(columns["zu"][index])
+
+
+def test_unwrap_requires_image_flags(triclinic_box):
+    columns = {"x": np.zeros(2), "y": np.zeros(2), "z": np.zeros(2), "iz": np.array([1, -1])}
+    unwrap(columns, triclinic_box)
+    # xu and yu depend on the missing ix and iy through the tilt factors
+    assert "xu" not in columns and "yu" not in columns
+    assert columns["zu"].tolist() == [6.0, -6.0]
+
+
+def test_wrap(triclinic_box, columns):
+    scaled_to_unscaled(columns, triclinic_box)
+    unwrap(columns, triclinic_box)
+    unwrapped = {"x": columns["xu"], "y": columns["yu"], "z": columns["zu"]}
+    wrap(unwrapped, triclinic_box)
+
+    for name in ("x", "y", "z"):
+        assert np.allclose(unwrapped[name], columns[name])
+    for name in ("ix", "iy", "iz"):
+        assert unwrapped[name].tolist() == columns[name].tolist()
+
+
+def test_dump_triclinic_box(tmp_path):
+    filename = str(tmp_path / "dump.triclinic.lammpstrj")
+    with open(filename, "w") as f:
+        f.write("ITEM: TIMESTEP\n100\nITEM: NUMBER OF ATOMS\n2\n")
+        f.write("ITEM: BOX BOUNDS xy xz yz pp pf pp\n")
+        f.write("-0.5 11.5 1.5\n-1.0 7.75 -0.5\n2.0 8.0 0.75\n")
+        f.write("ITEM: ATOMS id x y z ix iy iz\n")
+        f.write("1 1.0 2.0 3.0 1 0 0\n2 4.0 5.0 6.0 -1 1 1\n")
+
+    for columnar in [False, True]:
+        snapshot = next(Dump(filename, columnar=columnar, unwrap=True))
+        box = snapshot.box
+        assert box.triclinic
+        assert (box.xprd, box.yprd, box.zprd) == ("pp", "pf", "pp")
+        assert (box.xlo, box.xhi, box.ylo, box.yhi) == (0.0, 10.0, -1.0, 7.0)
+        assert (box.Lx, box.Ly, box.Lz) == (10.0, 8.0, 6.0)
+        assert (box.xy, box.xz, box.yz) == (1.5, -0.5, 0.75)
+        assert snapshot.column("xu").tolist() == [11.0, 4.0 - 10.0 + 1.5 - 0.5]
+        assert snapshot.column("yu").tolist() == [2.0, 5.0 + 8.0 + 0.75]
+        assert snapshot.column("zu").tolist() == [3.0, 12.0]
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from lmptools.analysis import VACF, ForceACF, TimeCorrelation
+from lmptools.core.cache import ResultCache
+from lmptools.core.simulation import DumpSnapshot, SimulationBox
+from lmptools.core.task import Pipeline
+from lmptools.dump.base import Dump
+from lmptools.writers.dump import DumpWriter
+
+
+def direct(values: np.ndarray, window: int, stride: int) -> np.ndarray:
+    """
+    Reference correlation of values of shape (T, natoms, 3) averaged over windows and origins
+    """
+    nframes, natoms, _ = values.shape
+    sums = np.zeros(window)
+    counts = np.zeros(window)
+    for start in range(0, nframes - window + 1, stride):
+        block = values[start:][:window]
+        for lag in range(window):
+            sums[lag] += np.sum(block[: window - lag] * block[lag:])
+            counts[lag] += (window - lag) * natoms
+    return sums / counts
+
+
+@pytest.fixture(scope="module")
+def velocities():
+    rng = np.random.default_rng(2)
+    nframes, natoms = 50, 12
+    # Correlated in time through a running average of noise
+    noise = rng.normal(size=(nframes + 4, natoms, 3))
+    return np.stack([noise[t:][:5].mean(axis=0) for t in range(nframes)])
+
+
+def snapshots(values: np.ndarray, prefix: str, types: np.ndarray):
+    box = SimulationBox(xprd="pp", yprd="pp", zprd="pp", xlo=0.0, xhi=1.0, ylo=0.0, yhi=1.0, zlo=0.0, zhi=1.0)
+    rng = np.random.default_rng(0)
+    natoms = values.shape[1]
+    for frame, value in enumerate(values):
+        order = rng.permutation(natoms)
+        columns = {"id": order + 1, "type": types[order]}
+        for d, axis in enumerate("xyz"):
+            columns[f"{prefix}{axis}"] = value[order, d]
+        yield DumpSnapshot(timestamp=10 * frame, natoms=natoms, box=box, columns=columns)
+
+
+@pytest.mark.parametrize("stride", [None, 3])
+def test_vacf(velocities, stride):
+    types = np.arange(velocities.shape[1]) % 2 + 1
+    vacf = VACF(window=8, stride=stride)
+    for snapshot in snapshots(velocities, "v", types):
+        vacf.update(snapshot)
+
+    result = vacf.compute()
+    expected = direct(velocities, 8, stride or 8)
+    assert vacf.nwindows == len(range(0, len(velocities) - 8 + 1, stride or 8))
+    assert result.timesteps.tolist() == [10 * lag for lag in range(8)]
+    assert np.allclose(result.total, expected)
+    assert result.normalized[0] == pytest.approx(1.0)
+    for label in [1, 2]:
+        assert np.allclose(result.types[label], direct(velocities[:, types == label], 8, stride or 8))
+
+
+def test_force_acf(velocities):
+    acf = ForceACF(window=5)
+    for snapshot in snapshots(velocities, "f", np.ones(velocities.shape[1], dtype=int)):
+        acf.update(snapshot)
+    assert np.allclose(acf.compute().total, direct(velocities, 5, 5))
+
+
+def test_time_correlation_errors(velocities):
+    correlation = TimeCorrelation(("vx", "vy", "vz"), window=60)
+    stream = snapshots(velocities, "v", np.ones(velocities.shape[1], dtype=int))
+    correlation.update(next(stream))
+    with pytest.raises(ValueError):
+        correlation.compute()
+    with pytest.raises(KeyError):
+        VACF().update(next(snapshots(velocities, "f", np.ones(velocities.shape[1], dtype=int))))
+    # Frames are added in time order
+    with pytest.raises(ValueError):
+        correlation.update(next(snapshots(velocities, "v", np.ones(velocities.shape[1], dtype=int))))
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_vacf_pipeline(velocities, tmp_path, processes):
+    types = np.arange(velocities.shape[1]) % 2 + 1
+    filename = str(tmp_path / "dump.lammpstrj")
+    with DumpWriter(filename) as writer:
+        for snapshot in snapshots(velocities, "v", types):
+            writer.write(snapshot)
+
+    task = VACF(window=8, stride=3)
+    pipeline = Pipeline([task])
+    cache = ResultCache(str(tmp_path / "cache"))
+    for cached in (False, True):
+        # The second pass only reads the frames of the first one from the cache
+        vacf = VACF(window=8, stride=3)
+        for result in pipeline.execute(Dump(filename, columnar=True), workers=2, processes=processes, cache=cache):
+            assert result.cached == cached
+            vacf.add(result.results[0])
+        assert np.allclose(vacf.compute().total, direct(velocities, 8, 3))
+        assert np.allclose(vacf.compute().types[2], direct(velocities[:, types == 2], 8, 3))
+    assert task.nwindows == 0
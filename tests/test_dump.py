@@ -1,14 +1,32 @@
+import bz2
+import gzip
+import lzma
 import os
 import random
+import shutil
+import struct
+import threading
+import time
+import zlib
 from typing import List
 
+import numpy as np
 import pytest
+from loguru import logger
 from pydantic.tools import parse_obj_as
 
+from lmptools.core import coordinates
 from lmptools.core.atom import Atom
 from lmptools.core.exceptions import SkipSnapshot
 from lmptools.core.simulation import DumpSnapshot, SimulationBox
 from lmptools.dump.base import Dump, DumpCallback
+from lmptools.dump.binary import BinaryDump, convert
+from lmptools.dump.block import parse_atoms_block
+from lmptools.dump.compression import detect_compression
+from lmptools.dump.filters import AtomFilter, FrameFilter
+from lmptools.dump.index import FrameIndex
+from lmptools.dump.parallel import frame_ranges
+from lmptools.dump.synthetic import COLUMN_SETS, generate_dump, synthetic_box
 
 
 class SkipSnapshotCallback(DumpCallback):
@@ -151,6 +169,8 @@ def dump_file():
     f.close()
     yield {"filename": filename, "snapshots": snapshots}
     os.remove(filename)
+    if os.path.exists(FrameIndex.sidecar(filename)):
+        os.remove(FrameIndex.sidecar(filename))
 
 
 def test_dump_snapshot_parse_iteration(dump_file):
@@ -227,3 +247,463 @@ def test_dump_callback_on_snapshot_parse_end(dump_file):
 
     for index, snapshot in enumerate(dump_file["snapshots"]):
         assert cb.snapshots[index] == snapshot
+
+
+def test_dump_columnar_snapshot_parse(dump_file):
+    """
+    Columnar snapshots hold the same atoms as the snapshots parsed into `Atom` objects
+    """
+    d = Dump(dump_file["filename"], columnar=True)
+    for index, snapshot in enumerate(d):
+        expected = dump_file["snapshots"][index]
+        assert snapshot.columnar
+        assert snapshot == expected
+        assert snapshot.atoms == expected.atoms
+        assert snapshot.columns["id"].dtype == np.int64
+        assert snapshot.columns["x"].flags["C_CONTIGUOUS"]
+
+
+def test_dump_columnar_snapshot_dataframe_shares_memory(dump_file):
+    snapshot = next(Dump(dump_file["filename"], columnar=True))
+    df = snapshot.dataframe
+    assert list(df.columns) == list(snapshot.columns)
+    for name, column in snapshot.columns.items():
+        assert np.shares_memory(df[name].to_numpy(), column)
+
+
+def test_parse_atoms_block():
+    block = b"1 2 0.5 -1.25 3\n2 1 1e-3 2.0 -1\n"
+    columns = parse_atoms_block(block, ["id", "type", "x", "y", "ix"], 2)
+    assert columns["id"].tolist() == [1, 2]
+    assert columns["ix"].dtype == np.int64
+    assert columns["x"].tolist() == [0.5, 1e-3]
+    assert columns["y"].tolist() == [-1.25, 2.0]
+
+    with pytest.raises(ValueError):
+        parse_atoms_block(block, ["id", "type", "x", "y", "ix"], 3)
+
+
+def test_dump_frame_index(dump_file):
+    index = FrameIndex.build(dump_file["filename"])
+    assert len(index) == len(dump_file["snapshots"])
+    for position, snapshot in enumerate(dump_file["snapshots"]):
+        assert index.timesteps[position] == snapshot.timestamp
+        assert index.natoms[position] == snapshot.natoms
+
+    with open(dump_file["filename"], "rb") as f:
+        for offset in index.offsets:
+            f.seek(offset)
+            assert f.readline() == b"ITEM: TIMESTEP\n"
+
+
+def test_dump_frame_index_sidecar(dump_file, tmp_path):
+    filename = str(tmp_path / "dump.lammpstrj")
+    with open(dump_file["filename"], "rb") as src, open(filename, "wb") as dst:
+        dst.write(src.read())
+
+    index = FrameIndex.for_file(filename)
+    assert os.path.exists(FrameIndex.sidecar(filename))
+    assert FrameIndex.load(FrameIndex.sidecar(filename)).matches(filename)
+
+    # Index is rebuilt once the dump file changes
+    with open(filename, "ab") as f:
+        f.write(b"ITEM: TIMESTEP\n1\nITEM: NUMBER OF ATOMS\n0\n")
+    assert not index.matches(filename)
+    assert len(FrameIndex.for_file(filename)) == len(index) + 1
+
+
+def test_dump_random_access(dump_file):
+    d = Dump(dump_file["filename"], persist_index=False)
+    snapshots = dump_file["snapshots"]
+    assert d.nframes == len(snapshots)
+    assert d[len(snapshots) - 1] == snapshots[-1]
+    assert d[-1] == snapshots[-1]
+    assert d[0] == snapshots[0]
+    assert d.at_timestep(snapshots[-1].timestamp).timestamp == snapshots[-1].timestamp
+
+    # Random access leaves the iterator untouched
+    assert next(d) == snapshots[0]
+
+    with pytest.raises(IndexError):
+        d[len(snapshots)]
+    with pytest.raises(KeyError):
+        d.at_timestep(-1)
+
+
+def count_atoms(natoms: int, snapshot: DumpSnapshot) -> int:
+    return natoms + snapshot.natoms
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_dump_parallel_parse(dump_file, columnar):
+    """
+    Snapshots parsed in worker processes reach the callbacks in file order
+    """
+    cb = OnSnapshotParseEnd()
+    d = Dump(dump_file["filename"], callback=cb, columnar=columnar, persist_index=False)
+    d.parse(workers=2, prefetch=1)
+
+    assert len(cb.snapshots) == len(dump_file["snapshots"])
+    for parsed, snapshot in zip(cb.snapshots, dump_file["snapshots"]):
+        assert parsed == snapshot
+        assert parsed.atoms == snapshot.atoms
+
+
+def test_dump_parallel_parse_skip_snapshot(dump_file):
+    d = Dump(dump_file["filename"], callback=SkipSnapshotCallback(), persist_index=False)
+    assert list(d.iparse(workers=2)) == []
+
+
+def test_dump_parallel_reduce(dump_file):
+    d = Dump(dump_file["filename"], persist_index=False)
+    partials = d.parse(workers=2, reducer=count_atoms, initial=0)
+    assert 1 <= len(partials) <= 2
+    assert sum(partials) == sum([snapshot.natoms for snapshot in dump_file["snapshots"]])
+
+
+def test_dump_reduce_in_process(dump_file):
+    # A single worker reduces in the calling process, the reducer does not need to be picklable
+    d = Dump(dump_file["filename"], persist_index=False)
+    initial = []
+    partials = d.parse(workers=1, reducer=lambda seen, s: seen.append(s.timestamp) or seen, initial=initial)
+    assert partials == [[snapshot.timestamp for snapshot in dump_file["snapshots"]]]
+    # The accumulator starts from a copy of `initial`, as it does in worker processes
+    assert initial == []
+
+
+def test_dump_frame_ranges(dump_file):
+    index = FrameIndex.build(dump_file["filename"])
+    ranges = frame_ranges(index, nranges=3)
+    assert 1 <= len(ranges) <= 3
+    assert np.concatenate(ranges).tolist() == index.offsets.tolist()
+
+    ranges = frame_ranges(index, nranges=2, selected=np.array([0, len(index) - 1]))
+    assert np.concatenate(ranges).tolist() == [index.offsets[0], index.offsets[-1]]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_dump_memory_map(dump_file, columnar):
+    d = Dump(dump_file["filename"], columnar=columnar, memory_map=True, persist_index=False)
+    snapshots = list(d)
+    assert len(snapshots) == len(dump_file["snapshots"])
+    for parsed, snapshot in zip(snapshots, dump_file["snapshots"]):
+        assert parsed == snapshot
+        assert parsed.atoms == snapshot.atoms
+    assert d[-1] == dump_file["snapshots"][-1]
+
+
+def test_dump_memory_map_parallel_parse(dump_file):
+    cb = OnSnapshotParseEnd()
+    d = Dump(dump_file["filename"], callback=cb, columnar=True, memory_map=True, persist_index=False)
+    d.parse(workers=2)
+    assert [snapshot.timestamp for snapshot in cb.snapshots] == [s.timestamp for s in dump_file["snapshots"]]
+
+
+class SkipOddSnapshots(DumpCallback):
+    """
+    Skip every other snapshot, raising from a different hook each time
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def on_snapshot_parse_begin(self, *args, **kwargs):
+        self.count += 1
+
+    def on_snapshot_parse_natoms(self, natoms: int, *args, **kwargs):
+        if self.count % 4 == 1:
+            raise SkipSnapshot("skipping snapshot")
+
+    def on_snapshot_parse_end(self, snapshot: DumpSnapshot, *args, **kwargs):
+        if self.count % 4 == 3:
+            raise SkipSnapshot("skipping snapshot")
+
+
+@pytest.mark.parametrize("memory_map", [False, True])
+def test_dump_skip_snapshot(dump_file, memory_map):
+    # Snapshots are skipped without a frame index
+    d = Dump(dump_file["filename"], callback=SkipSnapshotCallback(), memory_map=memory_map, persist_index=False)
+    assert [snapshot for snapshot in d] == []
+
+    d = Dump(dump_file["filename"], callback=SkipOddSnapshots(), memory_map=memory_map, persist_index=False)
+    assert [snapshot for snapshot in d] == dump_file["snapshots"][1::2]
+
+
+def test_dump_list_does_not_index(dump_file, tmp_path):
+    filename = str(tmp_path / "dump.lammpstrj")
+    shutil.copy(dump_file["filename"], filename)
+    assert list(Dump(filename)) == dump_file["snapshots"]
+    assert not os.path.exists(FrameIndex.sidecar(filename))
+
+
+def test_frame_filter():
+    frames = FrameFilter(start=100, stop=300, step=2)
+    timesteps = np.array([0, 100, 200, 300, 400])
+    assert frames.mask(timesteps).tolist() == [False, False, True, False, False]
+    assert [frames.accepts(frame, timestep) for frame, timestep in enumerate(timesteps)] == [
+        False,
+        False,
+        True,
+        False,
+        False,
+    ]
+    assert FrameFilter(timesteps={0, 400}).mask(timesteps).tolist() == [True, False, False, False, True]
+
+    with pytest.raises(ValueError):
+        FrameFilter(step=0)
+
+
+@pytest.mark.parametrize("memory_map", [False, True])
+@pytest.mark.parametrize("indexed", [False, True])
+def test_dump_frame_filter(dump_file, memory_map, indexed):
+    snapshots = dump_file["snapshots"]
+    cb = OnSnapshotParseBegin()
+    d = Dump(dump_file["filename"], callback=cb, memory_map=memory_map, frames=FrameFilter(step=2), persist_index=False)
+    if indexed:
+        assert d.nframes == len(snapshots)
+    else:
+        assert d.cached_index() is None
+    parsed = [snapshot for snapshot in d]
+    assert parsed == snapshots[::2]
+    assert cb.num_snapshots == len(parsed)
+
+    frames = FrameFilter(timesteps={snapshots[-1].timestamp})
+    d = Dump(dump_file["filename"], frames=frames, persist_index=False)
+    assert all([snapshot.timestamp == snapshots[-1].timestamp for snapshot in d])
+
+
+def test_dump_frame_filter_parallel_parse(dump_file):
+    d = Dump(dump_file["filename"], frames=FrameFilter(step=3), persist_index=False)
+    assert list(d.iparse(workers=2)) == dump_file["snapshots"][::3]
+
+
+def write_bgzf(data: bytes, filename: str):
+    """
+    Write `data` as a blocked gzip file
+    """
+    with open(filename, "wb") as f:
+        block_size = 1 << 12
+        for start in range(0, len(data), block_size):
+            chunk = data[start:][:block_size]
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            deflated = compressor.compress(chunk) + compressor.flush()
+            header = (
+                b"\x1f\x8b\x08\x04"
+                + b"\x00" * 4
+                + b"\x00\xff"
+                + struct.pack("<HccHH", 6, b"B", b"C", 2, len(deflated) + 25)
+            )
+            f.write(header + deflated + struct.pack("<II", zlib.crc32(chunk), len(chunk)))
+
+
+@pytest.mark.parametrize("compression", ["gzip", "bgzf", "bz2", "xz", "zstd"])
+def test_dump_compressed(dump_file, tmp_path, compression):
+    with open(dump_file["filename"], "rb") as f:
+        data = f.read()
+
+    filename = str(tmp_path / "dump.lammpstrj.compressed")
+    if compression == "gzip":
+        with gzip.open(filename, "wb") as f:
+            f.write(data)
+    elif compression == "bgzf":
+        write_bgzf(data, filename)
+    elif compression == "bz2":
+        with bz2.open(filename, "wb") as f:
+            f.write(data)
+    elif compression == "xz":
+        with lzma.open(filename, "wb") as f:
+            f.write(data)
+    else:
+        zstandard = pytest.importorskip("zstandard")
+        with open(filename, "wb") as f:
+            f.write(zstandard.ZstdCompressor().compress(data))
+
+    assert detect_compression(filename) == compression
+    snapshots = dump_file["snapshots"]
+    d = Dump(filename, columnar=True)
+    assert [snapshot for snapshot in d] == snapshots
+
+    # Offsets of the frame index refer to the decompressed stream
+    index = FrameIndex.for_file(filename)
+    assert index.length == len(data)
+    assert index.offsets.tolist() == FrameIndex.build(dump_file["filename"]).offsets.tolist()
+    assert d[-1] == snapshots[-1]
+    assert d[0].atoms == snapshots[0].atoms
+    assert list(Dump(filename, frames=FrameFilter(step=2)).iparse(workers=2)) == snapshots[::2]
+
+
+def test_dump_binary_convert(dump_file, tmp_path):
+    path = str(tmp_path / "trajectory")
+    binary = convert(dump_file["filename"], path)
+    snapshots = dump_file["snapshots"]
+    assert len(binary) == len(snapshots)
+    assert [snapshot for snapshot in binary] == snapshots
+    for snapshot, expected in zip(BinaryDump(path, copy=False), Dump(dump_file["filename"], columnar=True)):
+        assert snapshot.box == expected.box
+        assert snapshot.columns.keys() == expected.columns.keys()
+        for name, column in expected.columns.items():
+            assert np.array_equal(snapshot.columns[name], column)
+    assert binary.at_timestep(snapshots[-1].timestamp).atoms == snapshots[-1].atoms
+
+    with pytest.raises(FileExistsError):
+        convert(dump_file["filename"], path)
+    binary = convert(dump_file["filename"], path, unwrap=True, frames=FrameFilter(step=2), overwrite=True)
+    assert [snapshot for snapshot in binary] == snapshots[::2]
+    assert binary[0].unwrapped and "xu" in binary[0].columns
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_dump_profile(dump_file, columnar):
+    cb = OnSnapshotParseEnd()
+    d = Dump(dump_file["filename"], callback=cb, columnar=columnar, unwrap=True, profile=True)
+    d.parse()
+
+    snapshots = dump_file["snapshots"]
+    stats = d.stats
+    assert stats.frames == len(snapshots)
+    assert stats.atoms == sum(snapshot.natoms for snapshot in snapshots)
+    assert stats.bytes == stats.total_bytes == os.path.getsize(dump_file["filename"])
+    assert stats.eta == 0
+    for stage in ("header", "box", "atoms", "unwrap", "validation", "callback.on_snapshot_parse_end"):
+        assert stats.calls[stage] == len(snapshots)
+    assert ("atom objects" in stats.stages) != columnar
+    assert stats.calls["callback.on_parse_end"] == 1
+    assert f"{len(snapshots)} frames" in stats.summary()
+    assert "callback.on_snapshot_parse_end" in stats.report()
+    assert Dump(dump_file["filename"]).stats is None
+
+
+def test_dump_progress(dump_file):
+    messages = []
+    handler = logger.add(messages.append, level="INFO")
+    try:
+        Dump(dump_file["filename"], progress=0).parse(workers=2)
+    finally:
+        logger.remove(handler)
+    assert len(messages) == len(dump_file["snapshots"])
+    assert f"{len(dump_file['snapshots'])} frames" in messages[-1]
+
+
+@pytest.mark.parametrize("triclinic", [False, True])
+def test_generate_dump(tmp_path, triclinic):
+    filename = str(tmp_path / "dump.synthetic")
+    names = COLUMN_SETS["image"] + ("xu", "yu", "zu", "xs", "vx")
+    for path in (filename, str(tmp_path / "copy")):
+        generate_dump(path, natoms=300, nframes=3, columns=names, triclinic=triclinic, every=50, chunk_size=128)
+    # The same seed writes the same file
+    with open(filename, "rb") as f, open(str(tmp_path / "copy"), "rb") as copy:
+        assert f.read() == copy.read()
+
+    box = synthetic_box(300, triclinic=triclinic)
+    snapshots = list(Dump(filename, columnar=True, persist_index=False))
+    assert [snapshot.timestamp for snapshot in snapshots] == [0, 50, 100]
+    for snapshot in snapshots:
+        assert snapshot.natoms == 300
+        assert tuple(snapshot.columns) == names
+        assert snapshot.box.triclinic == triclinic
+        assert np.allclose(
+            [snapshot.box.dict()[key] for key in "xlo xhi ylo yhi zlo zhi xy xz yz".split()],
+            [box.dict()[key] for key in "xlo xhi ylo yhi zlo zhi xy xz yz".split()],
+        )
+        assert snapshot.columns["id"].tolist() == list(range(1, 301))
+        unwrapped = coordinates.unwrap({name: snapshot.columns[name] for name in COLUMN_SETS["image"]}, snapshot.box)
+        for name in ("xu", "yu", "zu"):
+            assert np.allclose(unwrapped[name], snapshot.columns[name], atol=1e-3)
+        assert np.all((snapshot.columns["xs"] >= 0) & (snapshot.columns["xs"] <= 1))
+
+
+def test_atom_filter():
+    columns = {
+        "id": np.array([1.0, 2.0, 3.0, 4.0]),
+        "type": np.array([1.0, 2.0, 3.0, 2.0]),
+        "x": np.array([0.5, 1.5, 2.5, 3.5]),
+    }
+    assert AtomFilter().mask(columns).tolist() == [True] * 4
+    assert AtomFilter(types={2, 3}).mask(columns).tolist() == [False, True, True, True]
+    assert AtomFilter(types={2}, id_max=3).mask(columns).tolist() == [False, True, False, False]
+    assert AtomFilter(id_min=2, xhi=3.0)(columns).tolist() == [False, True, True, False]
+    with pytest.raises(KeyError):
+        AtomFilter(zlo=0.0).mask(columns)
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_dump_columns_and_where(tmp_path, columnar):
+    filename = generate_dump(str(tmp_path / "dump"), natoms=400, nframes=4, columns="molecular", triclinic=True)
+    where = AtomFilter(types={1, 3}, id_min=50, xhi=5.0)
+    names = ["id", "type", "x", "y", "z"]
+
+    full = list(Dump(filename, columnar=True))
+    for workers in (1, 2):
+        snapshots = list(Dump(filename, columnar=columnar, columns=names, where=where).iparse(workers=workers))
+        for snapshot, expected in zip(snapshots, full):
+            keep = where.mask({name: column.astype(float) for name, column in expected.columns.items()})
+            assert 0 < snapshot.natoms == keep.sum() < 400
+            assert snapshot.column_names == names
+            for name in names:
+                assert np.array_equal(snapshot.column(name), expected.columns[name][keep])
+
+    unwrapped = Dump(filename, columnar=True, unwrap=True, columns=["id", "xu"], where=lambda c: c["id"] <= 10)[1]
+    assert unwrapped.column_names == ["id", "xu", "yu", "zu"]
+    assert unwrapped.natoms == 10
+    expected = coordinates.unwrap(dict(full[1].columns), full[1].box)
+    assert np.allclose(unwrapped.columns["yu"], expected["yu"][:10])
+
+    with pytest.raises(KeyError):
+        Dump(filename, columns=["id", "vx"])[0]
+
+
+def test_dump_frame_end(tmp_path):
+    filename = generate_dump(str(tmp_path / "dump"), natoms=20, nframes=2)
+    with open(filename, "rb") as f:
+        data = f.read()
+    second = data.index(b"ITEM: TIMESTEP", 1)
+
+    partial = str(tmp_path / "partial")
+    for end, expected in ((len(data), len(data) - second), (len(data) - 1, None), (second + 30, None)):
+        with open(partial, "wb") as f:
+            f.write(data[:end])
+        with Dump(partial, persist_index=False) as d:
+            assert d.frame_end(0) == second
+            assert d.frame_end(second) == (None if expected is None else second + expected)
+            assert d.file.tell() == second
+
+
+@pytest.mark.parametrize("memory_map", [False, True])
+def test_dump_follow(tmp_path, memory_map):
+    source = generate_dump(str(tmp_path / "source"), natoms=50, nframes=6, columns="molecular")
+    with open(source, "rb") as f:
+        data = f.read()
+    expected = list(Dump(source, columnar=True, persist_index=False))
+
+    filename = str(tmp_path / "dump")
+    # Start with one and a half snapshots
+    cut = data.index(b"ITEM: TIMESTEP", 1) + 700
+    with open(filename, "wb") as f:
+        f.write(data[:cut])
+
+    def simulation():
+        # Write the rest in pieces ending in the middle of lines
+        position = cut
+        with open(filename, "ab") as f:
+            while position < len(data):
+                time.sleep(0.02)
+                f.write(data[position:][:997])
+                f.flush()
+                position += 997
+
+    cb = OnSnapshotParseBegin()
+    d = Dump(filename, callback=cb, columnar=True, persist_index=False, memory_map=memory_map)
+    writer = threading.Thread(target=simulation)
+    writer.start()
+    snapshots = list(d.follow(interval=0.005, timeout=0.5))
+    writer.join()
+
+    assert [s.timestamp for s in snapshots] == [s.timestamp for s in expected]
+    assert cb.num_snapshots == len(expected)
+    for snapshot, reference in zip(snapshots, expected):
+        for name, column in reference.columns.items():
+            assert np.array_equal(snapshot.columns[name], column)
+
+    with open(filename, "ab") as f:
+        f.write(data[: data.index(b"ITEM: TIMESTEP", 1)])
+    assert [s.timestamp for s in d.follow(interval=0.005, timeout=0.05)] == [0]
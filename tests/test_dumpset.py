@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from lmptools.core.simulation import DumpSnapshot
+from lmptools.dump.base import Dump
+from lmptools.dump.dumpset import DumpSet, natural_key
+from lmptools.dump.filters import FrameFilter
+from lmptools.dump.synthetic import generate_dump
+from lmptools.writers.dump import DumpWriter
+
+
+@pytest.fixture
+def trajectory(tmp_path):
+    filename = generate_dump(str(tmp_path / "trajectory"), natoms=90, nframes=5, every=500, triclinic=True)
+    return list(Dump(filename, columnar=True, persist_index=False))
+
+
+def split(snapshot: DumpSnapshot, nprocs: int):
+    """
+    Pieces of `snapshot` written by `nprocs` processors
+    """
+    for columns in zip(*[np.array_split(column, nprocs) for column in snapshot.columns.values()]):
+        pieces = dict(zip(snapshot.columns, columns))
+        yield DumpSnapshot(timestamp=snapshot.timestamp, natoms=len(columns[0]), box=snapshot.box, columns=pieces)
+
+
+def assert_same(snapshots, expected):
+    assert len(snapshots) == len(expected)
+    for snapshot, reference in zip(snapshots, expected):
+        assert snapshot == reference
+        for name, column in reference.columns.items():
+            assert np.array_equal(snapshot.column(name), column)
+
+
+def test_natural_key():
+    names = ["dump.10.3", "dump.9.12", "dump.9.2", "dump.100.0"]
+    assert sorted(names, key=natural_key) == ["dump.9.2", "dump.9.12", "dump.10.3", "dump.100.0"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_dump_set_per_processor(tmp_path, trajectory, workers):
+    # One file per processor holding every timestep, the last processor owns an empty subdomain
+    writers = [DumpWriter(str(tmp_path / f"dump.{proc}.lammpstrj")) for proc in range(13)]
+    for snapshot in trajectory:
+        empty = {name: column[:0] for name, column in snapshot.columns.items()}
+        pieces = list(split(snapshot, 12))
+        pieces.append(DumpSnapshot(timestamp=snapshot.timestamp, natoms=0, box=snapshot.box, columns=empty))
+        for writer, piece in zip(writers, pieces):
+            writer.write(piece)
+    for writer in writers:
+        writer.close()
+
+    with DumpSet(str(tmp_path / "dump.*.lammpstrj"), max_open=3, workers=workers, columnar=True) as dumps:
+        assert dumps.timesteps.tolist() == [snapshot.timestamp for snapshot in trajectory]
+        assert len(dumps.pieces(0)) == 13
+        snapshots = list(dumps)
+        assert all(snapshot.columnar for snapshot in snapshots)
+        assert_same(snapshots, trajectory)
+        assert dumps.nopen <= 3
+        assert_same([dumps.at_timestep(1000), dumps[-1]], [trajectory[2], trajectory[-1]])
+        assert dumps.nopen == 3
+    assert dumps.nopen == 0
+
+    atoms = DumpSet(str(tmp_path / "dump.*.lammpstrj"), frames=FrameFilter(start=1000))
+    assert_same(list(atoms), trajectory[2:])
+    assert atoms[0].atoms == trajectory[2].atoms
+
+
+def test_dump_set_per_timestep(tmp_path, trajectory):
+    # One file per timestep and processor, the numbers in the file names are sorted by value
+    for snapshot in trajectory:
+        for proc, piece in enumerate(split(snapshot, 2)):
+            with DumpWriter(str(tmp_path / f"dump.{snapshot.timestamp}.{proc}")) as writer:
+                writer.write(piece)
+
+    dumps = DumpSet(str(tmp_path / "dump.*"), columnar=True, columns=["id", "x"])
+    assert dumps.filenames[:4] == [
+        str(tmp_path / name) for name in ("dump.0.0", "dump.0.1", "dump.500.0", "dump.500.1")
+    ]
+    assert [snapshot.column_names for snapshot in dumps] == [["id", "x"]] * len(trajectory)
+    assert np.array_equal(dumps[1].columns["x"], trajectory[1].columns["x"])
+    with pytest.raises(KeyError):
+        dumps.at_timestep(1)
+    # The frame index sidecars written next to the files are not dump files
+    assert DumpSet(str(tmp_path / "dump.*")).filenames == dumps.filenames
+    with pytest.raises(FileNotFoundError):
+        DumpSet(str(tmp_path / "missing.*"))
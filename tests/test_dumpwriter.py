@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from lmptools.core.simulation import DumpSnapshot
+from lmptools.dump.base import Dump
+from lmptools.dump.synthetic import generate_dump, synthetic_box
+from lmptools.writers.dump import DumpWriter
+
+COLUMNS = ("id", "mol", "type", "q", "x", "y", "z", "ix", "iy", "iz", "xs", "zu")
+
+
+@pytest.mark.parametrize("triclinic", [False, True])
+def test_dump_writer_round_trip(tmp_path, triclinic):
+    source = generate_dump(str(tmp_path / "source"), 200, 4, COLUMNS, triclinic=triclinic)
+    written, rewritten = str(tmp_path / "written"), str(tmp_path / "rewritten")
+
+    Dump(source, callback=DumpWriter(written, chunk_size=64), columnar=True, persist_index=False).parse()
+    with DumpWriter(rewritten, columns=COLUMNS) as writer:
+        for snapshot in Dump(written, persist_index=False):
+            writer.write(snapshot)
+    assert writer.nframes == 4
+    with open(written, "rb") as f, open(rewritten, "rb") as g:
+        assert f.read() == g.read()
+
+    for snapshot, expected in zip(Dump(written, columnar=True), Dump(source, columnar=True)):
+        assert snapshot.box == expected.box
+        assert snapshot.column_names == list(COLUMNS)
+        for name in COLUMNS:
+            assert np.array_equal(snapshot.columns[name], expected.columns[name])
+
+
+def test_dump_writer_formats_and_append(tmp_path):
+    box = synthetic_box(3)
+    columns = {"id": np.array([3, 1, 2]), "x": np.array([0.5, 1.25, 2.0]), "y": np.array([1.0, 2.0, 3.0])}
+    snapshot = DumpSnapshot(timestamp=10, natoms=3, box=box, columns=columns)
+    empty = DumpSnapshot(timestamp=20, natoms=0, box=box, columns={})
+    filename = str(tmp_path / "dump")
+
+    with DumpWriter(filename, columns=["id", "x"], formats={"x": "%.3f"}) as writer:
+        writer.write(snapshot)
+    with DumpWriter(filename, columns=["id", "x"], formats={"x": "%.3f"}, append=True) as writer:
+        writer.write(empty)
+        writer.write(snapshot)
+
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    assert lines[9:12] == ["3 0.500", "1 1.250", "2 2.000"]
+    assert "".join(str(snapshot).splitlines(keepends=True)[9:]) == "3 0.5 1.0\n1 1.25 2.0\n2 2.0 3.0\n"
+
+    snapshots = list(Dump(filename, columnar=True, persist_index=False))
+    assert [s.timestamp for s in snapshots] == [10, 20, 10]
+    assert snapshots[1].natoms == 0
+    assert snapshots[2].columns["id"].tolist() == [3, 1, 2]
+    assert Dump(filename, memory_map=True)[2].column("x").tolist() == [0.5, 1.25, 2.0]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_dump_writer_empty_snapshot_round_trip(tmp_path, columnar):
+    box = synthetic_box(3)
+    empty = DumpSnapshot(timestamp=20, natoms=0, box=box, **({"columns": {}} if columnar else {}))
+    declared = DumpSnapshot(timestamp=30, natoms=0, box=box, columns={"id": np.array([], dtype=np.int64)})
+    written, rewritten = str(tmp_path / "written"), str(tmp_path / "rewritten")
+
+    with DumpWriter(written) as writer:
+        writer.write(empty)
+        writer.write(declared)
+    with open(written) as f:
+        headers = [line for line in f.read().splitlines() if line.startswith("ITEM: ATOMS")]
+    assert headers == ["ITEM: ATOMS", "ITEM: ATOMS id"]
+
+    snapshots = list(Dump(written, columnar=columnar, persist_index=False))
+    assert [(s.timestamp, s.natoms, s.box) for s in snapshots] == [(20, 0, box), (30, 0, box)]
+    with DumpWriter(rewritten) as writer:
+        writer.write(snapshots[0])
+    with open(written) as f, open(rewritten) as g:
+        assert g.read() == "".join(f.readlines()[:9])
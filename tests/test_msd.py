@@ -0,0 +1,115 @@
+from typing import List
+
+import numpy as np
+import pytest
+
+from lmptools.analysis import MSD, MSDResult, msd_fft
+from lmptools.core.cache import ResultCache
+from lmptools.core.simulation import DumpSnapshot, SimulationBox
+from lmptools.core.task import Pipeline
+from lmptools.dump.base import Dump
+from lmptools.writers.dump import DumpWriter
+
+
+def msd_direct(trajectories: np.ndarray) -> np.ndarray:
+    natoms, nframes, _ = trajectories.shape
+    result = np.zeros((natoms, nframes))
+    for lag in range(1, nframes):
+        displacements = trajectories[:, lag:, :] - trajectories[:, :-lag, :]
+        result[:, lag] = np.einsum("atd,atd->at", displacements, displacements).mean(axis=1)
+    return result
+
+
+@pytest.fixture(scope="module")
+def trajectory():
+    rng = np.random.default_rng(5)
+    natoms, nframes = 37, 64
+    # Random walks, (natoms, T, 3)
+    return np.cumsum(rng.normal(scale=0.3, size=(natoms, nframes, 3)), axis=1)
+
+
+def test_msd_fft(trajectory):
+    assert np.allclose(msd_fft(trajectory), msd_direct(trajectory))
+
+
+@pytest.fixture(scope="module")
+def labels(trajectory):
+    rng = np.random.default_rng(1)
+    natoms = trajectory.shape[0]
+    return rng.integers(1, 4, natoms), np.arange(natoms) // 5
+
+
+def make_snapshots(trajectory: np.ndarray, types: np.ndarray, mols: np.ndarray) -> List[DumpSnapshot]:
+    natoms, nframes, _ = trajectory.shape
+    rng = np.random.default_rng(1)
+    box = SimulationBox(xprd="pp", yprd="pp", zprd="pp", xlo=0.0, xhi=5.0, ylo=0.0, yhi=5.0, zlo=0.0, zhi=5.0)
+    snapshots = []
+    for frame in range(nframes):
+        # Wrapped coordinates and image flags, atom lines shuffled
+        images = np.floor(trajectory[:, frame, :] / 5.0)
+        wrapped = trajectory[:, frame, :] - images * 5.0
+        order = rng.permutation(natoms)
+        columns = {"id": order + 1, "type": types[order], "mol": mols[order]}
+        for d, (coordinate, image) in enumerate(zip("xyz", ("ix", "iy", "iz"))):
+            columns[coordinate] = wrapped[order, d]
+            columns[image] = images[order, d].astype(np.int64)
+        snapshots.append(DumpSnapshot(timestamp=100 * frame, natoms=natoms, box=box, columns=columns))
+    return snapshots
+
+
+def check_result(result: MSDResult, trajectory: np.ndarray, types: np.ndarray, mols: np.ndarray) -> None:
+    expected = msd_direct(trajectory)
+    assert result.timesteps.tolist() == (100 * np.arange(trajectory.shape[1])).tolist()
+    assert np.allclose(result.total, expected.mean(axis=0))
+    for label in [1, 2, 3]:
+        assert np.allclose(result.types[label], expected[types == label].mean(axis=0))
+    assert sorted(result.mols) == sorted(set(mols.tolist()))
+    for label in set(mols.tolist()):
+        assert np.allclose(result.mols[label], expected[mols == label].mean(axis=0))
+
+
+def test_msd_task(trajectory, labels):
+    msd = MSD(chunk_size=8, mols=True)
+    for snapshot in make_snapshots(trajectory, *labels):
+        msd.update(snapshot)
+    check_result(msd.compute(), trajectory, *labels)
+    msd.close()
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_msd_pipeline(trajectory, labels, tmp_path, processes):
+    filename = str(tmp_path / "dump.lammpstrj")
+    with DumpWriter(filename) as writer:
+        for snapshot in make_snapshots(trajectory, *labels):
+            writer.write(snapshot)
+
+    task = MSD(chunk_size=8, mols=True)
+    pipeline = Pipeline([task])
+    cache = ResultCache(str(tmp_path / "cache"))
+    for cached in (False, True):
+        # The second pass only reads the frames of the first one from the cache
+        msd = MSD(chunk_size=8, mols=True)
+        for result in pipeline.execute(Dump(filename, columnar=True), workers=2, processes=processes, cache=cache):
+            assert result.cached == cached
+            msd.add(result.results[0])
+        check_result(msd.compute(), trajectory, *labels)
+        msd.close()
+    assert task.nframes == 0
+
+
+def test_msd_requires_same_atoms():
+    box = SimulationBox(xprd="pp", yprd="pp", zprd="pp", xlo=0.0, xhi=5.0, ylo=0.0, yhi=5.0, zlo=0.0, zhi=5.0)
+    msd = MSD()
+    for natoms in [3, 4]:
+        columns = {"id": np.arange(natoms), "xu": np.zeros(natoms), "yu": np.zeros(natoms), "zu": np.zeros(natoms)}
+        snapshot = DumpSnapshot(timestamp=0, natoms=natoms, box=box, columns=columns)
+        if natoms == 3:
+            msd.update(snapshot)
+        else:
+            with pytest.raises(ValueError):
+                msd.update(snapshot)
+
+    # Frames are added in time order
+    columns = {"id": np.arange(3), "xu": np.zeros(3), "yu": np.zeros(3), "zu": np.zeros(3)}
+    with pytest.raises(ValueError):
+        msd.update(DumpSnapshot(timestamp=0, natoms=3, box=box, columns=columns))
@@ -0,0 +1,93 @@
+from itertools import product
+
+import numpy as np
+import pytest
+
+from lmptools.analysis import NeighborList, candidate_pairs
+from lmptools.core.coordinates import box_matrix
+from lmptools.core.simulation import DumpSnapshot, SimulationBox
+
+
+def make_box(xy: float = 0.0, xz: float = 0.0, yz: float = 0.0, zprd: str = "pp") -> SimulationBox:
+    return SimulationBox(
+        xprd="pp",
+        yprd="pp",
+        zprd=zprd,
+        xlo=-2.0,
+        xhi=4.0,
+        ylo=0.0,
+        yhi=5.0,
+        zlo=1.0,
+        zhi=6.5,
+        xy=xy,
+        xz=xz,
+        yz=yz,
+        triclinic=bool(xy or xz or yz),
+    )
+
+
+def brute_force(points: np.ndarray, box: SimulationBox, cutoff: float) -> set:
+    matrix = box_matrix(box)
+    periodic = [prd == "pp" for prd in (box.xprd, box.yprd, box.zprd)]
+    shifts = [np.array(n) for n in product((-1, 0, 1), repeat=3) if all(p or not s for p, s in zip(periodic, n))]
+    differences = points[None, :, :] - points[:, None, :]
+    distances = np.min([np.linalg.norm(differences + matrix @ n, axis=2) for n in shifts], axis=0)
+    i, j = np.nonzero(np.triu(distances <= cutoff, k=1))
+    return set(zip(i.tolist(), j.tolist()))
+
+
+def make_snapshot(points: np.ndarray, box: SimulationBox, ids=None) -> DumpSnapshot:
+    ids = np.arange(1, len(points) + 1) if ids is None else ids
+    columns = {"id": ids, "x": points[:, 0].copy(), "y": points[:, 1].copy(), "z": points[:, 2].copy()}
+    return DumpSnapshot(timestamp=0, natoms=len(points), box=box, columns=columns)
+
+
+def random_points(box: SimulationBox, natoms: int, seed: int = 3) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # Some atoms slightly outside the box, as written by LAMMPS between reneighborings
+    fractional = rng.uniform(-0.05, 1.05, size=(natoms, 3))
+    return np.array([box.xlo, box.ylo, box.zlo]) + fractional @ box_matrix(box).T
+
+
+@pytest.mark.parametrize(
+    "box",
+    [make_box(), make_box(xy=1.5, xz=-0.8, yz=0.6), make_box(zprd="ff"), make_box(xy=-2.0, zprd="fm")],
+)
+def test_candidate_pairs(box):
+    points = random_points(box, 150)
+    pairs = candidate_pairs(points, box, 1.2)
+    assert np.all(pairs[:, 0] < pairs[:, 1])
+    assert len({tuple(pair) for pair in pairs.tolist()}) == len(pairs)
+    assert {tuple(pair) for pair in pairs.tolist()} == brute_force(points, box, 1.2)
+
+
+def test_candidate_pairs_cutoff_too_large():
+    with pytest.raises(ValueError):
+        candidate_pairs(np.zeros((2, 3)), make_box(), 2.6)
+
+
+@pytest.mark.parametrize("box", [make_box(), make_box(xy=1.5, xz=-0.8, yz=0.6)])
+def test_neighbor_list_verlet_reuse(box):
+    rng = np.random.default_rng(11)
+    points = random_points(box, 120)
+    neighbors = NeighborList(cutoff=1.0, skin=0.4, vectors=True)
+
+    for step in range(6):
+        # Shuffle the atom lines, atoms are matched through their ids
+        order = rng.permutation(len(points))
+        snapshot = make_snapshot(points[order], box, ids=np.arange(1, len(points) + 1)[order])
+        pairs = neighbors.run(snapshot)
+
+        assert np.all(pairs.i < pairs.j)
+        found = {tuple(sorted((order[i], order[j]))) for i, j in zip(pairs.i.tolist(), pairs.j.tolist())}
+        assert found == brute_force(points, box, 1.0)
+        assert np.allclose(np.linalg.norm(pairs.vectors, axis=1), pairs.distances)
+        points = points + rng.uniform(-0.03, 0.03, size=points.shape)
+
+    # Atoms moved at most 6 * 0.03 * sqrt(3) < skin / 2
+    assert neighbors.builds == 1
+
+    points = points + rng.uniform(-0.5, 0.5, size=points.shape)
+    pairs = neighbors.run(make_snapshot(points, box))
+    assert neighbors.builds == 2
+    assert {tuple(pair) for pair in zip(pairs.i.tolist(), pairs.j.tolist())} == brute_force(points, box, 1.0)
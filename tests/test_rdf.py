@@ -0,0 +1,116 @@
+import functools
+import operator
+
+import numpy as np
+import pytest
+
+from lmptools.analysis import RDF, accumulate_rdf
+from lmptools.core.cache import ResultCache
+from lmptools.core.simulation import DumpSnapshot, SimulationBox
+from lmptools.core.task import Pipeline
+from lmptools.dump.base import Dump
+from lmptools.writers.dump import DumpWriter
+
+
+def make_snapshot(timestep: int, natoms: int, length: float, seed: int) -> DumpSnapshot:
+    rng = np.random.default_rng(seed)
+    box = SimulationBox(xprd="pp", yprd="pp", zprd="pp", xlo=0.0, xhi=length, ylo=0.0, yhi=length, zlo=0.0, zhi=length)
+    points = rng.uniform(0.0, length, size=(natoms, 3))
+    columns = {
+        "id": np.arange(1, natoms + 1),
+        "type": rng.integers(1, 3, natoms),
+        "x": points[:, 0].copy(),
+        "y": points[:, 1].copy(),
+        "z": points[:, 2].copy(),
+    }
+    return DumpSnapshot(timestamp=timestep, natoms=natoms, box=box, columns=columns)
+
+
+@pytest.fixture(scope="module")
+def snapshots():
+    # Boxes of different volumes, g(r) of an ideal gas is 1 regardless
+    return [make_snapshot(timestep, 400, 8.0 + 0.5 * timestep, timestep) for timestep in range(6)]
+
+
+def test_rdf_ideal_gas(snapshots):
+    rdf = RDF(rmax=3.5, nbins=10)
+    for snapshot in snapshots:
+        rdf.update(snapshot)
+    assert rdf.nframes == len(snapshots)
+    assert rdf.pairs == [(1, 1), (1, 2), (2, 2)]
+    assert np.allclose(rdf.g()[2:], 1.0, atol=0.1)
+    for pair in rdf.pairs:
+        assert np.allclose(rdf.g(pair)[3:], 1.0, atol=0.2)
+    assert np.array_equal(rdf.g((2, 1)), rdf.g((1, 2)))
+
+
+def test_rdf_histogram(snapshots):
+    snapshot = snapshots[0]
+    rdf = RDF(rmax=3.0, nbins=6).update(snapshot)
+    points = np.stack([snapshot.columns[name] for name in ("x", "y", "z")], axis=1)
+    differences = points[None, :, :] - points[:, None, :]
+    differences -= snapshot.box.Lx * np.round(differences / snapshot.box.Lx)
+    distances = np.linalg.norm(differences, axis=2)[np.triu_indices(len(points), k=1)]
+    expected, _ = np.histogram(distances, bins=rdf.edges)
+    assert rdf._counts[None].tolist() == expected.tolist()
+
+
+def test_rdf_merge(snapshots):
+    full = RDF(rmax=3.5, nbins=10)
+    for snapshot in snapshots:
+        full.update(snapshot)
+
+    partials = [RDF(rmax=3.5, nbins=10) for _ in range(3)]
+    for index, snapshot in enumerate(snapshots):
+        accumulate_rdf(partials[index % 3], snapshot)
+    merged = functools.reduce(operator.add, partials)
+    assert merged.nframes == full.nframes
+    assert np.allclose(merged.g(), full.g())
+    assert np.allclose(merged.g((1, 2)), full.g((1, 2)))
+    # Adding does not change the partial accumulators
+    assert partials[0].nframes == 2
+
+    with pytest.raises(ValueError):
+        full.merge(RDF(rmax=3.0, nbins=10))
+
+
+@pytest.fixture
+def dump_filename(snapshots, tmp_path):
+    filename = str(tmp_path / "dump.lammpstrj")
+    with DumpWriter(filename) as writer:
+        for snapshot in snapshots:
+            writer.write(snapshot)
+    return filename
+
+
+def test_rdf_parallel_reduce(snapshots, dump_filename):
+    filename = dump_filename
+
+    partials = Dump(filename, columnar=True).parse(workers=2, reducer=accumulate_rdf, initial=RDF(rmax=3.5, nbins=10))
+    merged = functools.reduce(operator.add, partials)
+    expected = RDF(rmax=3.5, nbins=10)
+    for snapshot in snapshots:
+        expected.update(snapshot)
+    assert merged.nframes == len(snapshots)
+    assert np.allclose(merged.g(), expected.g())
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_rdf_pipeline(snapshots, dump_filename, tmp_path, processes):
+    expected = RDF(rmax=3.5, nbins=10)
+    for snapshot in snapshots:
+        expected.update(snapshot)
+
+    task = RDF(rmax=3.5, nbins=10)
+    pipeline = Pipeline([task])
+    cache = ResultCache(str(tmp_path / "cache"))
+    for cached in (False, True):
+        # The second pass only reads the results of the first one from the cache
+        dump = Dump(dump_filename, columnar=True)
+        results = list(pipeline.execute(dump, workers=2, processes=processes, cache=cache))
+        assert all(result.cached == cached for result in results)
+        rdf = RDF(rmax=3.5, nbins=10).merge(*[result.results[0] for result in results])
+        assert rdf.nframes == len(snapshots)
+        assert np.allclose(rdf.g(), expected.g())
+        assert np.allclose(rdf.g((1, 2)), expected.g((1, 2)))
+    assert task.nframes == 0
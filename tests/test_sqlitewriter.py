@@ -1,10 +1,13 @@
 import os
 import random
+import warnings
 from typing import List
 
+import numpy as np
 import pytest
+from loguru import logger
 from pydantic import parse_obj_as
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import Session, sessionmaker
 
 from lmptools.core.atom import Atom
@@ -15,8 +18,10 @@ from lmptools.writers.sql import (
     Base,
     SimulationBoxModel,
     SimulationModel,
+    SQLReader,
     SQLWriter,
     TimestepModel,
+    sqlreader,
 )
 
 
@@ -194,3 +199,233 @@ def test_dump_snapshot_persist_simulation_timestep(dump_file):
         res = session.query(TimestepModel.timestep).filter(TimestepModel.timestep == snapshot.timestamp).scalar()
         assert res == snapshot.timestamp
     os.remove("test.db")
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_dump_snapshot_persist_atoms(dump_file, columnar):
+    cb = SQLWriter(simulation_id=1, db_name="test.db")
+    d = Dump(filename=dump_file["filename"], callback=cb, columnar=columnar)
+    d.parse()
+
+    engine = create_engine("sqlite:///test.db", echo=False)
+    session = Session(bind=engine)
+    snapshot = dump_file["snapshots"][-1]
+    atoms = session.query(AtomModel).filter(AtomModel.timestep_id == snapshot.timestamp).order_by(AtomModel.sql_id)
+    assert atoms.count() >= snapshot.natoms
+    assert atoms.all()[-1].id == snapshot.atoms[-1].id
+    os.remove("test.db")
+
+
+def test_dump_snapshot_bulk_ingest(dump_file):
+    cb = SQLWriter(simulation_id=1, db_name="test.db", batch_size=4, bulk_pragmas=True, defer_indexes=True)
+    engine = create_engine("sqlite:///test.db", echo=False)
+    assert not inspect(engine).get_indexes("atoms")
+
+    d = Dump(filename=dump_file["filename"], callback=cb, columnar=True)
+    d.parse()
+
+    session = Session(bind=engine)
+    assert session.query(AtomModel).count() == sum([snapshot.natoms for snapshot in dump_file["snapshots"]])
+    assert session.query(SimulationBoxModel).count() == len(dump_file["snapshots"])
+    assert len(inspect(engine).get_indexes("atoms")) == len(AtomModel.__table__.indexes)
+    # The bulk pragmas only last until the writer is closed
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+    engine.dispose()
+    for filename in ["test.db", "test.db-wal", "test.db-shm"]:
+        if os.path.exists(filename):
+            os.remove(filename)
+
+
+def test_dump_snapshot_asynchronous_ingest(dump_file):
+    cb = SQLWriter(simulation_id=1, db_name="test.db", batch_size=3, asynchronous=True, queue_size=2)
+    d = Dump(filename=dump_file["filename"], callback=cb, columnar=True)
+    d.parse()
+
+    engine = create_engine("sqlite:///test.db", echo=False)
+    session = Session(bind=engine)
+    assert session.query(AtomModel).count() == sum([snapshot.natoms for snapshot in dump_file["snapshots"]])
+    assert session.query(SimulationBoxModel).count() == len(dump_file["snapshots"])
+    engine.dispose()
+    os.remove("test.db")
+
+
+class FailingSQLWriter(SQLWriter):
+    def write(self, snapshots: List[DumpSnapshot]) -> None:
+        raise RuntimeError("disk full")
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_dump_snapshot_write_errors_are_raised(dump_file, asynchronous):
+    cb = FailingSQLWriter(simulation_id=1, db_name="test.db", batch_size=2, asynchronous=asynchronous)
+    cb.on_snapshot_parse_end(dump_file["snapshots"][0])
+    with pytest.raises(RuntimeError, match="disk full"):
+        cb.close()
+    os.remove("test.db")
+
+
+class FlakySQLWriter(SQLWriter):
+    failed = False
+
+    def write(self, snapshots: List[DumpSnapshot]) -> None:
+        if not self.failed:
+            self.failed = True
+            raise RuntimeError("disk full")
+        super().write(snapshots)
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_dump_snapshot_write_errors_are_sticky(dump_file, asynchronous, tmp_path):
+    db_name = str(tmp_path / "test.db")
+    cb = FlakySQLWriter(simulation_id=1, db_name=db_name, batch_size=1, asynchronous=asynchronous)
+    first, second = dump_file["snapshots"][:2]
+    try:
+        cb.on_snapshot_parse_end(first)
+    except RuntimeError:
+        pass
+    with pytest.raises(RuntimeError, match="disk full"):
+        cb.flush()
+
+    # Snapshots following the dropped one are never written
+    with pytest.raises(RuntimeError, match="disk full"):
+        cb.on_snapshot_parse_end(second)
+    with pytest.raises(RuntimeError, match="disk full"):
+        cb.write([second])
+    with pytest.raises(RuntimeError, match="disk full"):
+        cb.close()
+    with pytest.raises(RuntimeError, match="disk full"):
+        cb.close()
+
+    engine = create_engine(f"sqlite:///{db_name}", echo=False)
+    assert Session(bind=engine).query(AtomModel).count() == 0
+    engine.dispose()
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_deferred_indexes_are_rebuilt_after_errors(dump_file, asynchronous, tmp_path):
+    db_name = str(tmp_path / "test.db")
+    cb = FailingSQLWriter(db_name=db_name, simulation_id=1, batch_size=2, defer_indexes=True, asynchronous=asynchronous)
+    engine = create_engine(f"sqlite:///{db_name}", echo=False)
+    assert not inspect(engine).get_indexes("atoms")
+
+    cb.on_snapshot_parse_end(dump_file["snapshots"][0])
+    with pytest.raises(RuntimeError, match="disk full"):
+        cb.close()
+    assert len(inspect(engine).get_indexes("atoms")) == len(AtomModel.__table__.indexes)
+    engine.dispose()
+
+
+@pytest.fixture
+def sql_store(tmp_path):
+    from lmptools.dump.synthetic import generate_dump
+
+    filename = generate_dump(str(tmp_path / "dump.lammpstrj"), natoms=50, nframes=5, columns="image", every=10)
+    db_name = str(tmp_path / "test.db")
+    cb = SQLWriter(simulation_id=1, db_name=db_name, batch_size=2)
+    Dump(filename=filename, callback=cb, columnar=True, persist_index=False).parse()
+    snapshots = list(Dump(filename=filename, columnar=True, persist_index=False))
+    yield db_name, snapshots
+
+
+def test_sql_reader_round_trip(sql_store):
+    db_name, snapshots = sql_store
+    with SQLReader(simulation_id=1, db_name=db_name, batch_size=32) as reader:
+        assert len(reader) == len(snapshots)
+        assert reader.timesteps.tolist() == [snapshot.timestamp for snapshot in snapshots]
+        for read, snapshot in zip(reader, snapshots):
+            assert read == snapshot
+            assert set(read.column_names) == set(snapshot.column_names) | {"mass"}
+            # Columns missing from the dump are stored with their default
+            assert (read.column("mass") == 1.0).all()
+            for name in snapshot.column_names:
+                assert read.column(name).dtype == snapshot.column(name).dtype
+                assert np.array_equal(read.column(name), snapshot.column(name))
+
+
+def test_sql_reader_timestep_range_and_ids(sql_store, monkeypatch):
+    db_name, snapshots = sql_store
+    reader = SQLReader(simulation_id=1, db_name=db_name, columns=["x", "ix"])
+    read = list(reader.read(start=10, stop=30, ids=[40, 3, 7, 3]))
+    assert [snapshot.timestamp for snapshot in read] == [10, 20, 30]
+    for snapshot in read:
+        assert snapshot.column_names == ["id", "x", "ix"]
+        assert snapshot.column("id").tolist() == [3, 7, 40]
+        source = next(s for s in snapshots if s.timestamp == snapshot.timestamp)
+        assert np.array_equal(snapshot.column("x"), source.column("x")[[2, 6, 39]])
+
+    # Large subsets are read by id range and filtered after fetching
+    monkeypatch.setattr(sqlreader, "MAX_IN_IDS", 10)
+    ids = list(range(2, 50, 2)) * 30
+    snapshot = SQLReader(simulation_id=1, db_name=db_name, columns=["x"], batch_size=7).at_timestep(40, ids=ids)
+    assert snapshot.column("id").tolist() == list(range(2, 50, 2))
+    assert snapshot.natoms == 24
+
+    assert SQLReader(simulation_id=1, db_name=db_name).at_timestep(20, ids=[1000]).natoms == 0
+    assert SQLReader(simulation_id=1, db_name=db_name).at_timestep(20, ids=list(range(1000, 1100))).natoms == 0
+    with pytest.raises(KeyError):
+        reader.at_timestep(15)
+    with pytest.raises(ValueError):
+        SQLReader(simulation_id=1, db_name=db_name, columns=["nope"])
+    reader.close()
+
+
+def test_sql_reader_uses_composite_index(sql_store):
+    db_name, _ = sql_store
+    engine = create_engine(f"sqlite:///{db_name}", echo=False)
+    assert "ix_atoms_simulation_timestep_id" in {index["name"] for index in inspect(engine).get_indexes("atoms")}
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT x FROM atoms WHERE simulation_id = 1 AND timestep_id BETWEEN 10 AND 30 "
+            "ORDER BY timestep_id, id"
+        ).fetchall()
+    details = " ".join(str(row[-1]) for row in plan)
+    assert "ix_atoms_simulation_timestep_id" in details
+    assert "TEMP B-TREE" not in details
+    engine.dispose()
+
+
+def test_sql_reader_null_columns(sql_store):
+    db_name, snapshots = sql_store
+    # The dump has no molecule column, it is stored as NULL
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        snapshot = SQLReader(simulation_id=1, db_name=db_name, columns=["mol", "ix"]).at_timestep(0)
+    assert np.isnan(snapshot.column("mol")).all()
+    assert snapshot.column("ix").dtype == np.int64
+    assert np.array_equal(snapshot.column("ix"), snapshots[0].column("ix"))
+
+
+def test_sql_reader_missing_indexes(sql_store):
+    db_name, _ = sql_store
+    engine = create_engine(f"sqlite:///{db_name}", echo=False)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_atoms_simulation_timestep_id")
+
+    messages = []
+    handler = logger.add(messages.append, level="WARNING")
+    try:
+        reader = SQLReader(simulation_id=1, db_name=db_name)
+    finally:
+        logger.remove(handler)
+    assert len(messages) == 1 and "ix_atoms_simulation_timestep_id" in messages[0]
+    assert [index.name for index in reader.missing_indexes()] == ["ix_atoms_simulation_timestep_id"]
+    assert len(list(reader)) == 5
+
+    assert not SQLReader(simulation_id=1, db_name=db_name, create_indexes=True).missing_indexes()
+    assert "ix_atoms_simulation_timestep_id" in {index["name"] for index in inspect(engine).get_indexes("atoms")}
+    engine.dispose()
+
+
+def test_sql_reader_range_starting_at_empty_snapshot(sql_store):
+    db_name, snapshots = sql_store
+    writer = SQLWriter(simulation_id=1, db_name=db_name)
+    writer.write([DumpSnapshot(timestamp=5, natoms=0, box=snapshots[0].box, columns={})])
+    writer.close()
+
+    with SQLReader(simulation_id=1, db_name=db_name) as reader:
+        empty, first = reader.read(start=5, stop=10)
+        assert empty.timestamp == 5 and empty.natoms == 0
+        assert empty.column_names == first.column_names
+        assert set(first.column_names) == set(snapshots[1].column_names) | {"mass"}
+        assert np.array_equal(first.column("x"), snapshots[1].column("x"))
+        assert reader.at_timestep(5).column_names == ["id"]
@@ -0,0 +1,176 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from lmptools.core.cache import MISSING, ResultCache, stable_hash
+from lmptools.core.simulation import DumpSnapshot, SimulationBox
+from lmptools.core.task import Pipeline, Task
+from lmptools.dump.base import Dump, DumpCallback
+from lmptools.dump.filters import AtomFilter
+
+
+def make_snapshot(timestamp: int, natoms: int = 10) -> DumpSnapshot:
+    box = SimulationBox(xprd="pp", yprd="pp", zprd="pp", xlo=0.0, xhi=1.0, ylo=0.0, yhi=1.0, zlo=0.0, zhi=1.0)
+    columns = {"id": np.arange(1, natoms + 1), "x": np.linspace(0.0, 1.0, natoms)}
+    return DumpSnapshot(timestamp=timestamp, natoms=natoms, box=box, columns=columns)
+
+
+class ShiftTask(Task):
+    def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> DumpSnapshot:
+        columns = dict(snapshot.columns, x=snapshot.columns["x"] + 1.0)
+        return DumpSnapshot(timestamp=snapshot.timestamp, natoms=snapshot.natoms, box=snapshot.box, columns=columns)
+
+
+class MeanTask(Task):
+    def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> float:
+        # Later snapshots finish first when the pipeline runs concurrently
+        time.sleep(0.001 * (20 - snapshot.timestamp % 20))
+        return float(snapshot.columns["x"].mean())
+
+
+class CountTask(Task):
+    def __init__(self):
+        self.count = 0
+
+    def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> None:
+        self.count += 1
+
+
+def test_pipeline_run():
+    pipeline = Pipeline([ShiftTask(), MeanTask(), CountTask()])
+    result = pipeline.run(make_snapshot(0))
+    assert result.snapshot.columns["x"][0] == 1.0
+    assert isinstance(result.results[0], DumpSnapshot)
+    assert result.results[1:] == [1.5, None]
+
+
+def test_pipeline_default_tasks_are_not_shared():
+    pipeline = Pipeline()
+    pipeline.append(CountTask())
+    assert Pipeline()._tasks == []
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_pipeline_execute_ordered(processes):
+    snapshots = [make_snapshot(timestamp) for timestamp in range(20)]
+    results = list(Pipeline([ShiftTask(), MeanTask()]).execute(snapshots, workers=4, processes=processes))
+    assert [result.snapshot.timestamp for result in results] == list(range(20))
+    assert all(result.results[1] == 1.5 for result in results)
+
+
+def test_pipeline_execute_unordered_window():
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    class TrackTask(Task):
+        def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> None:
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.005)
+            with lock:
+                in_flight -= 1
+
+    snapshots = (make_snapshot(timestamp) for timestamp in range(30))
+    results = list(Pipeline([TrackTask(), MeanTask()]).execute(snapshots, workers=4, window=3, ordered=False))
+    assert sorted(result.snapshot.timestamp for result in results) == list(range(30))
+    assert peak <= 3
+
+
+class ScaleTask(Task):
+    def __init__(self, factor: float):
+        self.factor = factor
+        self._calls = 0
+
+    def run(self, snapshot: DumpSnapshot, *args, **kwargs) -> np.ndarray:
+        self._calls += 1
+        return snapshot.columns["x"] * self.factor
+
+
+class CountSnapshots(DumpCallback):
+    def __init__(self):
+        self.count = 0
+
+    def on_snapshot_parse_end(self, snapshot: DumpSnapshot, *args, **kwargs):
+        self.count += 1
+
+
+@pytest.fixture
+def small_dump(tmp_path):
+    filename = str(tmp_path / "dump.lammpstrj")
+    with open(filename, "w") as f:
+        for timestep in range(0, 500, 100):
+            f.write(f"ITEM: TIMESTEP\n{timestep}\nITEM: NUMBER OF ATOMS\n3\n")
+            f.write("ITEM: BOX BOUNDS pp pp pp\n0.0 1.0\n0.0 1.0\n0.0 1.0\n")
+            f.write("ITEM: ATOMS id x\n")
+            for index in range(3):
+                f.write(f"{index + 1} {timestep + index}\n")
+    return filename
+
+
+def test_task_fingerprint():
+    assert ScaleTask(2.0).fingerprint() == ScaleTask(2.0).fingerprint()
+    assert ScaleTask(2.0).fingerprint() != ScaleTask(3.0).fingerprint()
+    assert stable_hash({"a": np.arange(3), "b": {2, 1}}) == stable_hash({"b": {1, 2}, "a": np.arange(3)})
+
+    # Values hashed through their repr would get a new key on every run
+    with pytest.raises(TypeError):
+        stable_hash({"function": lambda x: x})
+    with pytest.raises(TypeError):
+        ScaleTask(object()).fingerprint()
+
+
+def test_result_cache_lru(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1000)
+    cache.put("a", np.zeros(40))
+    cache.put("b", np.zeros(40))
+    assert cache.get("a") is not MISSING
+    cache.put("c", np.zeros(40))
+    # b is the least recently used result
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.nbytes <= 1000
+
+    reopened = ResultCache(str(tmp_path / "cache"), max_bytes=1000)
+    assert len(reopened) == 2
+    assert np.array_equal(reopened.get("c"), np.zeros(40))
+    assert reopened.get("b") is MISSING
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_pipeline_execute_cached(small_dump, tmp_path, ordered):
+    cache = ResultCache(str(tmp_path / "cache"))
+    task = ScaleTask(2.0)
+    results = list(Pipeline([task]).execute(Dump(small_dump, columnar=True), cache=cache, ordered=ordered))
+    assert task._calls == 5 and not any(result.cached for result in results)
+
+    callback = CountSnapshots()
+    dump = Dump(small_dump, columnar=True, callback=callback)
+    cached = list(Pipeline([task]).execute(dump, workers=2, cache=cache, ordered=ordered))
+    assert task._calls == 5 and callback.count == 0
+    assert all(result.cached and result.snapshot is None for result in cached)
+    assert sorted(result.timestep for result in cached) == [0, 100, 200, 300, 400]
+    for result in cached:
+        assert result.results[0].tolist() == [2.0 * (result.timestep + index) for index in range(3)]
+
+    # Changing the parameters of a task invalidates its results
+    other = ScaleTask(3.0)
+    list(Pipeline([other]).execute(Dump(small_dump, columnar=True), cache=cache))
+    assert other._calls == 5
+
+
+def test_pipeline_execute_cached_where(small_dump, tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    task = ScaleTask(2.0)
+    for _ in range(2):
+        dump = Dump(small_dump, columnar=True, where=AtomFilter(id_max=2))
+        results = list(Pipeline([task]).execute(dump, cache=cache))
+        assert len(results[0].results[0]) == 2
+    assert task._calls == 5
+
+    # The repr of a function changes between runs, it would never hit the cache
+    with pytest.raises(TypeError, match="AtomFilter"):
+        list(Pipeline([task]).execute(Dump(small_dump, columnar=True, where=lambda c: c["id"] <= 2), cache=cache))